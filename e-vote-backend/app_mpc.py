@@ -1,13 +1,33 @@
-import os, hmac, hashlib, time, uuid, json, random
+import asyncio, logging, os, hmac, hashlib, time, uuid, json, queue, random, threading
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
-from fastapi import FastAPI, HTTPException, Header
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 import mysql.connector
 import requests
 from passlib.hash import bcrypt
+from starlette.concurrency import run_in_threadpool
+
+import db_pool
+import exports
+import fingerprint_index
+import metrics
+import mpc_batch
+import mpc_preflight
+import scan_buffer
+import share_http
+import slow_queries
+import sqlite_store
+import voted_bitmap
+import voter_import
+import voter_search
+from fingerprint_index import Voter
+
+log = logging.getLogger(__name__)
 
 #Scalable for a Multi-device / multinode approach.
 
@@ -24,12 +44,22 @@ COORD_DB = {
     "user": os.getenv("COORD_DB_USER", "root"),
     "password": os.getenv("COORD_DB_PASS", ""),
     "database": os.getenv("COORD_DB_NAME", "voter_db"),
+    "sqlite": os.getenv("COORD_SQLITE_PATH", ""),   # set to run on an embedded SQLite file instead
 }
 SHARE_DB = {
     "host": os.getenv("SHARE_DB_HOST", "linux-us.genixplay.com"),
     "user": os.getenv("SHARE_DB_USER", "root"),
     "password": os.getenv("SHARE_DB_PASS", ""),
     "database": os.getenv("SHARE_DB_NAME", "voter_shares"),
+    "sqlite": os.getenv("SHARE_SQLITE_PATH", ""),
+}
+# one pool per database; max defaults to Starlette's 40 threadpool workers so sync handlers never queue for a connection
+DB_POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX", "40")),
+    "max_waiters": int(os.getenv("DB_POOL_MAX_WAITERS", "256")),
+    "checkout_timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    "idle_timeout": float(os.getenv("DB_POOL_IDLE", "60")),
 }
 
 NODE_A_URL = os.getenv("SHARE_NODE_A_URL", "")
@@ -37,6 +67,12 @@ NODE_B_URL = os.getenv("SHARE_NODE_B_URL", "")
 
 MODULUS = 2**61 - 1
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "10"))
+# a 2PC phase goes to every share node at once and fails if they have not all answered by then
+SHARE_PHASE_TIMEOUT = float(os.getenv("SHARE_PHASE_TIMEOUT", str(HTTP_TIMEOUT)))
+SHARE_FANOUT_THREADS = int(os.getenv("SHARE_FANOUT_THREADS", "32"))
+# keep-alive connections per share node; HTTP_TIMEOUT is the read timeout
+SHARE_POOL_SIZE = int(os.getenv("SHARE_POOL_SIZE", str(SHARE_FANOUT_THREADS)))
+SHARE_CONNECT_TIMEOUT = float(os.getenv("SHARE_CONNECT_TIMEOUT", "2"))
 
 app = FastAPI(title="MPC Voting Service", version="1.3.0")
 app.add_middleware(
@@ -44,28 +80,63 @@ app.add_middleware(
     allow_origins=["*"] if MODE == "coordinator" else [ALLOW_COORD] if ALLOW_COORD else ["*"],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
 )
+app.add_middleware(db_pool.RequestScope)
+app.add_middleware(metrics.RequestTimer, cast_routes={"/api/vote/cast_mpc"})
+
+DB_CONNECT_SECONDS = metrics.REGISTRY.histogram(
+    "evote_db_connect_seconds", "Time to open a pooled MySQL connection.", ("database",)
+)
+SHARE_SECONDS = metrics.REGISTRY.histogram(
+    "evote_mpc_share_call_seconds", "Coordinator -> share node call latency.", ("node", "phase")
+)
+SHARE_ERRORS = metrics.REGISTRY.counter(
+    "evote_mpc_share_call_errors_total", "Share node calls that failed or returned >= 400.", ("node", "phase")
+)
+SHARE_PHASE_SECONDS = metrics.REGISTRY.histogram(
+    "evote_mpc_share_phase_seconds", "Wall time of one 2PC phase across all share nodes.", ("phase",)
+)
+slow_log = slow_queries.SlowQueryLog(
+    threshold_ms=float(os.getenv("SLOW_QUERY_MS", "250")),      # < 0 disables
+    top_n=int(os.getenv("SLOW_QUERY_TOP", "50")),
+    explain_rate=float(os.getenv("SLOW_QUERY_EXPLAIN", "0")),
+)
+metrics.on_query(slow_log.record)
 
 # =========================
 # DB helpers
 # =========================
-def get_conn(cfg: Dict[str,str]):
-    return mysql.connector.connect(
-        host=cfg["host"],
-        user=cfg["user"],
-        password=cfg["password"],
-        database=cfg["database"],
-        autocommit=False
-    )
+def connect(cfg: Dict[str,str]):
+    with DB_CONNECT_SECONDS.time(cfg["database"]):
+        if cfg.get("sqlite"):
+            return sqlite_store.connect(cfg["sqlite"])
+        return mysql.connector.connect(
+            host=cfg["host"],
+            user=cfg["user"],
+            password=cfg["password"],
+            database=cfg["database"],
+            autocommit=False
+        )
 
-def coord_conn():
+coord_db_pool = db_pool.ElasticPool(lambda: connect(COORD_DB), **DB_POOL_CONFIG)
+share_db_pool = db_pool.ElasticPool(lambda: connect(SHARE_DB), **DB_POOL_CONFIG)
+db_pool_for_mode = coord_db_pool if MODE == "coordinator" else share_db_pool
+metrics.REGISTRY.add_collector(metrics.pool_collector(db_pool_for_mode.snapshot, MODE))
+
+def get_conn(pool: db_pool.ElasticPool, scoped: bool = True):
+    """Inside a request, the request's connection (close() ends the transaction, the
+    connection goes back when the request finishes); elsewhere a plain checkout."""
+    conn = db_pool.scoped_connection(pool) if scoped else pool.get_connection()
+    return metrics.TimedConnection(conn)
+
+def coord_conn(scoped: bool = True):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
-    return get_conn(COORD_DB)
+    return get_conn(coord_db_pool, scoped)
 
-def share_conn():
+def share_conn(scoped: bool = True):
     if MODE != "share":
         raise HTTPException(404, "Share node only")
-    return get_conn(SHARE_DB)
+    return get_conn(share_db_pool, scoped)
 
 # =========================
 # HMAC helpers
@@ -88,21 +159,160 @@ def verify_signature(ts: str, sig: str, payload: Dict[str, Any])->bool:
         return False
     return hmac.compare_digest(expected, sig)
 
+share_clients = share_http.ShareClients(
+    pool_size=SHARE_POOL_SIZE, connect_timeout=SHARE_CONNECT_TIMEOUT, read_timeout=HTTP_TIMEOUT,
+    names={"A": NODE_A_URL, "B": NODE_B_URL},
+)
+metrics.REGISTRY.add_collector(metrics.http_pool_collector(share_clients.stats))
+
 def call_signed(url: str, payload: Dict[str, Any])->requests.Response:
     ts, sig = sign_payload(payload)
-    return requests.post(
+    return share_clients.post(
         url,
         headers={"x-timestamp": ts, "x-signature": sig, "content-type":"application/json"},
         data=json.dumps(payload),
-        timeout=HTTP_TIMEOUT
     )
 
+def share_call(node: str, phase: str, url: str, payload: Dict[str, Any])->requests.Response:
+    """call_signed to a share node, timed per node and 2PC phase."""
+    t0 = time.perf_counter()
+    try:
+        r = call_signed(url, payload)
+    except Exception:
+        SHARE_ERRORS.inc(node, phase)
+        raise
+    finally:
+        SHARE_SECONDS.observe(time.perf_counter() - t0, node, phase)
+    if r.status_code >= 400:
+        SHARE_ERRORS.inc(node, phase)
+    return r
+
+share_pool = ThreadPoolExecutor(max_workers=SHARE_FANOUT_THREADS, thread_name_prefix="share")
+
+class SharePhaseError(Exception):
+    pass
+
+def _share_ok(node: str, phase: str, url: str, payload: Dict[str, Any]):
+    share_call(node, phase, url, payload).raise_for_status()
+
+def share_phase(phase: str, calls: List[Tuple[str, str, Dict[str, Any]]], inflight: Dict[str, Future]):
+    """One 2PC phase, (node, url, payload) sent to all nodes in parallel.
+
+    Returns once every node answered OK; raises on the first failure or after
+    SHARE_PHASE_TIMEOUT without waiting for the rest. The futures are left in
+    `inflight` so the caller can abort each node after its own call returns.
+    """
+    t0 = time.perf_counter()
+    try:
+        for node, url, payload in calls:
+            inflight[node] = share_pool.submit(_share_ok, node, phase, url, payload)
+        done, pending = wait(inflight.values(), timeout=SHARE_PHASE_TIMEOUT, return_when=FIRST_EXCEPTION)
+        for f in done:
+            if f.exception() is not None:
+                raise f.exception()
+        if pending:
+            late = [node for node, f in inflight.items() if f in pending]
+            raise SharePhaseError(f"no answer from node {', '.join(late)} within {SHARE_PHASE_TIMEOUT:g}s")
+    finally:
+        SHARE_PHASE_SECONDS.observe(time.perf_counter() - t0, phase)
+
+def abort_shares(txs: List[Tuple[str, str, str]], inflight: Dict[str, Future], endpoint: str = "abort"):
+    """Abort (node, base url, tx_id) everywhere: right away where the last call has returned,
+    otherwise as soon as it does, so a prepare still in flight cannot land after its abort."""
+    def abort(node: str, base: str, tx_id: str):
+        try:
+            share_call(node, "abort", f"{base}/internal/share/{endpoint}", {"tx_id": tx_id})
+        except Exception:
+            pass
+
+    now = []
+    for node, base, tx_id in txs:
+        f = inflight.get(node)
+        if f is not None and not f.done():
+            f.add_done_callback(lambda _f, n=node, b=base, t=tx_id: abort(n, b, t))
+        else:
+            now.append(share_pool.submit(abort, node, base, tx_id))
+    wait(now, timeout=SHARE_PHASE_TIMEOUT)
+
 def call_signed_get(url: str)->Dict[str, Any]:
     ts, sig = sign_payload({})
-    r = requests.get(url, headers={"x-timestamp": ts, "x-signature": sig}, timeout=HTTP_TIMEOUT)
+    r = share_clients.get(url, headers={"x-timestamp": ts, "x-signature": sig})
     r.raise_for_status()
     return r.json()
 
+def ballot_two_pc(tx_root: str, vote_id: int, party_id: int, delta_a: int, delta_b: int):
+    """One ballot's 2PC: prepare, then commit, each phase to both nodes at once."""
+    txs = [("A", NODE_A_URL, tx_root+"-A"), ("B", NODE_B_URL, tx_root+"-B")]
+    deltas = {"A": delta_a, "B": delta_b}
+    inflight: Dict[str, Future] = {}
+    try:
+        share_phase("prepare", [
+            (node, f"{base}/internal/share/prepare", {"tx_id": tx, "vote_id": vote_id, "party_id": party_id, "delta": deltas[node]})
+            for node, base, tx in txs
+        ], inflight)
+    except Exception as e:
+        abort_shares(txs, inflight)
+        raise HTTPException(502, f"Prepare failed: {e}")
+    inflight = {}
+    try:
+        share_phase("commit", [(node, f"{base}/internal/share/commit", {"tx_id": tx}) for node, base, tx in txs], inflight)
+    except Exception as e:
+        abort_shares(txs, inflight)
+        raise HTTPException(502, f"Commit failed: {e}")
+
+class ShareCommitFailed(HTTPException):
+    """The commit phase failed after both nodes prepared: either node may already have committed."""
+
+def batch_two_pc(tx_root: str, entries_a: List[Dict[str, int]], entries_b: List[Dict[str, int]]):
+    """One 2PC for a whole micro-batch (mpc_batch.ShareBatcher): prepare_batch, commit_batch on both nodes."""
+    txs = [("A", NODE_A_URL, tx_root+"-A"), ("B", NODE_B_URL, tx_root+"-B")]
+    entries = {"A": entries_a, "B": entries_b}
+    inflight: Dict[str, Future] = {}
+    try:
+        share_phase("prepare", [
+            (node, f"{base}/internal/share/prepare_batch", {"tx_id": tx, "entries": entries[node]})
+            for node, base, tx in txs
+        ], inflight)
+    except Exception as e:
+        abort_shares(txs, inflight, "abort_batch")
+        raise HTTPException(502, f"Prepare failed: {e}")
+    inflight = {}
+    try:
+        share_phase("commit", [(node, f"{base}/internal/share/commit_batch", {"tx_id": tx}) for node, base, tx in txs], inflight)
+    except Exception as e:
+        abort_shares(txs, inflight, "abort_batch")
+        raise ShareCommitFailed(502, f"Commit failed: {e}")
+
+def batch_outcome(tx_root: str) -> str:
+    """How micro-batch tx_root ended, from the share nodes themselves: committed (on both),
+    aborted (on either, committed on neither) or pending (still in flight, or a node unreachable)."""
+    def status(node: str, base: str) -> str:
+        try:
+            r = share_call(node, "status", f"{base}/internal/share/batch_status", {"tx_id": f"{tx_root}-{node}"})
+            r.raise_for_status()
+            return r.json()["status"]
+        except Exception:
+            return "unreachable"
+
+    futs = [share_pool.submit(status, node, base) for node, base in (("A", NODE_A_URL), ("B", NODE_B_URL))]
+    statuses = [f.result() for f in futs]
+    if all(s == "committed" for s in statuses):
+        return "committed"
+    if "aborted" in statuses and "committed" not in statuses:
+        return "aborted"
+    return "pending"
+
+# MPC_BATCH_WINDOW_MS > 0: casts share one 2PC per window (coordinator)
+MPC_BATCH_WINDOW_MS = float(os.getenv("MPC_BATCH_WINDOW_MS", "0"))
+# how long cast_mpc waits for its batch (queue + prepare + commit) before asking the nodes
+MPC_BATCH_TIMEOUT_S = float(os.getenv("MPC_BATCH_TIMEOUT_S", str(2 * SHARE_PHASE_TIMEOUT + 5)))
+share_batcher = mpc_batch.ShareBatcher(
+    batch_two_pc, MODULUS,
+    window=MPC_BATCH_WINDOW_MS / 1000.0,
+    batch_size=int(os.getenv("MPC_BATCH_SIZE", "256")),
+    flushers=int(os.getenv("MPC_BATCH_FLUSHERS", "2")),
+)
+
 # =========================
 # Schemas (Pydantic v2-safe)
 # =========================
@@ -129,9 +339,11 @@ class RegisterRequest(BaseModel):
     polling: Optional[str] = None
     gn: Optional[str] = None
     fingerprint: Optional[str] = None
+    station: Optional[str] = None
 
 class FingerprintPayload(BaseModel):
     fingerprint: str
+    station: Optional[str] = None
 
 class VoteStatus(str, Enum):
     draft = "draft"
@@ -183,6 +395,15 @@ class PreparePayload(BaseModel):
 class TxIdPayload(BaseModel):
     tx_id: str
 
+class ShareEntry(BaseModel):
+    vote_id: int
+    party_id: int
+    delta: int
+
+class BatchPreparePayload(BaseModel):
+    tx_id: str
+    entries: List[ShareEntry]
+
 # ----- Admin voter management schemas -----
 class VoterAdminCreate(BaseModel):
     full_name: str
@@ -248,6 +469,12 @@ def share_prepare(
     finally:
         cur.close(); conn.close()
 
+# add a committed delta to a party's share in one statement (no read-modify-write between transactions)
+SHARE_TOTALS_ADD_SQL = """
+    INSERT INTO share_totals (vote_id, party_id, share) VALUES (%s,%s,%s)
+    ON DUPLICATE KEY UPDATE share = (share + VALUES(share)) % %s
+"""
+
 @app.post("/internal/share/commit")
 def share_commit(
     data: TxIdPayload,
@@ -273,20 +500,10 @@ def share_commit(
         if status == "committed":
             return {"status":"ok"}
 
-        cur.execute("SELECT share FROM share_totals WHERE vote_id=%s AND party_id=%s", (vote_id, party_id))
-        r = cur.fetchone()
-        if r:
-            new_share = (int(r[0]) + int(delta)) % MODULUS
-            cur.execute(
-                "UPDATE share_totals SET share=%s WHERE vote_id=%s AND party_id=%s",
-                (new_share, vote_id, party_id)
-            )
-        else:
-            cur.execute(
-                "INSERT INTO share_totals (vote_id, party_id, share) VALUES (%s,%s,%s)",
-                (vote_id, party_id, int(delta) % MODULUS)
-            )
-        cur.execute("UPDATE share_transactions SET status='committed' WHERE tx_id=%s", (data.tx_id,))
+        # flip first: a concurrent commit of the same tx finds nothing left to apply
+        cur.execute("UPDATE share_transactions SET status='committed' WHERE tx_id=%s AND status='prepared'", (data.tx_id,))
+        if cur.rowcount == 1:
+            cur.execute(SHARE_TOTALS_ADD_SQL, (vote_id, party_id, int(delta) % MODULUS, MODULUS))
         conn.commit()
         return {"status":"ok"}
     finally:
@@ -316,6 +533,124 @@ def share_abort(
     finally:
         cur.close(); conn.close()
 
+# ----- micro-batched share transactions (coordinator MPC_BATCH_WINDOW_MS > 0, mpc_batch.py) -----
+# entry i of batch tx_id is stored as share_transactions row "<tx_id>:<i>", with
+# batch_id = tx_id (sql/007_share_transactions_batch_id.sql)
+def _share_auth(x_signature: Optional[str], x_timestamp: Optional[str], payload: Dict[str, Any]):
+    if MODE != "share":
+        raise HTTPException(404, "Not a share node")
+    if not x_signature or not x_timestamp:
+        raise HTTPException(401, "Missing signature headers")
+    if not verify_signature(x_timestamp, x_signature, payload):
+        raise HTTPException(401, "Bad signature")
+
+@app.post("/internal/share/prepare_batch")
+def share_prepare_batch(
+    data: BatchPreparePayload,
+    x_signature: str = Header(None),
+    x_timestamp: str = Header(None)
+):
+    _share_auth(x_signature, x_timestamp, data.model_dump())
+    if not data.entries:
+        raise HTTPException(400, "Empty batch")
+
+    conn = share_conn(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT status FROM share_transactions WHERE batch_id = %s LIMIT 1", (data.tx_id,))
+        row = cur.fetchone()
+        if row:
+            if row[0] == "aborted":
+                conn.rollback(); raise HTTPException(409, "TX already aborted")
+        else:
+            cur.executemany(
+                """INSERT INTO share_transactions (tx_id, batch_id, vote_id, party_id, delta, status)
+                   VALUES (%s,%s,%s,%s,%s,'prepared')""",
+                [(f"{data.tx_id}:{i}", data.tx_id, e.vote_id, e.party_id, int(e.delta) % MODULUS)
+                 for i, e in enumerate(data.entries)]
+            )
+        conn.commit()
+        return {"status":"ok"}
+    finally:
+        cur.close(); conn.close()
+
+@app.post("/internal/share/commit_batch")
+def share_commit_batch(
+    data: TxIdPayload,
+    x_signature: str = Header(None),
+    x_timestamp: str = Header(None)
+):
+    _share_auth(x_signature, x_timestamp, data.model_dump())
+
+    conn = share_conn(); cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT vote_id, party_id, delta, status FROM share_transactions WHERE batch_id = %s FOR UPDATE",
+            (data.tx_id,)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            conn.rollback(); raise HTTPException(404, "TX not found")
+        if any(r[3] == "aborted" for r in rows):
+            conn.rollback(); raise HTTPException(409, "TX already aborted")
+        sums: Dict[Tuple[int, int], int] = {}
+        for vote_id, party_id, delta, status in rows:
+            if status == "prepared":
+                key = (int(vote_id), int(party_id))
+                sums[key] = (sums.get(key, 0) + int(delta)) % MODULUS
+
+        # the whole batch in one transaction; rows flipped first, so a concurrent
+        # commit of the same batch applies nothing twice
+        cur.execute(
+            "UPDATE share_transactions SET status='committed' WHERE batch_id = %s AND status='prepared'",
+            (data.tx_id,)
+        )
+        if cur.rowcount and sums:
+            cur.executemany(SHARE_TOTALS_ADD_SQL, [(v, p, d, MODULUS) for (v, p), d in sorted(sums.items())])
+        conn.commit()
+        return {"status":"ok"}
+    finally:
+        cur.close(); conn.close()
+
+@app.post("/internal/share/abort_batch")
+def share_abort_batch(
+    data: TxIdPayload,
+    x_signature: str = Header(None),
+    x_timestamp: str = Header(None)
+):
+    _share_auth(x_signature, x_timestamp, data.model_dump())
+
+    conn = share_conn(); cur = conn.cursor()
+    try:
+        cur.execute(
+            "UPDATE share_transactions SET status='aborted' WHERE batch_id = %s AND status='prepared'",
+            (data.tx_id,)
+        )
+        conn.commit()
+        return {"status":"ok"}
+    finally:
+        cur.close(); conn.close()
+
+@app.post("/internal/share/batch_status")
+def share_batch_status(
+    data: TxIdPayload,
+    x_signature: str = Header(None),
+    x_timestamp: str = Header(None)
+):
+    """Where a batch stands on this node: unknown (never prepared here), prepared, committed or aborted."""
+    _share_auth(x_signature, x_timestamp, data.model_dump())
+
+    conn = share_conn(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT status, COUNT(*) FROM share_transactions WHERE batch_id = %s GROUP BY status", (data.tx_id,))
+        rows = {s: int(n) for s, n in cur.fetchall()}
+        conn.rollback()
+    finally:
+        cur.close(); conn.close()
+    for status in ("prepared", "aborted", "committed"):
+        if status in rows:
+            return {"status": status, "rows": rows}
+    return {"status": "unknown", "rows": rows}
+
 @app.get("/internal/share/snapshot")
 def share_snapshot(
     x_signature: str = Header(None),
@@ -343,62 +678,191 @@ def share_snapshot(
         cur.close(); conn.close()
 
 # =========================
-# Coordinator helpers
+# Fingerprint -> voter index (FP_INDEX=1, coordinator)
 # =========================
-def ensure_vote_exists(vote_id: int):
+FP_INDEX_RELOAD_S = float(os.getenv("FP_INDEX_RELOAD_S", "0"))   # 0 = load once at startup
+fp_index = fingerprint_index.FingerprintIndex(enabled=MODE == "coordinator" and os.getenv("FP_INDEX", "0") == "1")
+
+def _fp_index_loop():
+    # lookups fall back to SQL until the first load is done
+    while True:
+        try:
+            conn = coord_conn(); cur = conn.cursor()
+            try:
+                fp_index.load(cur)
+            finally:
+                cur.close(); conn.close()
+        except Exception as e:
+            log.warning("fingerprint index load failed: %s", e)
+        if FP_INDEX_RELOAD_S <= 0 and fp_index.ready:
+            return
+        time.sleep(FP_INDEX_RELOAD_S if FP_INDEX_RELOAD_S > 0 else 5)
+
+@app.on_event("startup")
+def start_fp_index():
+    if fp_index.enabled:
+        threading.Thread(target=_fp_index_loop, name="fp-index", daemon=True).start()
+
+@app.get("/api/admin/fp-index")
+def fp_index_stats():
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    return fp_index.stats()
+
+@app.post("/api/admin/fp-index/check")
+def fp_index_check(fix: bool = False):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
     conn = coord_conn(); cur = conn.cursor()
     try:
-        cur.execute("SELECT id FROM votes WHERE id=%s", (vote_id,))
-        if not cur.fetchone():
-            raise HTTPException(404, "Vote not found")
+        return fp_index.check(cur, fix=fix)
     finally:
         cur.close(); conn.close()
 
-def ensure_party_in_vote(party_id: int, vote_id: int):
-    conn = coord_conn(); cur = conn.cursor()
+# =========================
+# Voted bitmaps (VOTED_BITMAP=1, coordinator)
+# =========================
+voted = voted_bitmap.VotedSets(enabled=MODE == "coordinator" and os.getenv("VOTED_BITMAP", "0") == "1")
+
+def _build_voted(vote_id: int):
     try:
-        cur.execute(
-            "SELECT id FROM parties WHERE id=%s AND vote_id=%s AND is_active=1",
-            (party_id, vote_id)
-        )
-        if not cur.fetchone():
-            raise HTTPException(404, "Party not found in this vote or inactive")
-    finally:
-        cur.close(); conn.close()
+        conn = coord_conn(); cur = conn.cursor()
+        try:
+            voted.build(cur, vote_id)
+        finally:
+            cur.close(); conn.close()
+    except Exception as e:
+        voted.drop(vote_id)   # retried on the next cast
+        log.warning("voted bitmap for vote %s failed: %s", vote_id, e)
+
+def track_vote(vote_id: int):
+    if voted.begin(vote_id):
+        threading.Thread(target=_build_voted, args=(vote_id,), name=f"voted-{vote_id}", daemon=True).start()
+
+@app.on_event("startup")
+def track_open_votes():
+    if not voted.enabled:
+        return
+    def run():
+        try:
+            conn = coord_conn(); cur = conn.cursor()
+            try:
+                cur.execute("SELECT id FROM votes WHERE status='open'")
+                for (vote_id,) in cur.fetchall():
+                    track_vote(int(vote_id))
+            finally:
+                cur.close(); conn.close()
+        except Exception as e:
+            log.warning("voted bitmaps not started: %s", e)
+    threading.Thread(target=run, name="voted-open", daemon=True).start()
+
+@app.get("/api/admin/voted")
+def voted_bitmap_stats():
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    return voted.stats()
 
-def check_vote_open(vote_id: int):
-    conn = coord_conn(); cur = conn.cursor()
+# =========================
+# DB pool
+# =========================
+@app.on_event("startup")
+def open_db_pool():
     try:
-        cur.execute("SELECT status, start_at, end_at FROM votes WHERE id=%s", (vote_id,))
-        r = cur.fetchone()
-        if not r:
-            raise HTTPException(404, "Vote not found")
-        status, start_at, end_at = r[0], r[1], r[2]
-        if status != "open":
-            raise HTTPException(409, "Vote is not open")
-        now = datetime.utcnow()
-        if start_at and now < start_at:
-            raise HTTPException(409, "Vote not started")
-        if end_at and now > end_at:
-            raise HTTPException(409, "Vote ended")
-    finally:
-        cur.close(); conn.close()
+        db_pool_for_mode.open()
+    except Exception as e:
+        log.warning("db pool not pre-opened: %s", e)   # connects on first checkout instead
+
+@app.on_event("shutdown")
+def close_db_pools():
+    coord_db_pool.close(); share_db_pool.close()
+
+@app.exception_handler(db_pool.PoolExhausted)
+def _pool_exhausted(request: Request, exc: db_pool.PoolExhausted):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.get("/api/admin/db/pool")
+def db_pool_stats():
+    """Size, in use, checkout wait / exhaustion and request-scope reuse for DB_POOL_MIN/MAX."""
+    return db_pool_for_mode.snapshot()
+
+# =========================
+# Share node HTTP clients
+# =========================
+@app.get("/api/admin/share-nodes")
+def share_node_stats():
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    return share_clients.stats()
 
-def coordinator_verify_voter_and_prevent_double(fingerprint: str, vote_id: int) -> int:
+@app.on_event("shutdown")
+def close_share_clients():
+    share_clients.close()
+
+# =========================
+# Micro-batched share transactions (MPC_BATCH_WINDOW_MS > 0, coordinator)
+# =========================
+@app.on_event("startup")
+def start_share_batcher():
+    if MODE == "coordinator" and MPC_BATCH_WINDOW_MS > 0:
+        share_batcher.start()
+
+@app.on_event("shutdown")
+def stop_share_batcher():
+    share_batcher.stop()
+
+@app.get("/api/admin/mpc/batches")
+def share_batch_stats():
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    return share_batcher.snapshot()
+
+# =========================
+# Slow queries
+# =========================
+@app.get("/api/admin/slow-queries")
+def slow_queries_top(limit: int = 20, order: str = "max", explain: bool = True):
+    if explain and slow_log.pending():
+        # share nodes explain against their own database
+        conn = coord_conn() if MODE == "coordinator" else share_conn(); cur = conn.cursor()
+        try:
+            slow_log.explain(cur)
+        finally:
+            cur.close(); conn.close()
+    try:
+        return slow_log.top(max(1, min(limit, 200)), order)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.delete("/api/admin/slow-queries")
+def slow_queries_reset():
+    slow_log.reset()
+    return {"status": "cleared"}
+
+# =========================
+# Coordinator helpers
+# =========================
+def ensure_vote_exists(vote_id: int):
     conn = coord_conn(); cur = conn.cursor()
     try:
-        cur.execute("SELECT id FROM users WHERE fingerprint=%s", (fingerprint,))
-        u = cur.fetchone()
-        if not u:
-            raise HTTPException(404, "User not found by fingerprint")
-        user_id = int(u[0])
-        cur.execute("SELECT id FROM vote_records WHERE vote_id=%s AND user_id=%s", (vote_id, user_id))
-        if cur.fetchone():
-            raise HTTPException(409, "User has already voted in this vote")
-        return user_id
+        cur.execute("SELECT id FROM votes WHERE id=%s", (vote_id,))
+        if not cur.fetchone():
+            raise HTTPException(404, "Vote not found")
     finally:
         cur.close(); conn.close()
 
+def lookup_voter(cur, fingerprint: str) -> Optional[Voter]:
+    """Fingerprint index first; on a miss read users and remember the answer."""
+    v = fp_index.get(fingerprint)
+    if v is not None:
+        return v
+    cur.execute("SELECT id, full_name, nic, email FROM users WHERE fingerprint=%s", (fingerprint,))
+    r = cur.fetchone()
+    if not r:
+        return None
+    v = Voter(int(r[0]), r[1], r[2], r[3])
+    fp_index.put(fingerprint, v)
+    return v
+
 # =========================
 # Coordinator: Admin/Auth
 # =========================
@@ -437,26 +901,54 @@ def admin_login(data: AdminLogin):
 # =========================
 # Coordinator: Users & Fingerprints (public register used by admin UI only)
 # =========================
-fingerprint_storage = {"fingerprint": None}
+# scan buffer per station (registration desk / ESP32); see scan_buffer.py
+scans = scan_buffer.ScanBuffer(ttl=float(os.getenv("SCAN_TTL_S", "60")))
+SCAN_MAX_WAIT_S = float(os.getenv("SCAN_MAX_WAIT_S", "30"))
+
+def station_id(*candidates: Optional[str]) -> str:
+    for c in candidates:
+        if c and c.strip():
+            if len(c.strip()) > 64:
+                raise HTTPException(400, "Station id is too long (max 64)")
+            return c.strip()
+    return scan_buffer.DEFAULT_STATION
 
 @app.post("/api/fingerprint/scan")
-def scan_fingerprint(data: FingerprintPayload):
+def scan_fingerprint(data: FingerprintPayload, station: Optional[str] = None,
+                     x_station_id: Optional[str] = Header(None)):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
-    fingerprint_storage["fingerprint"] = data.fingerprint
-    return {"status":"success"}
+    st = station_id(data.station, station, x_station_id)
+    scan = scans.put(st, data.fingerprint)
+    return {"status":"success", **scans.view(st, scan)}
 
 @app.get("/api/fingerprint/scan")
-def get_fingerprint():
+async def get_fingerprint(station: Optional[str] = None, wait: float = 0, after: int = 0,
+                          x_station_id: Optional[str] = Header(None)):
+    """?wait=N long-polls until a scan newer than ?after=<seq> arrives for the station."""
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
-    return {"fingerprint": fingerprint_storage["fingerprint"]}
+    st = station_id(station, x_station_id)
+    if wait > 0:
+        scan = await scans.wait(st, max(0, int(after)), min(float(wait), SCAN_MAX_WAIT_S))
+    else:
+        scan = scans.get(st)
+    return scans.view(st, scan)
+
+@app.delete("/api/fingerprint/scan")
+def clear_fingerprint(station: Optional[str] = None, x_station_id: Optional[str] = Header(None)):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    seq = scans.clear(station_id(station, x_station_id))
+    return {"status":"cleared","seq":seq}
 
 @app.post("/api/register")
 def register_user(data: RegisterRequest):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
-    fp = data.fingerprint or fingerprint_storage["fingerprint"]
+    st = station_id(data.station)
+    buffered = scans.get(st)
+    fp = data.fingerprint or (buffered.fingerprint if buffered else None)
     conn = coord_conn(); cur = conn.cursor()
     try:
         cur.execute(
@@ -467,8 +959,10 @@ def register_user(data: RegisterRequest):
             (data.full_name, data.nic, data.dob, data.gender, data.household, data.mobile, data.email,
              data.location_id, data.administration, data.electoral, data.polling, data.gn, fp)
         )
+        user_id = cur.lastrowid
         conn.commit()
-        fingerprint_storage["fingerprint"] = None
+        fp_index.put(fp, Voter(int(user_id), data.full_name, data.nic, data.email))
+        scans.clear(st)
         return {"status":"success"}
     finally:
         cur.close(); conn.close()
@@ -477,37 +971,108 @@ def register_user(data: RegisterRequest):
 def verify_fingerprint(data: FingerprintPayload):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
-    conn = coord_conn(); cur = conn.cursor()
+    v = fp_index.get(data.fingerprint)
+    if v is None:
+        conn = coord_conn(); cur = conn.cursor()
+        try:
+            v = lookup_voter(cur, data.fingerprint)
+        finally:
+            cur.close(); conn.close()
+    if not v:
+        return {"status":"fail","message":"Fingerprint not found"}
+    return {
+        "status":"success",
+        "user":{"id":v.user_id,"full_name":v.full_name,"nic":v.nic,"email":v.email}
+    }
+
+# =========================
+# Coordinator: bulk voter import (before /api/admin/voters/{user_id})
+# =========================
+imports = voter_import.ImportRegistry()
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+@app.post("/api/admin/voters/import")
+async def import_voters(request: Request, format: Optional[str] = None, job_id: Optional[str] = None,
+                        batch_size: int = IMPORT_BATCH_SIZE):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    fmt = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(400, "format must be csv or ndjson")
+    running = imports.get(job_id) if job_id else None
+    if running and running.status == "running":
+        raise HTTPException(409, "Import job already running")
+    job = imports.new(fmt, max(1, min(int(batch_size), 10000)), job_id)
+    # blocking connection, so every batch goes through the threadpool
+    conn = await run_in_threadpool(coord_conn)
     try:
-        cur.execute("SELECT id, full_name, nic, email FROM users WHERE fingerprint=%s", (data.fingerprint,))
-        r = cur.fetchone()
-        if not r:
-            return {"status":"fail","message":"Fingerprint not found"}
-        return {
-            "status":"success",
-            "user":{"id":int(r[0]),"full_name":r[1],"nic":r[2],"email":r[3]}
-        }
+        await voter_import.run(
+            job,
+            voter_import.iter_records(request.stream(), fmt, VoterAdminCreate),
+            lambda rows: run_in_threadpool(voter_import.write_batch_sync, conn, rows, fp_index),
+        )
     finally:
-        cur.close(); conn.close()
+        await run_in_threadpool(conn.close)
+    return job.snapshot()
+
+@app.get("/api/admin/voters/import")
+def list_imports():
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    return {"jobs": imports.list()}
+
+@app.get("/api/admin/voters/import/{job_id}")
+def import_status(job_id: str):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    job = imports.get(job_id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return job.snapshot()
+
+# =========================
+# Coordinator: streaming exports
+# =========================
+@app.get("/api/admin/export/voters")
+def export_voters(format: str = "ndjson", after_id: int = 0):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    if format not in exports.MEDIA_TYPES:
+        raise HTTPException(400, "format must be ndjson or csv")
+    enc = exports.Encoder(format, exports.USER_COLUMNS)
+    return StreamingResponse(
+        exports.stream(lambda: coord_conn(scoped=False), exports.users_query(max(0, int(after_id))), enc),
+        media_type=enc.media_type, headers=exports.filename("voters", format),
+    )
+
+@app.get("/api/admin/export/votes/{vote_id}/records")
+def export_vote_records(vote_id: int, format: str = "ndjson", after_id: int = 0):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    if format not in exports.MEDIA_TYPES:
+        raise HTTPException(400, "format must be ndjson or csv")
+    ensure_vote_exists(vote_id)
+    enc = exports.Encoder(format, exports.RECORD_COLUMNS)
+    return StreamingResponse(
+        exports.stream(lambda: coord_conn(scoped=False), exports.records_query(vote_id, max(0, int(after_id))), enc),
+        media_type=enc.media_type, headers=exports.filename(f"vote-{vote_id}-records", format),
+    )
 
 # =========================
 # Coordinator: Admin VOTERS CRUD (used by Remix admin pages)
 # =========================
 @app.get("/api/admin/voters")
-def admin_list_voters(q: Optional[str] = None, limit: int = 50, offset: int = 0):
+def admin_list_voters(q: Optional[str] = None, limit: int = 50, offset: int = 0,
+                      after_id: Optional[int] = None, match: str = "auto"):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
     conn = coord_conn(); cur = conn.cursor(dictionary=True)
     try:
-        base = "SELECT id, full_name, nic, email, mobile, fingerprint, created_at FROM users"
-        args: List[Any] = []
-        if q:
-            base += " WHERE (full_name LIKE %s OR nic LIKE %s OR email LIKE %s OR mobile LIKE %s)"
-            like = f"%{q}%"
-            args.extend([like, like, like, like])
-        base += " ORDER BY id DESC LIMIT %s OFFSET %s"
-        args.extend([int(limit), int(offset)])
-        cur.execute(base, args)
+        sql, args = voter_search.build_list_query(
+            "id, full_name, nic, email, mobile, fingerprint, created_at",
+            q, int(limit), int(offset), int(after_id) if after_id else None, match,
+        )
+        cur.execute(sql, args)
         rows = cur.fetchall()
         items = []
         for r in rows:
@@ -520,7 +1085,10 @@ def admin_list_voters(q: Optional[str] = None, limit: int = 50, offset: int = 0)
                 "fingerprint": r.get("fingerprint"),
                 "created_at": r["created_at"].isoformat() if r.get("created_at") else None
             })
-        return {"items": items, "limit": limit, "offset": offset}
+        return {
+            "items": items, "limit": limit, "offset": offset, "after_id": after_id,
+            "next_after_id": voter_search.next_cursor([i["id"] for i in items], int(limit)),
+        }
     finally:
         cur.close(); conn.close()
 
@@ -540,6 +1108,7 @@ def admin_create_voter(data: VoterAdminCreate):
         )
         user_id = cur.lastrowid
         conn.commit()
+        fp_index.put(data.fingerprint, Voter(int(user_id), data.full_name, data.nic, data.email))
         return {"status": "success", "id": int(user_id)}
     except mysql.connector.IntegrityError as e:
         conn.rollback()
@@ -598,10 +1167,17 @@ def admin_update_voter(user_id: int, data: VoterAdminUpdate):
 
     conn = coord_conn(); cur = conn.cursor()
     try:
+        cur.execute("SELECT fingerprint FROM users WHERE id=%s FOR UPDATE", (user_id,))
+        old = cur.fetchone()
         cur.execute(f"UPDATE users SET {', '.join(fields)} WHERE id=%s", vals)
-        if cur.rowcount == 0:
+        if old is None:
             raise HTTPException(404, "Voter not found")
+        # partial update: re-read what the index keeps
+        cur.execute("SELECT full_name, nic, email, fingerprint FROM users WHERE id=%s", (user_id,))
+        full_name, nic, email, fp = cur.fetchone()
         conn.commit()
+        fp_index.remove(old[0])
+        fp_index.put(fp, Voter(int(user_id), full_name, nic, email))
         return {"status": "success"}
     except mysql.connector.IntegrityError as e:
         conn.rollback()
@@ -617,10 +1193,13 @@ def admin_delete_voter(user_id: int):
         raise HTTPException(404, "Coordinator only")
     conn = coord_conn(); cur = conn.cursor()
     try:
+        cur.execute("SELECT fingerprint FROM users WHERE id=%s FOR UPDATE", (user_id,))
+        old = cur.fetchone()
         cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
         if cur.rowcount == 0:
             raise HTTPException(404, "Voter not found")
         conn.commit()
+        fp_index.remove(old[0] if old else None)
         return {"status": "success"}
     finally:
         cur.close(); conn.close()
@@ -675,6 +1254,10 @@ def set_vote_status(vote_id: int, data: VoteStatusUpdate):
     try:
         cur.execute("UPDATE votes SET status=%s WHERE id=%s", (data.status.value, vote_id))
         conn.commit()
+        if data.status.value == "open":
+            track_vote(vote_id)
+        else:
+            voted.drop(vote_id)
         return {"status":"success","vote_id":vote_id,"new_status":data.status.value}
     finally:
         cur.close(); conn.close()
@@ -688,6 +1271,7 @@ def delete_vote(vote_id: int):
     try:
         cur.execute("DELETE FROM votes WHERE id=%s", (vote_id,))
         conn.commit()
+        voted.drop(vote_id)
         return {"status":"success"}
     finally:
         cur.close(); conn.close()
@@ -856,58 +1440,128 @@ def public_vote(vote_id: int):
     finally:
         cur.close(); conn.close()
 
+class BallotPending(Exception):
+    """The ballot's batch is still on the wire; settle_ballot finishes the reservation."""
+
+# the cast helpers check out their own connection and give it back at once: the request's scoped one
+# would stay held while cast_mpc awaits the 2PC (up to MPC_BATCH_TIMEOUT_S), capping in-flight casts at DB_POOL_MAX
+def reserve_ballot(data: CastMpcPayload, known_id: Optional[int]) -> int:
+    # one round trip: every check, and the voter's slot held as a pending vote_records row
+    conn = coord_conn(scoped=False)
+    try:
+        return mpc_preflight.reserve(conn, data.vote_id, data.party_id, data.fingerprint, known_id)
+    except HTTPException as e:
+        if e.status_code == 409:
+            track_vote(data.vote_id)
+        raise
+    finally:
+        conn.close()
+
+def confirm_ballot(vote_id: int, party_id: int, record_id: int, tx_root: str, delta_a: int, delta_b: int):
+    conn = coord_conn(scoped=False)
+    try:
+        user_id = mpc_preflight.confirm(conn, record_id, tx_root, party_id, delta_a, delta_b)
+    finally:
+        conn.close()
+    track_vote(vote_id)
+    voted.add(vote_id, user_id)
+
+def release_ballot(vote_id: int, record_id: int):
+    """The share transactions were aborted: give the voter their slot back."""
+    conn = coord_conn(scoped=False)
+    try:
+        # the bitmap must not keep a voter whose slot was given back (false 409)
+        voted.discard(vote_id, mpc_preflight.release(conn, record_id))
+    except Exception as release_err:
+        log.error("cast_mpc: reservation %s not released: %s", record_id, release_err)
+    finally:
+        conn.close()
+
+def settle_ballot(fut: mpc_batch.BallotFuture, vote_id: int, party_id: int, record_id: int,
+                  delta_a: int, delta_b: int):
+    """Finish a reservation cast_mpc left pending (flusher or executor thread): its batch was still
+    in flight, or its commit phase failed before both nodes answered."""
+    err = fut.exception()
+    if err is None:
+        outcome = "committed"
+    elif isinstance(err, ShareCommitFailed):
+        outcome = batch_outcome(fut.tx_id)
+    else:
+        outcome = "aborted"
+    if outcome == "committed":
+        try:
+            confirm_ballot(vote_id, party_id, record_id, fut.tx_id, delta_a, delta_b)
+        except Exception as e:
+            log.error("cast_mpc: reservation %s not confirmed after batch %s: %s", record_id, fut.tx_id, e)
+    elif outcome == "aborted":
+        release_ballot(vote_id, record_id)
+    else:
+        log.error("cast_mpc: batch %s unresolved on the share nodes, reservation %s left pending", fut.tx_id, record_id)
+
+async def batched_two_pc(vote_id: int, party_id: int, record_id: int, delta_a: int, delta_b: int) -> str:
+    """Hand the ballot to share_batcher and wait for its batch without holding a worker thread."""
+    try:
+        fut = share_batcher.submit(vote_id, party_id, delta_a, delta_b)
+    except queue.Full:
+        raise HTTPException(503, "Too many ballots waiting for the share nodes, retry")
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), MPC_BATCH_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        if fut.cancel():
+            # still queued: it never reached the share nodes
+            raise HTTPException(504, "Share nodes did not take the ballot in time")
+        if fut.done() and not isinstance(fut.exception(), ShareCommitFailed):
+            return fut.result()
+    except ShareCommitFailed:
+        # one node may have committed before the other failed: releasing would let the voter vote again
+        pass
+    # the batch is on the wire, or its commit failed part way: ask the nodes how it ended rather than guess
+    outcome = await run_in_threadpool(batch_outcome, fut.tx_id)
+    if outcome == "committed":
+        return fut.tx_id
+    if outcome == "aborted":
+        raise HTTPException(502, f"Share transaction {fut.tx_id} aborted")
+    settle = lambda: settle_ballot(fut, vote_id, party_id, record_id, delta_a, delta_b)
+    if fut.done():
+        # commit failed: ask again once the aborts and late commits it left in flight have landed
+        loop = asyncio.get_running_loop()
+        loop.call_later(SHARE_PHASE_TIMEOUT, loop.run_in_executor, None, settle)
+    else:
+        fut.add_done_callback(lambda f: settle())
+    raise BallotPending(fut.tx_id)
+
 @app.post("/api/vote/cast_mpc")
-def cast_mpc(data: CastMpcPayload):
+async def cast_mpc(data: CastMpcPayload):
     if MODE != "coordinator":
         raise HTTPException(404, "Coordinator only")
     if not NODE_A_URL or not NODE_B_URL:
         raise HTTPException(500, "Share node URLs not configured")
 
-    check_vote_open(data.vote_id)
-    user_id = coordinator_verify_voter_and_prevent_double(data.fingerprint, data.vote_id)
-    ensure_party_in_vote(data.party_id, data.vote_id)
+    v = fp_index.get(data.fingerprint)
+    known_id = v.user_id if v else None
+    if known_id is not None and voted.has_voted(data.vote_id, known_id):
+        raise HTTPException(409, "User has already voted in this vote")
 
-    r = random.randrange(0, MODULUS)
-    delta_a, delta_b = r, (1 - r) % MODULUS
-    tx_root = uuid.uuid4().hex
-    tx_a, tx_b = tx_root+"-A", tx_root+"-B"
-    prep_a = {"tx_id": tx_a, "vote_id": data.vote_id, "party_id": data.party_id, "delta": int(delta_a)}
-    prep_b = {"tx_id": tx_b, "vote_id": data.vote_id, "party_id": data.party_id, "delta": int(delta_b)}
+    record_id = await run_in_threadpool(reserve_ballot, data, known_id)
 
-    # phase 1
-    try:
-        call_signed(f"{NODE_A_URL}/internal/share/prepare", prep_a).raise_for_status()
-        call_signed(f"{NODE_B_URL}/internal/share/prepare", prep_b).raise_for_status()
-    except Exception as e:
-        try: call_signed(f"{NODE_A_URL}/internal/share/abort", {"tx_id": tx_a})
-        except: pass
-        try: call_signed(f"{NODE_B_URL}/internal/share/abort", {"tx_id": tx_b})
-        except: pass
-        raise HTTPException(502, f"Prepare failed: {e}")
-
-    # phase 2
+    r = random.randrange(0, MODULUS)
+    delta_a, delta_b = int(r), int((1 - r) % MODULUS)
     try:
-        call_signed(f"{NODE_A_URL}/internal/share/commit", {"tx_id": tx_a}).raise_for_status()
-        call_signed(f"{NODE_B_URL}/internal/share/commit", {"tx_id": tx_b}).raise_for_status()
+        if share_batcher.running:
+            tx_root = await batched_two_pc(data.vote_id, data.party_id, record_id, delta_a, delta_b)
+        else:
+            tx_root = uuid.uuid4().hex
+            await run_in_threadpool(ballot_two_pc, tx_root, data.vote_id, data.party_id, delta_a, delta_b)
+    except BallotPending as e:
+        # the reservation stays pending until the batch finishes (settle_ballot)
+        raise HTTPException(504, f"Share transaction {e} still in progress; the vote is recorded if it commits")
     except Exception as e:
-        try: call_signed(f"{NODE_A_URL}/internal/share/abort", {"tx_id": tx_a})
-        except: pass
-        try: call_signed(f"{NODE_B_URL}/internal/share/abort", {"tx_id": tx_b})
-        except: pass
-        raise HTTPException(502, f"Commit failed: {e}")
-
-    conn = coord_conn(); cur = conn.cursor()
-    try:
-        cur.execute("INSERT INTO vote_records (vote_id, user_id) VALUES (%s,%s)", (data.vote_id, user_id))
-        cur.execute(
-            """INSERT INTO mpc_audit (tx_id, vote_id, party_id, user_id, node_a_delta, node_b_delta, status)
-               VALUES (%s,%s,%s,%s,%s,%s,'success')""",
-            (tx_root, data.vote_id, data.party_id, user_id, int(delta_a), int(delta_b))
-        )
-        conn.commit()
-    finally:
-        cur.close(); conn.close()
+        await run_in_threadpool(release_ballot, data.vote_id, record_id)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(502, f"Share transaction failed: {e}")
 
+    await run_in_threadpool(confirm_ballot, data.vote_id, data.party_id, record_id, tx_root, delta_a, delta_b)
     return {"status":"success","message":"Vote recorded","tx_id":tx_root}
 
 @app.get("/api/vote/tally_mpc/{vote_id}")
@@ -940,9 +1594,28 @@ def tally_mpc_vote(vote_id: int):
         "nodes": {"A": snap_a.get("node_id"), "B": snap_b.get("node_id")}
     }
 
+@app.get("/api/vote/{vote_id}/turnout")
+def vote_turnout(vote_id: int):
+    if MODE != "coordinator":
+        raise HTTPException(404, "Coordinator only")
+    n = voted.turnout(vote_id)
+    if n is not None:
+        return {"vote_id": vote_id, "voted": n, "source": "bitmap"}
+    ensure_vote_exists(vote_id)
+    conn = coord_conn(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM vote_records WHERE vote_id=%s AND status='cast'", (vote_id,))
+        return {"vote_id": vote_id, "voted": int(cur.fetchone()[0]), "source": "db"}
+    finally:
+        cur.close(); conn.close()
+
 # =========================
 # Health
 # =========================
 @app.get("/health")
 def health():
     return {"mode": MODE, "node": NODE_ID or None, "ok": True}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,75 @@
+# bench/bench_cast_concurrency.py
+# Hammer /api/vote/cast_mpc with concurrent duplicate casts and prove that
+# every voter ends up with exactly one vote_records row.
+#
+# Each of --voters voters sends --dupes simultaneous casts. Expected outcome:
+# exactly one 200 per voter, the rest 409, and no (vote_id, user_id) pair
+# stored twice. Requires sql/001_vote_records_one_vote_per_voter.sql.
+#   python -m bench.bench_cast_concurrency --voters 2000 --dupes 4
+import argparse
+import asyncio
+import random
+
+import httpx
+
+from bench import seed
+from bench.common import hammer, start_server, stop_server
+
+
+async def run(args, vote_id, party_ids, fps):
+    port = args.port
+    proc = start_server("main", port, {"DB_MODE": args.mode, **seed.server_env()})
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            # interleave the duplicates so copies of one voter's cast are in flight together
+            jobs = [fp for fp in fps for _ in range(args.dupes)]
+            random.Random(7).shuffle(jobs)
+
+            def call(i):
+                return client.post("/api/vote/cast_mpc", json={
+                    "fingerprint": jobs[i], "vote_id": vote_id, "party_id": random.choice(party_ids),
+                })
+
+            return await hammer("cast_vote_mpc", call, len(jobs), args.concurrency,
+                                ok=lambda r: r.status_code in (200, 409))
+    finally:
+        stop_server(proc)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="concurrent duplicate casts against /api/vote/cast_mpc")
+    ap.add_argument("--voters", type=int, default=2000)
+    ap.add_argument("--dupes", type=int, default=4, help="simultaneous casts per voter")
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--mode", default="async", choices=("sync", "async"))
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    try:
+        vote_id, party_ids = seed.seed_vote(conn, prefix)
+        fps = seed.seed_voters(conn, prefix, args.voters)
+        res = asyncio.run(run(args, vote_id, party_ids, fps))
+        print(res.row())
+        print("status codes:", dict(sorted(res.statuses.items())))
+
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*), COUNT(DISTINCT user_id) FROM vote_records WHERE vote_id=%s", (vote_id,))
+        rows, voters = cur.fetchone()
+        cur.close()
+        ok_200 = res.statuses.get(200, 0)
+        print(f"vote_records rows={rows} distinct voters={voters} successful casts={ok_200}")
+        assert rows == voters, f"duplicate votes stored: {rows - voters}"
+        assert ok_200 == rows == args.voters, "every voter must get exactly one successful cast"
+        print("OK: zero duplicate votes")
+    finally:
+        if not args.keep:
+            seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench/bench_db_modes.py
+# Requests/sec and p99 latency of main.py in DB_MODE=sync vs DB_MODE=async.
+#
+# Needs the voter_db schema reachable with main.py's dbconfig and at least one
+# registered voter / vote / party. Usage:
+#   python -m bench.bench_db_modes --vote-id 1 --party-id 1 --fingerprint 42
+import argparse
+import asyncio
+import json
+
+import httpx
+
+from bench.common import hammer, start_server, stop_server
+
+
+def scenarios(args):
+    fp = {"fingerprint": args.fingerprint}
+    cast = {"fingerprint": args.fingerprint, "vote_id": args.vote_id, "party_id": args.party_id}
+    return {
+        "verify_fingerprint": lambda c, i: c.post("/api/fingerprint/verify", json=fp),
+        "vote_public": lambda c, i: c.get(f"/api/vote/{args.vote_id}/public"),
+        "get_vote_results": lambda c, i: c.get(f"/api/votes/{args.vote_id}/results"),
+        "admin_list_voters": lambda c, i: c.get("/api/admin/voters", params={"limit": 50}),
+        # the voter has (or will have) voted already, so this is the full
+        # lookup chain ending in a 409 - no rows are added by the benchmark
+        "cast_vote_mpc(dup)": lambda c, i: c.post("/api/vote/cast_mpc", json=cast),
+    }
+
+
+async def run_mode(mode: str, args):
+    port = args.port
+    proc = start_server("main", port, {"DB_MODE": mode, "DB_POOL_MAX": str(args.pool_size)})
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            out = []
+            for name, fn in scenarios(args).items():
+                await hammer(name, lambda i: fn(client, i), min(200, args.requests), args.concurrency)  # warm-up
+                res = await hammer(name, lambda i: fn(client, i), args.requests, args.concurrency)
+                out.append(res)
+            pool = (await client.get("/api/admin/db/pool")).json()
+            print(f"[{mode}] pool: peak_in_use={pool['peak_in_use']} waited={pool['checkouts_waited']} "
+                  f"wait_max_ms={pool['wait_max_ms']} timeouts={pool['exhausted_timeouts']}")
+            return out
+    finally:
+        stop_server(proc)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="main.py: DB_MODE=sync vs DB_MODE=async")
+    ap.add_argument("--vote-id", type=int, required=True)
+    ap.add_argument("--party-id", type=int, required=True)
+    ap.add_argument("--fingerprint", required=True)
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--pool-size", type=int, default=20, help="DB_POOL_MAX for both modes")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = ap.parse_args()
+
+    report = {}
+    for mode in ("sync", "async"):
+        results = asyncio.run(run_mode(mode, args))
+        report[mode] = [r.as_dict() for r in results]
+        if not args.json:
+            print(f"\n== DB_MODE={mode} (pool={args.pool_size}, concurrency={args.concurrency})")
+            for r in results:
+                print(r.row())
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
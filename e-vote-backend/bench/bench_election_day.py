@@ -0,0 +1,247 @@
+# bench/bench_election_day.py
+# Election-day load test: seeded voters walk through polling stations while
+# results dashboards poll, against main.py or the app_mpc coordinator.
+#
+# Each of --stations stations (one ESP32 reader + kiosk) takes the next voter
+# from the queue and replays what the hardware and the vote page do:
+#   scan        POST /api/fingerprint/scan       (reader, with its station id)
+#   scan_read   GET  /api/fingerprint/scan       (kiosk picks the scan up)
+#   verify      POST /api/fingerprint/verify
+#   cast        POST /api/vote/cast_mpc          expect 200
+#   retry       same cast again, --dup-rate of voters (double taps)  expect 409
+# while --pollers clients fetch the results every --poll-interval seconds.
+#
+# Reports throughput and p50/p95/p99 per endpoint plus unexpected statuses.
+# --json writes the report; --compare <old.json> prints the change against it,
+# so numbers can be compared between releases on the same machine.
+#
+#   python -m bench.bench_election_day --voters 20000 --stations 200
+#   python -m bench.bench_election_day --app mpc --share-db-a voter_shares_a --share-db-b voter_shares_b
+#
+# Point BENCH_DB_* at a disposable database: rows are tagged with a run prefix
+# and removed afterwards (--keep to inspect them).
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import mysql.connector
+
+from bench import seed
+from bench.common import LoadResult, start_server, stop_server
+
+ENDPOINTS = ("scan", "scan_read", "verify", "cast", "retry", "results")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, name: str, send, expect: Tuple[int, ...]) -> Optional[httpx.Response]:
+        t0 = time.perf_counter()
+        try:
+            r = await send()
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - t0)
+        self.statuses[name][r.status_code] += 1
+        if r.status_code not in expect:
+            self.errors[name] += 1
+        return r
+
+    def results(self, elapsed: float) -> List[LoadResult]:
+        return [
+            LoadResult(name, self.latencies[name], self.errors[name], elapsed, dict(self.statuses[name]))
+            for name in ENDPOINTS if name in self.latencies or self.errors.get(name)
+        ]
+
+
+class Paths:
+    def __init__(self, app: str, vote_id: int):
+        self.scan = "/api/fingerprint/scan"
+        self.verify = "/api/fingerprint/verify"
+        self.cast = "/api/vote/cast_mpc"
+        self.results = f"/api/votes/{vote_id}/results" if app == "main" else f"/api/vote/tally_mpc/{vote_id}"
+
+
+async def station(k: int, client: httpx.AsyncClient, rec: Recorder, voters: List[str], paths: Paths,
+                  vote_id: int, party_ids: List[int], args):
+    rng = random.Random(k)
+    st = f"station-{k}"
+    think = args.think_ms / 1000.0
+    while voters:
+        fp = voters.pop()
+        await rec.call("scan", lambda: client.post(paths.scan, json={"fingerprint": fp, "station": st}), (200,))
+        await rec.call("scan_read", lambda: client.get(paths.scan, params={"station": st}), (200,))
+        await rec.call("verify", lambda: client.post(paths.verify, json={"fingerprint": fp}), (200,))
+        ballot = {"fingerprint": fp, "vote_id": vote_id, "party_id": rng.choice(party_ids)}
+        await rec.call("cast", lambda: client.post(paths.cast, json=ballot), (200,))
+        if rng.random() < args.dup_rate:
+            await rec.call("retry", lambda: client.post(paths.cast, json=ballot), (409,))
+        if think:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think)
+
+
+async def poller(client: httpx.AsyncClient, rec: Recorder, paths: Paths, interval: float, done: asyncio.Event):
+    while not done.is_set():
+        await rec.call("results", lambda: client.get(paths.results), (200,))
+        try:
+            await asyncio.wait_for(done.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(args, port: int, vote_id: int, party_ids: List[int], fps: List[str]) -> Tuple[List[LoadResult], float]:
+    rec = Recorder()
+    paths = Paths(args.app, vote_id)
+    voters = list(fps)
+    random.Random(1).shuffle(voters)
+    conns = args.stations + args.pollers
+    limits = httpx.Limits(max_connections=conns, max_keepalive_connections=conns)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        done = asyncio.Event()
+        polls = [asyncio.create_task(poller(client, rec, paths, args.poll_interval, done)) for _ in range(args.pollers)]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(
+            station(k, client, rec, voters, paths, vote_id, party_ids, args) for k in range(args.stations)
+        ))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await asyncio.gather(*polls)
+    return rec.results(elapsed), elapsed
+
+
+def start_app(args) -> list:
+    """The API under test (plus two share nodes for --app mpc); returns the processes."""
+    env = {"DB_MODE": args.mode, **seed.server_env()}
+    if args.app == "main":
+        return [start_server("main", args.port, env, workers=args.workers)]
+    key = secrets.token_hex(32)
+    procs = []
+    try:
+        for node, offset, db in (("A", 1, args.share_db_a), ("B", 2, args.share_db_b)):
+            share_env = dict(seed.server_env(), MODE="share", NODE_ID=node, HMAC_KEY=key, SHARE_DB_NAME=db,
+                             SHARE_DB_HOST=seed.DB_CONFIG["host"], SHARE_DB_USER=seed.DB_CONFIG["user"],
+                             SHARE_DB_PASS=seed.DB_CONFIG["password"])
+            procs.append(start_server("app_mpc", args.port + offset, share_env, workers=args.workers))
+        procs.append(start_server("app_mpc", args.port, dict(
+            env, MODE="coordinator", HMAC_KEY=key,
+            SHARE_NODE_A_URL=f"http://127.0.0.1:{args.port + 1}",
+            SHARE_NODE_B_URL=f"http://127.0.0.1:{args.port + 2}",
+        ), workers=args.workers))
+    except Exception:
+        for p in procs:
+            stop_server(p)
+        raise
+    return procs
+
+
+def cleanup_shares(args, vote_id: int):
+    for db in (args.share_db_a, args.share_db_b):
+        conn = mysql.connector.connect(**dict(seed.DB_CONFIG, database=db))
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM share_transactions WHERE vote_id=%s", (vote_id,))
+            cur.execute("DELETE FROM share_totals WHERE vote_id=%s", (vote_id,))
+            conn.commit()
+        finally:
+            cur.close(); conn.close()
+
+
+def report(results: List[LoadResult], elapsed: float, args, casts: int) -> Dict:
+    for r in results:
+        print(r.row())
+        unexpected = {s: n for s, n in sorted(r.statuses.items()) if s >= 400}
+        if unexpected:
+            print(f"{'':<28} statuses {dict(sorted(r.statuses.items()))}")
+    print(f"\n{casts} ballots in {elapsed:.1f}s -> {casts / elapsed:.1f} casts/s "
+          f"({args.stations} stations, {args.pollers} result pollers, app={args.app}, DB_MODE={args.mode})")
+    return {
+        "app": args.app, "mode": args.mode, "voters": args.voters, "stations": args.stations,
+        "pollers": args.pollers, "dup_rate": args.dup_rate, "elapsed_s": round(elapsed, 2),
+        "casts_per_sec": round(casts / elapsed, 1) if elapsed else 0.0,
+        "endpoints": {r.name: r.as_dict() for r in results},
+    }
+
+
+def compare(old: Dict, new: Dict):
+    print(f"\nvs {old.get('app')} {old.get('mode')} run: casts/s {old.get('casts_per_sec')} -> {new['casts_per_sec']}")
+    for name, cur in new["endpoints"].items():
+        prev = old.get("endpoints", {}).get(name)
+        if not prev:
+            continue
+        cols = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = prev[key], cur[key]
+            pct = f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+            cols.append(f"{key} {a}->{b} ({pct})")
+        print(f"{name:<12} " + "  ".join(cols) + f"  errors {prev['errors']}->{cur['errors']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="election-day station mix against main.py or app_mpc")
+    ap.add_argument("--app", default="main", choices=("main", "mpc"))
+    ap.add_argument("--voters", type=int, default=5000)
+    ap.add_argument("--parties", type=int, default=6)
+    ap.add_argument("--stations", type=int, default=100, help="concurrent polling stations")
+    ap.add_argument("--pollers", type=int, default=4, help="results dashboards")
+    ap.add_argument("--poll-interval", type=float, default=1.0)
+    ap.add_argument("--dup-rate", type=float, default=0.05, help="share of voters who tap cast twice")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="pause between voters at a station")
+    ap.add_argument("--mode", default="async", choices=("sync", "async"), help="main.py DB_MODE")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    ap.add_argument("--share-db-a", default="voter_shares_a")
+    ap.add_argument("--share-db-b", default="voter_shares_b")
+    ap.add_argument("--port", type=int, default=8770)
+    ap.add_argument("--json", help="write the report here")
+    ap.add_argument("--compare", help="earlier --json report to diff against")
+    ap.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    vote_id = None
+    try:
+        vote_id, party_ids = seed.seed_vote(conn, prefix, parties=args.parties)
+        fps = seed.seed_voters(conn, prefix, args.voters)
+        procs = start_app(args)
+        try:
+            results, elapsed = asyncio.run(drive(args, args.port, vote_id, party_ids, fps))
+        finally:
+            for p in procs:
+                stop_server(p)
+
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM vote_records WHERE vote_id=%s", (vote_id,))
+        casts = int(cur.fetchone()[0])
+        cur.close()
+        out = report(results, elapsed, args, casts)
+        if casts != args.voters:
+            print(f"WARNING: {args.voters} voters but {casts} vote_records rows")
+        if args.compare:
+            with open(args.compare) as f:
+                compare(json.load(f), out)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(out, f, indent=2)
+    finally:
+        if not args.keep:
+            if args.app == "mpc" and vote_id is not None:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM mpc_audit WHERE vote_id=%s", (vote_id,))
+                conn.commit(); cur.close()
+                cleanup_shares(args, vote_id)
+            seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
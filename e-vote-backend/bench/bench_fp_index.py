@@ -0,0 +1,69 @@
+# bench/bench_fp_index.py
+# Memory and lookup cost of fingerprint_index.FingerprintIndex (no database).
+#
+# Fills the index with --voters synthetic voters shaped like bench.seed rows
+# and reports traced memory per million voters and get() latency, next to a
+# plain dict of 4-tuples for comparison.
+#   python -m bench.bench_fp_index --voters 1000000
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from fingerprint_index import FingerprintIndex, Voter
+
+
+def row(i):
+    return (i + 1, f"fp-{i:012d}", f"Voter Name {i}", f"{199000000000 + i}", f"voter{i}@example.lk")
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def main():
+    ap = argparse.ArgumentParser(description="fingerprint index memory per million voters")
+    ap.add_argument("--voters", type=int, default=1_000_000)
+    ap.add_argument("--lookups", type=int, default=200_000)
+    args = ap.parse_args()
+    n = args.voters
+    per_million = 1_000_000 / n / 2**20
+
+    def build_index():
+        idx = FingerprintIndex(batch_size=10000)
+        m, payload = {}, 0
+        for start in range(0, n, idx.batch_size):
+            payload += idx._add_rows(m, [row(i) for i in range(start, min(n, start + idx.batch_size))])
+        idx._begin()
+        idx._finish(m, payload, time.monotonic())
+        return idx
+
+    t0 = time.perf_counter()
+    idx, idx_bytes = traced(build_index)
+    build_s = time.perf_counter() - t0
+    tuples, tuple_bytes = traced(lambda: {r[1]: Voter(r[0], r[2], r[3], r[4]) for r in map(row, range(n))})
+    del tuples
+
+    keys = [f"fp-{random.randrange(n):012d}" for _ in range(args.lookups)]
+    t0 = time.perf_counter()
+    for k in keys:
+        idx.get(k)
+    get_ns = (time.perf_counter() - t0) / len(keys) * 1e9
+
+    stats = idx.stats()
+    print(f"voters                 {n}")
+    print(f"index (packed str)     {idx_bytes * per_million:8.1f} MiB per million voters (traced)")
+    print(f"                       {stats['mb_per_million_voters']:8.1f} MiB per million voters (stats() estimate)")
+    print(f"dict of Voter tuples   {tuple_bytes * per_million:8.1f} MiB per million voters")
+    print(f"build                  {build_s:8.2f} s")
+    print(f"get()                  {get_ns:8.0f} ns per lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench/bench_group_commit.py
+# Commits/sec and cast throughput: per-ballot commit vs CAST_GROUP_COMMIT=1.
+#
+# Seeds --voters voters and one fresh vote per run, casts every voter once
+# through /api/vote/cast_mpc and reads MySQL's Com_commit / redo-log fsync
+# counters around each run.
+#   python -m bench.bench_group_commit --voters 5000 --batch-size 64 --flush-ms 5
+import argparse
+import asyncio
+
+import httpx
+
+from bench import seed
+from bench.common import hammer, start_server, stop_server
+
+STATUS_VARS = ("Com_commit", "Innodb_os_log_fsyncs", "Innodb_log_writes")
+
+
+def server_status(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SHOW GLOBAL STATUS WHERE Variable_name IN (%s, %s, %s)", STATUS_VARS)
+        return {k: int(v) for k, v in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+async def cast_all(port, vote_id, party_ids, fps, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        def call(i):
+            return client.post("/api/vote/cast_mpc", json={
+                "fingerprint": fps[i], "vote_id": vote_id, "party_id": party_ids[i % len(party_ids)],
+            })
+        res = await hammer("cast_vote_mpc", call, len(fps), concurrency, ok=lambda r: r.status_code == 200)
+        ingest = (await client.get("/api/admin/ingest")).json()
+        return res, ingest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="per-ballot commit vs group commit")
+    ap.add_argument("--voters", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=128)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--flush-ms", type=float, default=5)
+    ap.add_argument("--mode", default="async", choices=("sync", "async"))
+    ap.add_argument("--port", type=int, default=8767)
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    try:
+        fps = seed.seed_voters(conn, prefix, args.voters)
+        runs = (
+            ("per-ballot commit", {"CAST_GROUP_COMMIT": "0"}),
+            (f"group commit ({args.batch_size} rows / {args.flush_ms} ms)", {
+                "CAST_GROUP_COMMIT": "1", "CAST_BATCH_SIZE": str(args.batch_size),
+                "CAST_FLUSH_MS": str(args.flush_ms),
+            }),
+        )
+        for label, env in runs:
+            vote_id, party_ids = seed.seed_vote(conn, prefix)
+            env = {**env, "DB_MODE": args.mode, **seed.server_env()}
+            proc = start_server("main", args.port, env)
+            try:
+                before = server_status(conn)
+                res, ingest = asyncio.run(cast_all(args.port, vote_id, party_ids, fps, args.concurrency))
+                after = server_status(conn)
+            finally:
+                stop_server(proc)
+            delta = {k: after.get(k, 0) - before.get(k, 0) for k in STATUS_VARS}
+            print(f"\n== {label}")
+            print(res.row())
+            print(f"commits={delta['Com_commit']} ({delta['Com_commit'] / res.elapsed:.1f}/s)  "
+                  f"redo fsyncs={delta['Innodb_os_log_fsyncs']}  casts/commit="
+                  f"{res.count / max(1, delta['Com_commit']):.1f}")
+            if ingest.get("enabled"):
+                print(f"writer: avg_batch={ingest['avg_batch']} max_batch={ingest['max_batch']} "
+                      f"avg_flush_ms={ingest['avg_flush_ms']} replayed={ingest['replayed_batches']}")
+    finally:
+        seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench/bench_mpc_batch.py
+# cast_mpc ballots/sec against two real app_mpc share nodes, per-ballot 2PC
+# vs micro-batches (MPC_BATCH_WINDOW_MS) of increasing width.
+#
+# For every --windows value (0 = one 2PC per ballot) a coordinator and two
+# share nodes are started, --casts fresh voters cast with --concurrency
+# clients, and the coordinator's /api/admin/mpc/batches and the share nodes'
+# share_transactions row count are reported next to ballots/sec and latency.
+# The share totals are checked against the casts (the nodes' shares must add
+# up to the ballots per party).
+#
+# Share nodes use SQLite files next to BENCH_SQLITE_PATH, or the
+# BENCH_SHARE_DB_A / BENCH_SHARE_DB_B databases on the BENCH_DB_* server.
+#   python -m bench.bench_mpc_batch --casts 2000 --concurrency 32 --windows 0,2,5,10
+import argparse
+import asyncio
+import os
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from bench import seed
+from bench.common import hammer, start_server, stop_server
+
+MODULUS = 2**61 - 1
+
+
+def share_env(node: str) -> Dict[str, str]:
+    if seed.SQLITE_PATH:
+        base, _ = os.path.splitext(seed.SQLITE_PATH)
+        return {"SHARE_SQLITE_PATH": f"{base}-share-{node.lower()}.db"}
+    env = {f"SHARE_DB_{name}": str(seed.DB_CONFIG[key])
+           for key, name in (("host", "HOST"), ("user", "USER"), ("password", "PASS"))}
+    env["SHARE_DB_NAME"] = os.getenv(f"BENCH_SHARE_DB_{node}", f"voter_shares_{node.lower()}")
+    return env
+
+
+async def snapshot(base: str, path: str) -> Dict:
+    async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+        return (await client.get(path)).json()
+
+
+def share_totals(port_a: int, port_b: int, vote_id: int) -> Dict[int, int]:
+    """Per-party totals rebuilt from both nodes' shares, via the coordinator-side tally math."""
+    import app_mpc
+
+    out: Dict[int, int] = {}
+    snaps = [app_mpc.call_signed_get(f"http://127.0.0.1:{p}/internal/share/snapshot") for p in (port_a, port_b)]
+    for snap in snaps:
+        for s in snap["shares"]:
+            if int(s["vote_id"]) == vote_id:
+                out[int(s["party_id"])] = (out.get(int(s["party_id"]), 0) + int(s["share"])) % MODULUS
+    return out
+
+
+def run_window(args, window_ms: float) -> str:
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    port, port_a, port_b = args.port, args.port + 1, args.port + 2
+    procs = []
+    vote_id = None
+    try:
+        vote_id, party_ids = seed.seed_vote(conn, prefix)
+        fps = seed.seed_voters(conn, prefix, args.casts)
+        procs.append(start_server("app_mpc", port_a, {**share_env("A"), "MODE": "share", "NODE_ID": "A"}))
+        procs.append(start_server("app_mpc", port_b, {**share_env("B"), "MODE": "share", "NODE_ID": "B"}))
+        procs.append(start_server("app_mpc", port, {
+            **seed.server_env(), "MODE": "coordinator", "MPC_BATCH_WINDOW_MS": str(window_ms),
+            "SHARE_NODE_A_URL": f"http://127.0.0.1:{port_a}", "SHARE_NODE_B_URL": f"http://127.0.0.1:{port_b}",
+        }))
+        before = Counter({p: 0 for p in party_ids})
+        before.update(share_totals(port_a, port_b, vote_id))
+
+        async def cast():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                return await hammer(
+                    f"window {window_ms:g} ms",
+                    lambda i: client.post("/api/vote/cast_mpc", json={
+                        "fingerprint": fps[i], "vote_id": vote_id, "party_id": party_ids[i % len(party_ids)],
+                    }),
+                    args.casts, args.concurrency, ok=lambda r: r.status_code == 200,
+                )
+
+        res = asyncio.run(cast())
+        stats = asyncio.run(snapshot(f"http://127.0.0.1:{port}", "/api/admin/mpc/batches"))
+        expected = Counter(party_ids[i % len(party_ids)] for i in range(args.casts))
+        after = share_totals(port_a, port_b, vote_id)
+        ok = res.errors > 0 or all((after.get(p, 0) - before[p]) % MODULUS == expected[p] for p in party_ids)
+        batches = (f"avg batch {stats['avg_batch']:6.1f}  share rows/node {stats['share_rows_per_node']:6d}"
+                   if window_ms > 0 else f"avg batch {1:6.1f}  share rows/node {res.count - res.errors:6d}")
+        return (f"{res.name:<14} {res.rps:8.1f} ballots/s  p50 {res.pct_ms(50):7.1f} ms  "
+                f"p99 {res.pct_ms(99):7.1f} ms  errors {res.errors}  {batches}"
+                f"{'' if ok else '  TOTALS MISMATCH'}")
+    finally:
+        for p in procs:
+            stop_server(p)
+        if vote_id is not None:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM mpc_audit WHERE vote_id=%s", (vote_id,))
+            conn.commit(); cur.close()
+        seed.cleanup(conn, prefix)
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="cast_mpc ballots/sec: per-ballot 2PC vs micro-batched share transactions")
+    ap.add_argument("--casts", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--windows", default="0,2,5,10,20", help="MPC_BATCH_WINDOW_MS values, 0 = per ballot")
+    ap.add_argument("--port", type=int, default=8800, help="coordinator; share nodes use the next two")
+    args = ap.parse_args()
+
+    for w in [float(x) for x in args.windows.split(",")]:
+        print(run_window(args, w), flush=True)
+
+
+if __name__ == "__main__":
+    main()
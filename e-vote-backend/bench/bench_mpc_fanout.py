@@ -0,0 +1,167 @@
+# bench/bench_mpc_fanout.py
+# 2PC fan-out of app_mpc cast_mpc against local stand-in share nodes with
+# injected latency (--latency-a-ms / --latency-b-ms per call).
+#
+# The stand-ins answer every /internal/share/* call with {"status": "ok"}
+# after the delay, so only the coordinator's side is measured:
+#   sequential   prepare A, prepare B, commit A, commit B (the old cast_mpc)
+#   parallel     app_mpc.share_phase: each phase to both nodes at once
+# Expect ~2 x (a + b) vs ~2 x max(a, b) per ballot.
+#
+# --casts N also drives POST /api/vote/cast_mpc end to end on an app_mpc
+# coordinator pointed at the stand-ins (needs the BENCH_DB_* database or
+# BENCH_SQLITE_PATH for the coordinator tables).
+#   python -m bench.bench_mpc_fanout --latency-a-ms 20 --latency-b-ms 35
+#   python -m bench.bench_mpc_fanout --casts 500 --concurrency 16
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import httpx
+
+from bench import seed
+from bench.common import LoadResult, hammer, percentile, start_server, stop_server
+
+
+class StandInNode:
+    """A share node that only sleeps: every POST is answered after `latency` seconds."""
+
+    def __init__(self, port: int, latency: float):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive and TCP_NODELAY, like uvicorn
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                node.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("content-length") or 0))
+                time.sleep(node.latency)
+                node.calls += 1
+                self._reply({"status": "ok"})
+
+            def do_GET(self):
+                self._reply({"ok": True})
+
+            def _reply(self, body: Dict):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.calls = 0
+        self.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def two_pc(nodes: List[StandInNode], ballots: int) -> Dict[str, List[float]]:
+    import app_mpc
+
+    def payloads(i):
+        return [(name, n.url, {"tx_id": f"bench-{i}-{name}", "vote_id": 1, "party_id": 1, "delta": 1})
+                for name, n in zip("AB", nodes)]
+
+    def sequential(i):
+        for name, url, prep in payloads(i):
+            app_mpc.share_call(name, "prepare", f"{url}/internal/share/prepare", prep).raise_for_status()
+        for name, url, prep in payloads(i):
+            app_mpc.share_call(name, "commit", f"{url}/internal/share/commit", {"tx_id": prep["tx_id"]}).raise_for_status()
+
+    def parallel(i):
+        calls = payloads(i)
+        app_mpc.share_phase("prepare", [(n, f"{u}/internal/share/prepare", p) for n, u, p in calls], {})
+        app_mpc.share_phase("commit", [(n, f"{u}/internal/share/commit", {"tx_id": p["tx_id"]}) for n, u, p in calls], {})
+
+    out = {}
+    for label, fn in (("sequential", sequential), ("parallel", parallel)):
+        fn(-1)  # warm up connections / threads
+        samples = []
+        for i in range(ballots):
+            t0 = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - t0)
+        out[label] = sorted(samples)
+    return out
+
+
+def cast_run(args, nodes: List[StandInNode]) -> LoadResult:
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    vote_id = None
+    try:
+        vote_id, party_ids = seed.seed_vote(conn, prefix)
+        fps = seed.seed_voters(conn, prefix, args.casts)
+        proc = start_server("app_mpc", args.port, {
+            **seed.server_env(), "MODE": "coordinator",
+            "SHARE_NODE_A_URL": nodes[0].url, "SHARE_NODE_B_URL": nodes[1].url,
+        })
+        try:
+            async def run():
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=30) as client:
+                    return await hammer(
+                        "POST /api/vote/cast_mpc",
+                        lambda i: client.post("/api/vote/cast_mpc", json={
+                            "fingerprint": fps[i], "vote_id": vote_id, "party_id": party_ids[i % len(party_ids)],
+                        }),
+                        args.casts, args.concurrency, ok=lambda r: r.status_code == 200,
+                    )
+            return asyncio.run(run())
+        finally:
+            stop_server(proc)
+    finally:
+        if vote_id is not None:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM mpc_audit WHERE vote_id=%s", (vote_id,))
+            conn.commit(); cur.close()
+        seed.cleanup(conn, prefix)
+        conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="cast_mpc 2PC: sequential vs parallel share node calls")
+    ap.add_argument("--latency-a-ms", type=float, default=20.0)
+    ap.add_argument("--latency-b-ms", type=float, default=30.0)
+    ap.add_argument("--ballots", type=int, default=200, help="in-process 2PC rounds per variant")
+    ap.add_argument("--casts", type=int, default=0, help="also cast this many ballots through app_mpc")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--port", type=int, default=8790, help="coordinator; stand-ins use the next two")
+    args = ap.parse_args()
+
+    a, b = args.latency_a_ms / 1000, args.latency_b_ms / 1000
+    nodes = [StandInNode(args.port + 1, a), StandInNode(args.port + 2, b)]
+    try:
+        print(f"stand-in latency A {args.latency_a_ms:g} ms, B {args.latency_b_ms:g} ms: "
+              f"serial sum {2 * (a + b) * 1000:.0f} ms, slowest node per phase {2 * max(a, b) * 1000:.0f} ms")
+        for label, samples in two_pc(nodes, args.ballots).items():
+            print(f"{label:<12} p50 {percentile(samples, 50) * 1000:7.1f} ms  "
+                  f"p99 {percentile(samples, 99) * 1000:7.1f} ms  ({len(samples)} ballots)")
+        if args.casts:
+            print()
+            print(cast_run(args, nodes).row())
+    finally:
+        for n in nodes:
+            n.close()
+
+
+if __name__ == "__main__":
+    main()
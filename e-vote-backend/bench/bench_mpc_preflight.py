@@ -0,0 +1,145 @@
+# bench/bench_mpc_preflight.py
+# cast_mpc pre-flight (everything before the first share node call), against
+# the BENCH_DB_* database or BENCH_SQLITE_PATH:
+#   helpers     the old path: check_vote_open, voter lookup + double-vote
+#               SELECT, ensure_party_in_vote, each on a new connection
+#   helpers/1c  the same three helpers sharing one connection
+#   fused       mpc_preflight.reserve: one INSERT ... SELECT + commit
+# Each variant runs once per seeded voter; fused reservations are released
+# outside the timed section.
+#
+# --racers N then sends N concurrent pre-flights for one voter: the helpers
+# let all of them through to the 2PC, the reservation exactly one.
+#   python -m bench.bench_mpc_preflight --voters 2000 --racers 16
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List
+
+import mpc_preflight
+from bench import seed
+from bench.common import percentile
+
+
+def helpers(connect: Callable, vote_id: int, party_id: int, fingerprint: str) -> int:
+    """The three pre-flight helpers cast_mpc ran before the fused reservation (no writes)."""
+    conn = connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT status, start_at, end_at FROM votes WHERE id=%s", (vote_id,))
+        status, start_at, end_at = cur.fetchone()
+        now = datetime.utcnow()
+        assert status == "open" and not (start_at and now < start_at) and not (end_at and now > end_at)
+    finally:
+        cur.close(); conn.close()
+    conn = connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT id, full_name, nic, email FROM users WHERE fingerprint=%s", (fingerprint,))
+        user_id = int(cur.fetchone()[0])
+        cur.execute("SELECT id FROM vote_records WHERE vote_id=%s AND user_id=%s", (vote_id, user_id))
+        assert cur.fetchone() is None, "already voted"
+    finally:
+        cur.close(); conn.close()
+    conn = connect(); cur = conn.cursor()
+    try:
+        cur.execute("SELECT id FROM parties WHERE id=%s AND vote_id=%s AND is_active=1", (party_id, vote_id))
+        assert cur.fetchone()
+    finally:
+        cur.close(); conn.close()
+    return user_id
+
+
+class Shared:
+    """One connection for every helper; close() only ends the read transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __call__(self):
+        return self
+
+    def cursor(self, *a, **kw):
+        return self.conn.cursor(*a, **kw)
+
+    def close(self):
+        self.conn.rollback()
+
+
+def run(label: str, fn: Callable[[str], None], fps: List[str]) -> List[float]:
+    samples = []
+    for fp in fps:
+        t0 = time.perf_counter()
+        fn(fp)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    print(f"{label:<11} p50 {percentile(samples, 50) * 1000:7.3f} ms  p95 {percentile(samples, 95) * 1000:7.3f} ms  "
+          f"p99 {percentile(samples, 99) * 1000:7.3f} ms  ({len(samples)} voters)")
+    return samples
+
+
+def race(racers: int, attempt: Callable[[], None]) -> int:
+    passed = [0]
+    lock = threading.Lock()
+    go = threading.Barrier(racers)
+
+    def one():
+        go.wait()
+        try:
+            attempt()
+        except Exception:
+            return
+        with lock:
+            passed[0] += 1
+
+    ts = [threading.Thread(target=one) for _ in range(racers)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return passed[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="cast_mpc pre-flight: three helpers vs one fused reservation")
+    ap.add_argument("--voters", type=int, default=2000)
+    ap.add_argument("--racers", type=int, default=16, help="concurrent pre-flights for one voter")
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    try:
+        vote_id, party_ids = seed.seed_vote(conn, prefix)
+        fps = seed.seed_voters(conn, prefix, args.voters + 1)
+        racer_fp, fps = fps[-1], fps[:-1]
+        party_id = party_ids[0]
+        work = seed.connect()
+        reserved: List[int] = []
+
+        def fused(fp):
+            reserved.append(mpc_preflight.reserve(work, vote_id, party_id, fp))
+
+        run("helpers", lambda fp: helpers(seed.connect, vote_id, party_id, fp), fps)
+        run("helpers/1c", lambda fp: helpers(Shared(work), vote_id, party_id, fp), fps)
+        run("fused", fused, fps)
+        for record_id in reserved:
+            mpc_preflight.release(work, record_id)
+        work.close()
+
+        if args.racers > 1:
+            def fused_attempt():
+                c = seed.connect()
+                try:
+                    mpc_preflight.reserve(c, vote_id, party_id, racer_fp)
+                finally:
+                    c.close()
+
+            print(f"{args.racers} concurrent casts for one voter reaching the 2PC: "
+                  f"helpers {race(args.racers, lambda: helpers(seed.connect, vote_id, party_id, racer_fp))}, "
+                  f"fused {race(args.racers, fused_attempt)}")
+    finally:
+        seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
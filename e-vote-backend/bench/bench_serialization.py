@@ -0,0 +1,112 @@
+# bench/bench_serialization.py
+# CPU and memory per response for the list endpoints (no database): the old
+# handler path (dict literal + strftime per row, FastAPI's jsonable_encoder,
+# JSONResponse) vs fast_json.records + fast_json.JSON.
+#
+# Rows are shaped like the cursor tuples of GET /api/admin/voters and
+# GET /api/parties/{vote_id}. CPU is process time per response (median of
+# --repeat), memory is the traced peak while building one response.
+#   python -m bench.bench_serialization --rows 10000
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from main import PARTY_COLUMNS, VOTER_LIST_COLUMNS
+
+T0 = datetime(2026, 1, 1, 8, 0, 0)
+
+
+def voter_rows(n):
+    return [(n - i, f"Voter Name {i}", f"{199000000000 + i}", f"voter{i}@example.lk", f"07{i:08d}", f"fp-{i:012d}")
+            for i in range(n)]
+
+
+def party_rows(n):
+    return [(i + 1, 7, f"Party {i}", f"P{i}", f"https://example.lk/{i}.png", 1,
+             T0 + timedelta(seconds=i), T0 + timedelta(seconds=2 * i)) for i in range(n)]
+
+
+def old_voters(rows):
+    items = [{
+        "id": r[0],
+        "full_name": r[1],
+        "nic": r[2],
+        "email": r[3],
+        "mobile": r[4],
+        "fingerprint": r[5],
+    } for r in rows]
+    return JSONResponse(jsonable_encoder({"items": items, "limit": len(rows), "offset": 0})).body
+
+
+def new_voters(rows):
+    return fast_json.JSON({"items": fast_json.records(VOTER_LIST_COLUMNS, rows), "limit": len(rows), "offset": 0}).body
+
+
+def old_parties(rows):
+    parties = [{
+        "id": r[0],
+        "vote_id": r[1],
+        "name": r[2],
+        "code": r[3],
+        "symbol_url": r[4],
+        "is_active": bool(r[5]),
+        "created_at": r[6].strftime("%Y-%m-%d %H:%M:%S") if r[6] else None,
+        "updated_at": r[7].strftime("%Y-%m-%d %H:%M:%S") if r[7] else None,
+    } for r in rows]
+    return JSONResponse(jsonable_encoder({"parties": parties})).body
+
+
+def new_parties(rows):
+    parties = fast_json.records(PARTY_COLUMNS, rows)
+    for p in parties:
+        p["is_active"] = bool(p["is_active"])
+    return fast_json.JSON({"parties": parties}).body
+
+
+def cpu_ms(fn, rows, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.process_time()
+        fn(rows)
+        samples.append(time.process_time() - t0)
+    return statistics.median(samples) * 1000
+
+
+def peak_kib(fn, rows):
+    gc.collect()
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser(description="list endpoint serialization: jsonable_encoder vs fast_json")
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"encoder: {'orjson' if fast_json.orjson else 'stdlib json (orjson not installed)'}, rows={args.rows}")
+    print(f"{'endpoint':<10} {'path':<5} {'cpu ms':>9} {'peak KiB':>10} {'bytes':>10}")
+    for name, make, old, new in (("voters", voter_rows, old_voters, new_voters),
+                                 ("parties", party_rows, old_parties, new_parties)):
+        rows = make(args.rows)
+        if old(rows) != new(rows):
+            print(f"WARNING: {name} bodies differ")
+        res = {}
+        for label, fn in (("old", old), ("new", new)):
+            res[label] = (cpu_ms(fn, rows, args.repeat), peak_kib(fn, rows), len(fn(rows)))
+            print(f"{name:<10} {label:<5} {res[label][0]:9.2f} {res[label][1]:10.0f} {res[label][2]:10d}")
+        print(f"{'':<10} {'':<5} {res['old'][0] / res['new'][0]:8.1f}x {res['old'][1] / res['new'][1]:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench/bench_share_keepalive.py
+# Coordinator -> share node HTTP: a new connection per call (module-level
+# requests.post / requests.get, the old call_signed) vs app_mpc.share_clients
+# (one keep-alive pool per node, share_http.ShareClients).
+#
+# Runs against the bench_mpc_fanout stand-in nodes, so the share node's own
+# work is just --latency-ms. Reported per variant:
+#   calls/s      signed prepare calls from --threads threads for --seconds
+#   2PC p50/p99  one ballot, both phases to both nodes via share_phase
+#   conns        TCP connections the stand-ins accepted
+#   python -m bench.bench_share_keepalive --threads 16 --latency-ms 1
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+from bench.bench_mpc_fanout import StandInNode
+from bench.common import percentile
+
+
+class NewConnection:
+    """The old call path: requests.post / requests.get, one TCP connection per call."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+
+    def post(self, url: str, **kw) -> requests.Response:
+        return requests.post(url, timeout=self.timeout, **kw)
+
+    def get(self, url: str, **kw) -> requests.Response:
+        return requests.get(url, timeout=self.timeout, **kw)
+
+
+def throughput(nodes: List[StandInNode], threads: int, seconds: float) -> int:
+    import app_mpc
+
+    done = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(t: int):
+        i = 0
+        while time.perf_counter() < stop:
+            payload = {"tx_id": f"bench-{t}-{i}", "vote_id": 1, "party_id": 1, "delta": 1}
+            app_mpc.call_signed(f"{nodes[i % len(nodes)].url}/internal/share/prepare", payload).raise_for_status()
+            i += 1
+        done[t] = i
+
+    ts = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return sum(done)
+
+
+def two_pc(nodes: List[StandInNode], ballots: int) -> List[float]:
+    import app_mpc
+
+    samples = []
+    for i in range(ballots):
+        calls = [(name, n.url, {"tx_id": f"bench-{i}-{name}", "vote_id": 1, "party_id": 1, "delta": 1})
+                 for name, n in zip("AB", nodes)]
+        t0 = time.perf_counter()
+        app_mpc.share_phase("prepare", [(n, f"{u}/internal/share/prepare", p) for n, u, p in calls], {})
+        app_mpc.share_phase("commit", [(n, f"{u}/internal/share/commit", {"tx_id": p["tx_id"]}) for n, u, p in calls], {})
+        samples.append(time.perf_counter() - t0)
+    return sorted(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="share node calls: new connection per call vs keep-alive pool")
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--ballots", type=int, default=300, help="2PC rounds per variant")
+    ap.add_argument("--latency-ms", type=float, default=1.0)
+    ap.add_argument("--port", type=int, default=8795, help="stand-in A; B uses the next one")
+    args = ap.parse_args()
+
+    import app_mpc
+
+    nodes = [StandInNode(args.port, args.latency_ms / 1000), StandInNode(args.port + 1, args.latency_ms / 1000)]
+    pooled = app_mpc.share_clients
+    pooled.names = {n.url: name for name, n in zip("AB", nodes)}
+    variants = {"new-conn": NewConnection(app_mpc.HTTP_TIMEOUT), "keep-alive": pooled}
+
+    print(f"stand-in latency {args.latency_ms:g} ms, {args.threads} threads, pool size {pooled.pool_size}")
+    print(f"{'variant':<11} {'calls/s':>9} {'2PC p50 ms':>11} {'2PC p99 ms':>11} {'conns':>7}")
+    rate: Dict[str, float] = {}
+    try:
+        for label, clients in variants.items():
+            app_mpc.share_clients = clients
+            before = sum(n.connections for n in nodes)
+            rate[label] = throughput(nodes, args.threads, args.seconds) / args.seconds
+            samples = two_pc(nodes, args.ballots)
+            conns = sum(n.connections for n in nodes) - before
+            print(f"{label:<11} {rate[label]:9.0f} {percentile(samples, 50) * 1000:11.2f} "
+                  f"{percentile(samples, 99) * 1000:11.2f} {conns:7d}")
+        print(f"keep-alive / new-conn: {rate['keep-alive'] / rate['new-conn']:.2f}x calls/s")
+        for node, s in pooled.stats()["nodes"].items():
+            print(f"  node {node}: {s['requests']} requests on {s['connections_opened']} connections "
+                  f"(reuse {s['reuse_ratio']:.1%})")
+    finally:
+        app_mpc.share_clients = pooled
+        for n in nodes:
+            n.close()
+
+
+if __name__ == "__main__":
+    main()
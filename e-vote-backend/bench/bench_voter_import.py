@@ -0,0 +1,94 @@
+# bench/bench_voter_import.py
+# Voter-roll import throughput: POST /api/admin/voters/import (streamed,
+# executemany chunks) vs one POST /api/register per voter.
+#
+#   python -m bench.bench_voter_import --rows 200000 --batch-sizes 500,1000,5000
+# A few duplicate fingerprints are planted in every file to exercise the
+# per-row replay path.
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from bench import seed
+from bench.common import hammer, start_server, stop_server
+
+
+def voter(prefix, i, dup_every):
+    # every dup_every-th voter reuses the previous fingerprint -> per-row error
+    fp_i = i - 1 if dup_every and i and i % dup_every == 0 else i
+    return {
+        "full_name": f"{prefix} voter {i}", "nic": f"{prefix}-{i:09d}", "dob": "1990-01-01",
+        "mobile": f"07{i % 100000000:08d}", "email": f"{prefix}.{i}@bench.example",
+        "location_id": "L1", "administration": "A1", "electoral": "E1", "polling": "P1", "gn": "G1",
+        "fingerprint": f"{prefix}-fp-{fp_i}",
+    }
+
+
+async def body(prefix, start, n, dup_every, chunk_rows=2000):
+    buf = []
+    for i in range(start, start + n):
+        buf.append(json.dumps(voter(prefix, i, dup_every)))
+        if len(buf) >= chunk_rows:
+            yield ("\n".join(buf) + "\n").encode()
+            buf = []
+    if buf:
+        yield ("\n".join(buf) + "\n").encode()
+
+
+async def bulk(port, prefix, start, n, batch_size, dup_every):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        t0 = time.perf_counter()
+        r = await client.post(
+            "/api/admin/voters/import", params={"format": "ndjson", "batch_size": batch_size},
+            content=body(prefix, start, n, dup_every), headers={"content-type": "application/x-ndjson"},
+        )
+        r.raise_for_status()
+        return r.json(), time.perf_counter() - t0
+
+
+async def one_by_one(port, prefix, start, n, concurrency):
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        return await hammer(
+            "POST /api/register", lambda i: client.post("/api/register", json=voter(prefix, start + i, 0)),
+            n, concurrency, ok=lambda r: r.status_code == 200,
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="bulk voter import rows/sec")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--batch-sizes", default="500,1000,5000")
+    ap.add_argument("--dup-every", type=int, default=1000)
+    ap.add_argument("--single-rows", type=int, default=5000, help="rows for the one-by-one baseline")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--mode", default="async", choices=("sync", "async"))
+    ap.add_argument("--port", type=int, default=8768)
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = seed.run_prefix()
+    proc = start_server("main", args.port, {"DB_MODE": args.mode, **seed.server_env()})
+    try:
+        start = 0
+        res = asyncio.run(one_by_one(args.port, prefix, start, args.single_rows, args.concurrency))
+        start += args.single_rows
+        print(res.row())
+        print(f"{'one-by-one':<24}{res.count / res.elapsed:>10.0f} rows/s")
+        for bs in (int(b) for b in args.batch_sizes.split(",")):
+            report, elapsed = asyncio.run(bulk(args.port, prefix, start, args.rows, bs, args.dup_every))
+            start += args.rows
+            print(f"{'import batch=' + str(bs):<24}{args.rows / elapsed:>10.0f} rows/s  "
+                  f"inserted={report['inserted']} failed={report['failed']} batches={report['batches']} "
+                  f"status={report['status']}")
+    finally:
+        stop_server(proc)
+        seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/bench_voter_search.py
+# Admin voter search on a large users table: the old LIKE '%q%' / OFFSET
+# query vs voter_search.build_list_query (keyset + indexed prefix/FULLTEXT).
+#
+# Seeding millions of rows takes a while, so keep them between runs:
+#   python -m bench.bench_voter_search --users 2000000 --keep
+#   python -m bench.bench_voter_search --prefix bench-1a2b3c4d      # reuse, no seeding
+# Apply sql/003_users_search_indexes.sql first; without it the "new" column
+# measures the query shapes only.
+import argparse
+import time
+
+import voter_search
+from bench import seed
+from bench.common import percentile
+
+COLUMNS = "id, full_name, nic, email, mobile, fingerprint"
+
+
+def old_query(q, limit, offset):
+    if q:
+        like = f"%{q}%"
+        return (f"SELECT {COLUMNS} FROM users WHERE full_name LIKE %s OR nic LIKE %s OR email LIKE %s "
+                f"OR mobile LIKE %s ORDER BY id DESC LIMIT %s OFFSET %s", [like] * 4 + [limit, offset])
+    return f"SELECT {COLUMNS} FROM users ORDER BY id DESC LIMIT %s OFFSET %s", [limit, offset]
+
+
+def timed(cur, sql, args, repeat):
+    samples, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cur.execute(sql, args)
+        rows = len(cur.fetchall())
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return percentile(samples, 50) * 1000, percentile(samples, 99) * 1000, rows
+
+
+def id_at_offset(cur, offset):
+    cur.execute("SELECT id FROM users ORDER BY id DESC LIMIT 1 OFFSET %s", (offset,))
+    row = cur.fetchone()
+    return row[0] + 1 if row else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="admin voter search: LIKE/OFFSET vs keyset + indexes")
+    ap.add_argument("--users", type=int, default=2_000_000)
+    ap.add_argument("--batch", type=int, default=10_000)
+    ap.add_argument("--prefix", help="reuse voters seeded by an earlier --keep run")
+    ap.add_argument("--keep", action="store_true", help="leave the seeded voters in place")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    conn = seed.connect()
+    prefix = args.prefix or seed.run_prefix()
+    cur = conn.cursor()
+    try:
+        if not args.prefix:
+            t0 = time.perf_counter()
+            seed.seed_voters(conn, prefix, args.users, batch=args.batch)
+            print(f"seeded {args.users} voters as {prefix} in {time.perf_counter() - t0:.1f}s")
+        cur.execute("SELECT COUNT(*) FROM users")
+        print(f"users table: {cur.fetchone()[0]} rows\n")
+
+        k = args.users // 2
+        deep = min(args.users - args.limit, 500_000)
+        cases = [
+            ("first page", None, 0),
+            (f"page at offset {deep}", None, deep),
+            ("email exact", f"{prefix}.{k}@bench.example", 0),
+            ("mobile prefix", f"07{k % 100000000:08d}"[:7], 0),
+            ("name words", f"voter {k}", 0),
+            ("short name", "vo", 0),
+        ]
+        print(f"{'case':<28}{'old p50':>10}{'old p99':>10}{'new p50':>10}{'new p99':>10}{'rows':>7}")
+        for label, q, offset in cases:
+            o50, o99, orows = timed(cur, *old_query(q, args.limit, offset), args.repeat)
+            # deep pages: the keyset equivalent of OFFSET n is "id < id at n"
+            after_id = id_at_offset(cur, offset) if offset else None
+            sql, qargs = voter_search.build_list_query(COLUMNS, q, args.limit, 0, after_id)
+            n50, n99, nrows = timed(cur, sql, qargs, args.repeat)
+            print(f"{label:<28}{o50:>10.2f}{o99:>10.2f}{n50:>10.2f}{n99:>10.2f}{nrows:>7}"
+                  + ("" if q is None or nrows == orows else f"  (old returned {orows})"))
+    finally:
+        cur.close()
+        if not args.keep and not args.prefix:
+            seed.cleanup(conn, prefix)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench/common.py
+# Small helpers shared by the benchmark scripts: spawn the API under uvicorn,
+# drive it with N concurrent clients and summarise throughput / latency.
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+class LoadResult:
+    def __init__(self, name: str, latencies: List[float], errors: int, elapsed: float,
+                 statuses: Optional[Dict[int, int]] = None):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+        self.statuses = statuses or {}
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def rps(self) -> float:
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def pct_ms(self, p: float) -> float:
+        return percentile(self.latencies, p) * 1000.0
+
+    def row(self) -> str:
+        return (f"{self.name:<28} {self.count:>7} req  {self.rps:>9.1f} req/s  "
+                f"p50 {self.pct_ms(50):>7.2f} ms  p95 {self.pct_ms(95):>7.2f} ms  "
+                f"p99 {self.pct_ms(99):>7.2f} ms  errors {self.errors}")
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "name": self.name, "requests": self.count, "rps": round(self.rps, 1),
+            "p50_ms": round(self.pct_ms(50), 2), "p95_ms": round(self.pct_ms(95), 2),
+            "p99_ms": round(self.pct_ms(99), 2), "errors": self.errors,
+            "statuses": dict(self.statuses),
+        }
+
+
+async def hammer(name: str, call: Callable[[int], Awaitable[httpx.Response]],
+                 total: int, concurrency: int, ok=lambda r: r.status_code < 500) -> LoadResult:
+    """Run `call(i)` for i in range(total) with `concurrency` workers in flight."""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                r = await call(i)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            if not ok(r):
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return LoadResult(name, latencies, errors, time.perf_counter() - t0, statuses)
+
+
+def start_server(module: str, port: int, env: Optional[Dict[str, str]] = None, workers: int = 1) -> subprocess.Popen:
+    """Launch `uvicorn <module>:app` from the backend dir and wait for /health."""
+    full_env = dict(os.environ)
+    full_env.update(env or {})
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=full_env,
+    )
+    url = f"http://127.0.0.1:{port}/health"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{module} exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{module} did not become healthy on port {port}")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
@@ -0,0 +1,122 @@
+# bench/seed.py
+# Seed a disposable voter_db with synthetic voters / votes / parties.
+# Everything created here is tagged with a run prefix so it can be removed.
+# BENCH_SQLITE_PATH seeds an embedded SQLite file instead (main.py DB_MODE=sqlite).
+import os
+import uuid
+from typing import Dict, List, Tuple
+
+import mysql.connector
+
+DB_CONFIG = {
+    "host": os.getenv("BENCH_DB_HOST", "localhost"),
+    "port": int(os.getenv("BENCH_DB_PORT", "3306")),
+    "user": os.getenv("BENCH_DB_USER", "root"),
+    "password": os.getenv("BENCH_DB_PASS", ""),
+    "database": os.getenv("BENCH_DB_NAME", "voter_db"),
+    "autocommit": False,
+}
+SQLITE_PATH = os.getenv("BENCH_SQLITE_PATH", "")
+
+
+def connect():
+    if SQLITE_PATH:
+        import sqlite_store
+        return sqlite_store.connect(SQLITE_PATH)
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def server_env() -> Dict[str, str]:
+    """Env that points main.py (DB_*) and the app_mpc coordinator (COORD_DB_*) at the bench database.
+
+    Merge it last: with BENCH_SQLITE_PATH set it also forces DB_MODE=sqlite.
+    """
+    env = {}
+    for key, name in (("host", "HOST"), ("user", "USER"), ("password", "PASS"), ("database", "NAME")):
+        env[f"DB_{name}"] = env[f"COORD_DB_{name}"] = str(DB_CONFIG[key])
+    env["DB_PORT"] = str(DB_CONFIG["port"])
+    if SQLITE_PATH:
+        env.update(DB_MODE="sqlite", SQLITE_PATH=SQLITE_PATH, COORD_SQLITE_PATH=SQLITE_PATH)
+    return env
+
+
+def run_prefix() -> str:
+    return "bench-" + uuid.uuid4().hex[:8]
+
+
+def seed_vote(conn, prefix: str, parties: int = 4, status: str = "open") -> Tuple[int, List[int]]:
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "INSERT INTO votes (title, description, status) VALUES (%s, %s, %s)",
+            (f"{prefix} vote", "benchmark", status),
+        )
+        vote_id = cur.lastrowid
+        party_ids = []
+        for i in range(parties):
+            cur.execute(
+                "INSERT INTO parties (vote_id, name, code, is_active) VALUES (%s, %s, %s, 1)",
+                (vote_id, f"{prefix} party {i}", f"P{i}"),
+            )
+            party_ids.append(cur.lastrowid)
+        conn.commit()
+        return vote_id, party_ids
+    finally:
+        cur.close()
+
+
+def voter_row(prefix: str, i: int, geo: Dict[str, str] = None) -> tuple:
+    geo = geo or {}
+    return (
+        f"{prefix} voter {i}", f"{prefix}-{i:09d}", "1990-01-01", None, None,
+        f"07{i % 100000000:08d}", f"{prefix}.{i}@bench.example",
+        geo.get("location_id", "L1"), geo.get("administration", "A1"),
+        geo.get("electoral", "E1"), geo.get("polling", "P1"), geo.get("gn", "G1"),
+        f"{prefix}-fp-{i}",
+    )
+
+
+def seed_voters(conn, prefix: str, n: int, batch: int = 5000, geo_fn=None) -> List[str]:
+    """Insert n voters; returns their fingerprints (index i -> f"{prefix}-fp-{i}")."""
+    cur = conn.cursor()
+    try:
+        rows = []
+        for i in range(n):
+            rows.append(voter_row(prefix, i, geo_fn(i) if geo_fn else None))
+            if len(rows) >= batch:
+                _insert_voters(cur, rows)
+                conn.commit()
+                rows = []
+        if rows:
+            _insert_voters(cur, rows)
+            conn.commit()
+        return [f"{prefix}-fp-{i}" for i in range(n)]
+    finally:
+        cur.close()
+
+
+def _insert_voters(cur, rows):
+    cur.executemany(
+        """INSERT INTO users (full_name, nic, dob, gender, household, mobile, email,
+               location_id, administration, electoral, polling, gn, fingerprint)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        rows,
+    )
+
+
+def cleanup(conn, prefix: str):
+    """Remove everything a run created (vote_records first because of the FKs)."""
+    cur = conn.cursor()
+    try:
+        like = prefix + "%"
+        runs = "SELECT id FROM votes WHERE title LIKE %s"
+        cur.execute(f"DELETE FROM vote_records WHERE vote_id IN ({runs})", (like,))
+        cur.execute(f"DELETE FROM vote_party_totals WHERE vote_id IN ({runs})", (like,))
+        cur.execute(f"DELETE FROM vote_turnout WHERE vote_id IN ({runs})", (like,))
+        cur.execute(f"DELETE FROM vote_turnout_series WHERE vote_id IN ({runs})", (like,))
+        cur.execute(f"DELETE FROM parties WHERE vote_id IN ({runs})", (like,))
+        cur.execute("DELETE FROM votes WHERE title LIKE %s", (like,))
+        cur.execute("DELETE FROM users WHERE nic LIKE %s", (like,))
+        conn.commit()
+    finally:
+        cur.close()
@@ -0,0 +1,135 @@
+# cast_engine.py
+# One-statement cast for /api/vote/cast_mpc.
+#
+# The old path was five sequential statements (vote, party, user, double-vote
+# SELECT, INSERT) and the SELECT-then-INSERT could race. Here validation and
+# the insert are a single INSERT ... SELECT: it only produces a row when the
+# vote exists, the party is active in that vote and the fingerprint belongs
+# to a voter. The one-vote rule is the uq_vote_records_vote_user key
+# (sql/001_vote_records_one_vote_per_voter.sql), so a duplicate fails with
+# ER_DUP_ENTRY instead of slipping through.
+#
+# Only the failure path pays for a second query, to tell the caller which
+# 404 it was.
+#
+# When the caller already knows the voter (fingerprint_index hit) it passes
+# user_id and users is joined by primary key, still matching the fingerprint:
+# the index may be stale (a voter edited or deleted by another worker or by
+# app_mpc), and a stale hit is then handled as a miss.
+from typing import Optional
+
+import mysql.connector
+from fastapi import HTTPException
+
+ER_DUP_ENTRY = 1062
+ER_NO_REFERENCED_ROW_2 = 1452
+
+CAST_SQL = """
+    INSERT INTO vote_records (vote_id, user_id, party_id)
+    SELECT v.id, u.id, p.id
+    FROM votes v
+    JOIN parties p ON p.id = %s AND p.vote_id = v.id AND p.is_active = 1
+    JOIN users u ON u.fingerprint = %s
+    WHERE v.id = %s
+"""
+
+CAST_BY_USER_SQL = """
+    INSERT INTO vote_records (vote_id, user_id, party_id)
+    SELECT v.id, u.id, p.id
+    FROM votes v
+    JOIN parties p ON p.id = %s AND p.vote_id = v.id AND p.is_active = 1
+    JOIN users u ON u.id = %s AND u.fingerprint = %s
+    WHERE v.id = %s
+"""
+
+DIAGNOSE_SQL = """
+    SELECT
+      (SELECT COUNT(*) FROM votes WHERE id = %s),
+      (SELECT COUNT(*) FROM parties WHERE id = %s AND vote_id = %s AND is_active = 1),
+      (SELECT COUNT(*) FROM users WHERE fingerprint = %s)
+"""
+
+VALIDATE_SQL = """
+    SELECT
+      (SELECT COUNT(*) FROM votes WHERE id = %s),
+      (SELECT COUNT(*) FROM parties WHERE id = %s AND vote_id = %s AND is_active = 1),
+      u.id,
+      (SELECT COUNT(*) FROM vote_records r WHERE r.vote_id = %s AND r.user_id = u.id)
+    FROM (SELECT 1) one
+    LEFT JOIN users u ON u.fingerprint = %s
+"""
+
+VALIDATE_BY_USER_SQL = """
+    SELECT
+      (SELECT COUNT(*) FROM votes WHERE id = %s),
+      (SELECT COUNT(*) FROM parties WHERE id = %s AND vote_id = %s AND is_active = 1),
+      u.id,
+      (SELECT COUNT(*) FROM vote_records r WHERE r.vote_id = %s AND r.user_id = u.id)
+    FROM (SELECT 1) one
+    LEFT JOIN users u ON u.id = %s AND u.fingerprint = %s
+"""
+
+
+async def cast(cur, vote_id: int, party_id: int, fingerprint: str, user_id: Optional[int] = None) -> Optional[int]:
+    """Insert the ballot or raise the HTTPException the old path would have.
+
+    Returns user_id when the ballot was recorded for it, None when the insert
+    resolved the voter by fingerprint (no user_id, or a stale one). The caller
+    owns the transaction.
+    """
+    try:
+        if user_id is not None:
+            await cur.execute(CAST_BY_USER_SQL, (party_id, user_id, fingerprint, vote_id))
+            if cur.rowcount == 1:
+                return user_id
+        # no index hit, or a stale one (or a failed check, which the diagnose below names)
+        await cur.execute(CAST_SQL, (party_id, fingerprint, vote_id))
+    except mysql.connector.IntegrityError as e:
+        if e.errno == ER_DUP_ENTRY:
+            raise HTTPException(status_code=409, detail="User has already voted")
+        if e.errno == ER_NO_REFERENCED_ROW_2:
+            # the voter was deleted after the caller looked it up
+            raise HTTPException(status_code=404, detail="User not found")
+        raise
+    if cur.rowcount == 1:
+        return None
+
+    # nothing inserted: find out which check failed (same order as before)
+    await cur.execute(DIAGNOSE_SQL, (vote_id, party_id, vote_id, fingerprint))
+    has_vote, has_party, has_user = await cur.fetchone()
+    _raise_for(has_vote, has_party, has_user)
+    # everything exists now, so a concurrent admin change raced the insert
+    raise HTTPException(status_code=409, detail="Vote could not be recorded, please retry")
+
+
+async def validate(cur, vote_id: int, party_id: Optional[int], fingerprint: str,
+                   user_id: Optional[int] = None) -> int:
+    """All cast checks in one read, without inserting (used by the group-commit path).
+
+    Returns the voter's user_id. party_id=None is the legacy /api/vote/cast,
+    which only checked the voter and the double vote.
+    """
+    row = None
+    if user_id is not None:
+        await cur.execute(VALIDATE_BY_USER_SQL, (vote_id, party_id, vote_id, vote_id, user_id, fingerprint))
+        row = await cur.fetchone()
+    if row is None or row[2] is None:
+        # no index hit, or a stale one
+        await cur.execute(VALIDATE_SQL, (vote_id, party_id, vote_id, vote_id, fingerprint))
+        row = await cur.fetchone()
+    has_vote, has_party, user_id, voted = row
+    if party_id is None:
+        has_vote = has_party = 1
+    _raise_for(has_vote, has_party, user_id)
+    if voted:
+        raise HTTPException(status_code=409, detail="User has already voted")
+    return int(user_id)
+
+
+def _raise_for(has_vote, has_party, has_user):
+    if not has_vote:
+        raise HTTPException(status_code=404, detail="Vote not found")
+    if not has_party:
+        raise HTTPException(status_code=404, detail="Party not found for this vote or inactive")
+    if not has_user:
+        raise HTTPException(status_code=404, detail="User not found")
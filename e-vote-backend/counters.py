@@ -0,0 +1,151 @@
+# counters.py
+# Materialized per-party vote counters (sql/002_vote_party_totals.sql).
+#
+#   bump()          inside the cast transaction: vote_party_totals += n
+#   PartyCounters   in-process copy keyed by (vote_id, party_id); filled from
+#                   the table on first read, advanced after each local commit
+#                   and re-read after `ttl` seconds so other workers' casts
+#                   show up
+#   verify()        recompute from vote_records, report drift, optionally fix
+#
+# CLI:  python -m counters verify [--vote-id N] [--fix]
+import argparse
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+UPSERT_SQL = """
+    INSERT INTO vote_party_totals (vote_id, party_id, votes) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE votes = votes + VALUES(votes)
+"""
+
+
+def tally(rows: Iterable[Tuple[int, int, Optional[int]]]) -> Dict[Tuple[int, int], int]:
+    """(vote_id, user_id, party_id) rows -> {(vote_id, party_id): n}; legacy party-less rows are skipped."""
+    c: Dict[Tuple[int, int], int] = Counter()
+    for vote_id, _user_id, party_id in rows:
+        if party_id is not None:
+            c[(vote_id, party_id)] += 1
+    return dict(c)
+
+
+async def bump(cur, deltas: Dict[Tuple[int, int], int]):
+    if not deltas:
+        return
+    # sorted so concurrent transactions lock counter rows in the same order
+    params = [(v, p, n) for (v, p), n in sorted(deltas.items())]
+    if len(params) == 1:
+        await cur.execute(UPSERT_SQL, params[0])
+    else:
+        await cur.executemany(UPSERT_SQL, params)
+
+
+async def load(cur, vote_id: int) -> Dict[int, int]:
+    await cur.execute("SELECT party_id, votes FROM vote_party_totals WHERE vote_id = %s", (vote_id,))
+    return {int(p): int(n) for p, n in await cur.fetchall()}
+
+
+class PartyCounters:
+    def __init__(self, ttl: float = 2.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._votes: Dict[int, Tuple[float, Dict[int, int]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, vote_id: int) -> Optional[Dict[int, int]]:
+        with self._lock:
+            entry = self._votes.get(vote_id)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            return None
+
+    def put(self, vote_id: int, counts: Dict[int, int]):
+        with self._lock:
+            self._votes[vote_id] = (time.monotonic(), dict(counts))
+
+    def add(self, deltas: Dict[Tuple[int, int], int]):
+        """Apply committed casts; votes not loaded yet are picked up on first read."""
+        with self._lock:
+            for (vote_id, party_id), n in deltas.items():
+                entry = self._votes.get(vote_id)
+                if entry:
+                    entry[1][party_id] = entry[1].get(party_id, 0) + n
+
+    def invalidate(self, vote_id: Optional[int] = None):
+        with self._lock:
+            if vote_id is None:
+                self._votes.clear()
+            else:
+                self._votes.pop(vote_id, None)
+
+
+# ---------------- Verify / rebuild ----------------
+async def verify(conn, vote_id: Optional[int] = None, fix: bool = False) -> Dict[str, Any]:
+    """Compare vote_party_totals with COUNT(*) over vote_records.
+
+    The counter rows are locked FOR UPDATE first, so casts for the checked
+    vote(s) wait until we are done and the comparison is exact; with fix=True
+    drifted rows are rewritten in the same transaction.
+    """
+    cur = await conn.cursor()
+    try:
+        where, args = ("WHERE vote_id = %s", (vote_id,)) if vote_id else ("", ())
+        await cur.execute(f"SELECT vote_id, party_id, votes FROM vote_party_totals {where} FOR UPDATE", args)
+        stored = {(int(v), int(p)): int(n) for v, p, n in await cur.fetchall()}
+        await cur.execute(
+            f"""SELECT vote_id, party_id, COUNT(*) FROM vote_records
+                {where + ' AND' if where else 'WHERE'} party_id IS NOT NULL AND status = 'cast'
+                GROUP BY vote_id, party_id""",
+            args,
+        )
+        actual = {(int(v), int(p)): int(n) for v, p, n in await cur.fetchall()}
+
+        drift: List[Dict[str, int]] = []
+        for key in sorted(set(stored) | set(actual)):
+            s, a = stored.get(key, 0), actual.get(key, 0)
+            if s != a:
+                drift.append({"vote_id": key[0], "party_id": key[1], "stored": s, "actual": a})
+
+        if fix and drift:
+            await cur.executemany(
+                """INSERT INTO vote_party_totals (vote_id, party_id, votes) VALUES (%s, %s, %s)
+                   ON DUPLICATE KEY UPDATE votes = VALUES(votes)""",
+                [(d["vote_id"], d["party_id"], d["actual"]) for d in drift],
+            )
+        await conn.commit()
+        return {"checked": len(set(stored) | set(actual)), "drift": drift, "fixed": bool(fix and drift)}
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await cur.close()
+
+
+async def _cli(args):
+    from main import apool  # reuse main.py's DB settings and pool
+
+    await apool.open()
+    conn = await apool.acquire()
+    try:
+        report = await verify(conn, args.vote_id, fix=args.fix)
+    finally:
+        await conn.close()
+        await apool.close()
+    for d in report["drift"]:
+        print(f"vote {d['vote_id']} party {d['party_id']}: stored {d['stored']} actual {d['actual']}")
+    print(f"checked {report['checked']} counters, {len(report['drift'])} drifted"
+          + (", fixed" if report["fixed"] else ""))
+    return 1 if report["drift"] and not report["fixed"] else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="verify/rebuild vote_party_totals from vote_records")
+    ap.add_argument("command", choices=("verify",))
+    ap.add_argument("--vote-id", type=int)
+    ap.add_argument("--fix", action="store_true", help="rewrite drifted counters")
+    raise SystemExit(asyncio.run(_cli(ap.parse_args())))
@@ -0,0 +1,329 @@
+# dal.py
+# Async data-access layer shared by the main.py endpoints.
+#
+#   DB_MODE=sync   blocking mysql.connector connections (db_pool.ElasticPool);
+#                  every blocking call is pushed to the threadpool so handlers
+#                  can still be `async def`
+#   DB_MODE=async  native asyncio connections (mysql.connector.aio) kept in
+#                  NativePool; no thread is held while MySQL is working
+#   DB_MODE=sqlite embedded SQLite file (sqlite_store.py) in the same blocking
+#                  pool as sync mode; no MySQL server needed
+#
+# Both modes hand out objects with the same awaitable surface:
+#   conn, cur = await adb()
+#   await cur.execute(...); row = await cur.fetchone(); await conn.commit()
+#   await cur.close(); await conn.close()
+# and both raise the regular mysql.connector.Error family. Cursors come wrapped
+# in metrics.AsyncTimedCursor, so every execute lands in /metrics.
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Sequence
+
+import mysql.connector
+from mysql.connector import aio as mysql_aio
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+from db_pool import PoolExhausted, PoolStats
+
+
+# ---------------- Sync (threadpool) mode ----------------
+class ThreadedCursor:
+    """Awaitable facade over a blocking mysql.connector cursor."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._cur.lastrowid
+
+    async def execute(self, sql: str, params: Optional[Sequence[Any]] = None):
+        return await run_in_threadpool(self._cur.execute, sql, params)
+
+    async def executemany(self, sql: str, seq_params: Sequence[Sequence[Any]]):
+        return await run_in_threadpool(self._cur.executemany, sql, seq_params)
+
+    async def fetchone(self):
+        return await run_in_threadpool(self._cur.fetchone)
+
+    async def fetchmany(self, size: int = 1):
+        return await run_in_threadpool(self._cur.fetchmany, size)
+
+    async def fetchall(self):
+        return await run_in_threadpool(self._cur.fetchall)
+
+    async def close(self):
+        # cheap and local for the pure-python connector, but it may have to
+        # drain an unread result set, so keep it off the event loop too
+        return await run_in_threadpool(self._cur.close)
+
+
+class ThreadedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    @property
+    def raw(self):
+        return self._conn
+
+    async def cursor(self, **kwargs) -> metrics.AsyncTimedCursor:
+        return metrics.AsyncTimedCursor(ThreadedCursor(self._conn.cursor(**kwargs)))
+
+    async def commit(self):
+        return await run_in_threadpool(self._conn.commit)
+
+    async def rollback(self):
+        return await run_in_threadpool(self._conn.rollback)
+
+    async def close(self):
+        # db_pool.PooledConnection.close() resets the session and hands it back
+        return await run_in_threadpool(self._conn.close)
+
+    async def discard(self):
+        return await run_in_threadpool(self._conn.discard)
+
+
+class ThreadedPool:
+    """Wraps the blocking db_pool.ElasticPool."""
+
+    mode = "sync"
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    async def open(self):
+        return await run_in_threadpool(self._pool.open)
+
+    async def acquire(self) -> ThreadedConnection:
+        conn = await run_in_threadpool(self._pool.get_connection)
+        return ThreadedConnection(conn)
+
+    async def close(self):
+        return await run_in_threadpool(self._pool.close)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._pool.snapshot()
+
+
+# ---------------- Native asyncio mode ----------------
+class NativeConnection:
+    """A pooled mysql.connector.aio connection; close() returns it to the pool."""
+
+    def __init__(self, pool: "NativePool", conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    @property
+    def raw(self):
+        return self._conn
+
+    async def cursor(self, **kwargs):
+        return metrics.AsyncTimedCursor(await self._conn.cursor(**kwargs))
+
+    async def commit(self):
+        return await self._conn.commit()
+
+    async def rollback(self):
+        return await self._conn.rollback()
+
+    async def close(self):
+        if self._released:
+            return
+        self._released = True
+        await self._pool.release(self._conn)
+
+    async def discard(self):
+        """Close instead of returning it; for results that cannot be drained cheaply."""
+        if self._released:
+            return
+        self._released = True
+        await self._pool.discard(self._conn)
+
+
+class NativePool:
+    """asyncio twin of db_pool.ElasticPool for mysql.connector.aio connections.
+
+    Same knobs (min/max size, bounded wait queue, checkout timeout, idle
+    reaping) and the same PoolStats counters.
+    """
+
+    mode = "async"
+
+    def __init__(
+        self,
+        dbconfig: Dict[str, Any],
+        min_size: int = 2,
+        max_size: int = 20,
+        max_waiters: int = 256,
+        checkout_timeout: float = 5.0,
+        idle_timeout: float = 60.0,
+        ping_after: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("need 0 <= min_size <= max_size and max_size >= 1")
+        self._config = dict(dbconfig)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_waiters = max_waiters
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = deque()       # (conn, idle_since); right end = most recently used
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._cond = asyncio.Condition()
+        self.stats = PoolStats()
+
+    async def _open_one(self):
+        try:
+            conn = await mysql_aio.connect(**self._config)
+        except Exception:
+            async with self._cond:
+                self._size -= 1
+                self.stats.connect_errors += 1
+                self._cond.notify()
+            raise
+        self.stats.opened += 1
+        return conn
+
+    def _reap_idle(self, now: float) -> list:
+        doomed = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            doomed.append(self._idle.popleft()[0])
+            self._size -= 1
+            self.stats.closed += 1
+        return doomed
+
+    async def open(self):
+        # warm min_size connections so a bad config fails at startup, not on first vote
+        while self._size < self.min_size:
+            self._size += 1
+            conn = await self._open_one()
+            async with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    async def acquire(self) -> NativeConnection:
+        t0 = time.monotonic()
+        deadline = t0 + self.checkout_timeout
+        queued = False
+        while True:
+            conn, since, create, doomed = None, 0.0, False, []
+            try:
+                async with self._cond:
+                    while True:
+                        now = time.monotonic()
+                        doomed.extend(self._reap_idle(now))
+                        if self._idle:
+                            conn, since = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            create = True
+                            break
+                        if self._waiters >= self.max_waiters:
+                            self.stats.rejected += 1
+                            raise PoolExhausted(f"Connection pool wait queue is full ({self.max_waiters} waiting)")
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.stats.timeouts += 1
+                            raise PoolExhausted(f"No connection available within {self.checkout_timeout:.1f}s")
+                        queued = True
+                        self._waiters += 1
+                        self.stats.peak_waiters = max(self.stats.peak_waiters, self._waiters)
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        finally:
+                            self._waiters -= 1
+            finally:
+                for d in doomed:
+                    await _close_quietly(d)
+
+            if create:
+                conn = await self._open_one()
+            elif time.monotonic() - since > self.ping_after and not await conn.is_connected():
+                await _close_quietly(conn)
+                async with self._cond:
+                    self._size -= 1
+                    self.stats.closed += 1
+                    self._cond.notify()
+                continue
+
+            self._in_use += 1
+            self.stats.record_checkout(time.monotonic() - t0, queued, self._in_use)
+            return NativeConnection(self, conn)
+
+    async def release(self, conn):
+        try:
+            # drop anything the handler left behind (uncommitted tx, unread rows)
+            if conn.unread_result:
+                await conn.consume_results()
+            if conn.in_transaction:
+                await conn.rollback()
+            healthy = True
+        except mysql.connector.Error:
+            healthy = False
+            await _close_quietly(conn)
+        async with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            if healthy:
+                self._idle.append((conn, now))
+            else:
+                self._size -= 1
+                self.stats.closed += 1
+            doomed = self._reap_idle(now)
+            self._cond.notify()
+        for d in doomed:
+            await _close_quietly(d)
+
+    async def discard(self, conn):
+        await _close_quietly(conn)
+        async with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self.stats.closed += 1
+            self._cond.notify()
+
+    async def close(self):
+        conns = [c for c, _ in self._idle]
+        self._idle.clear()
+        self._size -= len(conns)
+        self.stats.closed += len(conns)
+        for c in conns:
+            await _close_quietly(c)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.stats.snapshot(
+            mode="async", size=self._size, in_use=self._in_use, idle=len(self._idle),
+            waiters=self._waiters, min_size=self.min_size, max_size=self.max_size,
+            max_waiters=self.max_waiters, checkout_timeout_s=self.checkout_timeout,
+        )
+
+
+async def _close_quietly(conn):
+    try:
+        await conn.close()
+    except Exception:
+        pass
+
+
+def make_pool(mode: str, dbconfig: Dict[str, Any], sync_pool=None, **pool_kwargs):
+    """Pick the backend for DB_MODE ("sync" / "sqlite" wrap the blocking db_pool.ElasticPool)."""
+    if mode == "async":
+        return NativePool(dbconfig, **pool_kwargs)
+    if mode in ("sync", "sqlite"):
+        if sync_pool is None:
+            raise ValueError(f"{mode} mode needs the blocking pool")
+        return ThreadedPool(sync_pool)
+    raise ValueError(f"Unknown DB_MODE: {mode}")
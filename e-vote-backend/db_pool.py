@@ -0,0 +1,366 @@
+# db_pool.py
+# Self-sizing MySQL connection pool with a bounded wait queue.
+#
+# mysql.connector's MySQLConnectionPool has a fixed size and raises as soon as
+# it is empty, so a burst of voters turns straight into 500s. ElasticPool:
+#   - keeps between min_size and max_size connections open
+#   - grows on demand, and closes connections idle for idle_timeout (down to min_size)
+#   - queues checkouts when everything is busy (at most max_waiters, each for at
+#     most checkout_timeout seconds) and raises PoolExhausted after that
+#   - records wait time / in-use / exhaustion counters in PoolStats
+#
+# RequestScope (ASGI middleware) + scoped_connection() give each HTTP request
+# one connection per pool, checked out on first use and shared by every helper
+# the handler calls; a helper's close() only ends its transaction (app_mpc).
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+class PoolExhausted(PoolError):
+    """No connection became free within the checkout timeout (or the wait queue is full)."""
+
+
+class PoolStats:
+    """Counters shared by the sync and asyncio pools. Callers hold the pool lock."""
+
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waited = 0            # checkouts that found the pool saturated and queued
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+        self.timeouts = 0          # gave up after checkout_timeout
+        self.rejected = 0          # wait queue already full
+        self.opened = 0
+        self.closed = 0            # reaped idle + discarded broken connections
+        self.connect_errors = 0
+        self.peak_in_use = 0
+        self.peak_waiters = 0
+        self.scoped_reuses = 0     # scoped_connection() calls served by the request's connection
+
+    def record_checkout(self, wait: float, queued: bool, in_use: int):
+        self.checkouts += 1
+        if queued:
+            self.waited += 1
+        self.wait_sum += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
+        for i, le in enumerate(self.WAIT_BUCKETS):
+            if wait <= le:
+                self.wait_buckets[i] += 1
+                break
+        else:
+            self.wait_buckets[-1] += 1
+        if in_use > self.peak_in_use:
+            self.peak_in_use = in_use
+
+    def snapshot(self, **gauges) -> Dict[str, Any]:
+        buckets = {str(le): n for le, n in zip(self.WAIT_BUCKETS, self.wait_buckets)}
+        buckets["+Inf"] = self.wait_buckets[-1]
+        out = dict(gauges)
+        out.update({
+            "checkouts": self.checkouts,
+            "checkouts_waited": self.waited,
+            "wait_avg_ms": round(self.wait_sum / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "wait_seconds_buckets": buckets,
+            "wait_seconds_sum": self.wait_sum,
+            "exhausted_timeouts": self.timeouts,
+            "exhausted_rejected": self.rejected,
+            "connections_opened": self.opened,
+            "connections_closed": self.closed,
+            "connect_errors": self.connect_errors,
+            "peak_in_use": self.peak_in_use,
+            "peak_waiters": self.peak_waiters,
+            "scoped_reuses": self.scoped_reuses,
+        })
+        return out
+
+
+def reset_for_reuse(conn) -> bool:
+    """Drop what a handler left behind. False means the connection is unusable."""
+    try:
+        if conn.unread_result:
+            conn.consume_results()
+        if conn.in_transaction:
+            conn.rollback()
+        return True
+    except mysql.connector.Error:
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class PooledConnection:
+    """Proxy returned by ElasticPool.get_connection(); close() gives it back."""
+
+    def __init__(self, pool: "ElasticPool", conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._conn)
+
+    def discard(self):
+        """Close the connection instead of returning it (e.g. a streamed result was abandoned)."""
+        if self._released:
+            return
+        self._released = True
+        self._pool._discard(self._conn)
+
+
+class ElasticPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 2,
+        max_size: int = 20,
+        max_waiters: int = 256,
+        checkout_timeout: float = 5.0,
+        idle_timeout: float = 60.0,
+        ping_after: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("need 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_waiters = max_waiters
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = deque()       # (conn, idle_since); right end = most recently used
+        self._size = 0             # open + being opened
+        self._in_use = 0
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self.stats = PoolStats()
+
+    def open(self):
+        """Pre-open min_size connections."""
+        for _ in range(self.min_size):
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open_one()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _open_one(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self.stats.connect_errors += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats.opened += 1
+        return conn
+
+    def _reap_idle(self, now: float) -> list:
+        doomed = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            doomed.append(self._idle.popleft()[0])
+            self._size -= 1
+            self.stats.closed += 1
+        return doomed
+
+    def get_connection(self, timeout: Optional[float] = None) -> PooledConnection:
+        timeout = self.checkout_timeout if timeout is None else timeout
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        queued = False
+        while True:
+            conn, since, create, doomed = None, 0.0, False, []
+            try:
+                with self._cond:
+                    while True:
+                        now = time.monotonic()
+                        doomed.extend(self._reap_idle(now))
+                        if self._idle:
+                            conn, since = self._idle.pop()
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            create = True
+                            break
+                        if self._waiters >= self.max_waiters:
+                            self.stats.rejected += 1
+                            raise PoolExhausted(f"Connection pool wait queue is full ({self.max_waiters} waiting)")
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.stats.timeouts += 1
+                            raise PoolExhausted(f"No connection available within {timeout:.1f}s")
+                        queued = True
+                        self._waiters += 1
+                        self.stats.peak_waiters = max(self.stats.peak_waiters, self._waiters)
+                        try:
+                            self._cond.wait(remaining)
+                        finally:
+                            self._waiters -= 1
+            finally:
+                for d in doomed:
+                    _close_quietly(d)
+
+            if create:
+                conn = self._open_one()
+            elif time.monotonic() - since > self.ping_after and not conn.is_connected():
+                # went stale while idle (server wait_timeout, failover...)
+                _close_quietly(conn)
+                with self._cond:
+                    self._size -= 1
+                    self.stats.closed += 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._in_use += 1
+                self.stats.record_checkout(time.monotonic() - t0, queued, self._in_use)
+            return PooledConnection(self, conn)
+
+    def _release(self, conn):
+        healthy = reset_for_reuse(conn)
+        if not healthy:
+            _close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            if healthy:
+                self._idle.append((conn, now))
+            else:
+                self._size -= 1
+                self.stats.closed += 1
+            doomed = self._reap_idle(now)
+            self._cond.notify()
+        for d in doomed:
+            _close_quietly(d)
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self.stats.closed += 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            conns = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(conns)
+            self.stats.closed += len(conns)
+        for c in conns:
+            _close_quietly(c)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return self.stats.snapshot(
+                mode="sync", size=self._size, in_use=self._in_use, idle=len(self._idle),
+                waiters=self._waiters, min_size=self.min_size, max_size=self.max_size,
+                max_waiters=self.max_waiters, checkout_timeout_s=self.checkout_timeout,
+            )
+
+
+# ---------------- request scope ----------------
+_REQUEST: contextvars.ContextVar = contextvars.ContextVar("db_pool_request", default=None)
+
+
+class _Held:
+    """Connections checked out for one request, by pool."""
+
+    __slots__ = ("conns",)
+
+    def __init__(self):
+        self.conns: Dict[int, PooledConnection] = {}
+
+    def release(self):
+        conns, self.conns = list(self.conns.values()), {}
+        for conn in conns:
+            conn.close()
+
+
+class ScopedConnection:
+    """scoped_connection() inside a request: close() ends the helper's transaction
+    (same reset as a pool checkin) but keeps the connection for the next helper."""
+
+    def __init__(self, held: _Held, key: int, conn: PooledConnection):
+        self._held = held
+        self._key = key
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._held.conns.get(self._key) is not self._conn:
+            return
+        if not reset_for_reuse(self._conn):
+            # broken: the next helper checks out a fresh one
+            del self._held.conns[self._key]
+            self._conn.discard()
+
+    def discard(self):
+        if self._held.conns.get(self._key) is self._conn:
+            del self._held.conns[self._key]
+            self._conn.discard()
+
+
+def scoped_connection(pool: ElasticPool):
+    """pool.get_connection(), or within a RequestScope the request's connection to `pool`."""
+    held = _REQUEST.get()
+    if held is None:
+        return pool.get_connection()
+    key = id(pool)
+    conn = held.conns.get(key)
+    if conn is None:
+        conn = held.conns[key] = pool.get_connection()
+    else:
+        with pool._cond:
+            pool.stats.scoped_reuses += 1
+    return ScopedConnection(held, key, conn)
+
+
+class RequestScope:
+    """ASGI middleware; connections taken through scoped_connection() during a request
+    (streamed bodies included) go back to their pools when it finishes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        held = _Held()
+        token = _REQUEST.set(held)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _REQUEST.reset(token)
+            if held.conns:
+                # checkin may roll back what a failed handler left open
+                await asyncio.get_running_loop().run_in_executor(None, held.release)
@@ -0,0 +1,146 @@
+# exports.py
+# Streaming exports of the voter roll and of a vote's vote_records.
+#
+# Rows come from one unbuffered (server-side) cursor read with fetchmany(),
+# encoded batch by batch into NDJSON or CSV and handed to a StreamingResponse,
+# so memory stays at one batch whatever the table size. Rows are in id order
+# and every row carries its id: a broken download resumes with ?after_id=<last
+# id received>.
+#
+# The connection is busy for the whole download. If the client goes away
+# mid-stream the connection is closed instead of being handed back, because
+# the unread rows would otherwise have to be drained first. A finished
+# download resets net_write_timeout before the connection goes back to its
+# pool; a failed one never goes back. Only 'cast' vote_records are exported.
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Sequence, Tuple
+
+USER_COLUMNS = (
+    "id", "full_name", "nic", "dob", "gender", "household", "mobile", "email",
+    "location_id", "administration", "electoral", "polling", "gn", "fingerprint", "created_at",
+)
+RECORD_COLUMNS = ("id", "vote_id", "user_id", "party_id")
+
+BATCH = 1000
+# the client sets the pace; give slow readers longer than the 60s default
+NET_WRITE_TIMEOUT = 600
+SET_TIMEOUT_SQL = "SET SESSION net_write_timeout = %s"
+# back to the server default before a pooled connection is handed back
+RESET_TIMEOUT_SQL = "SET SESSION net_write_timeout = DEFAULT"
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def users_query(after_id: int) -> Tuple[str, tuple]:
+    return f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE id > %s ORDER BY id", (after_id,)
+
+
+def records_query(vote_id: int, after_id: int) -> Tuple[str, tuple]:
+    return (
+        f"SELECT {', '.join(RECORD_COLUMNS)} FROM vote_records "
+        f"WHERE vote_id = %s AND status = 'cast' AND id > %s ORDER BY id",
+        (vote_id, after_id),
+    )
+
+
+def _cell(v: Any):
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date, Decimal, bytes, bytearray)):
+        return _default(v)
+    return v
+
+
+def _default(v: Any):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", "replace")
+    raise TypeError(f"cannot serialize {type(v).__name__}")
+
+
+class Encoder:
+    def __init__(self, fmt: str, columns: Sequence[str]):
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"unknown export format: {fmt}")
+        self.fmt = fmt
+        self.columns = tuple(columns)
+        self.media_type = MEDIA_TYPES[fmt]
+
+    def header(self) -> bytes:
+        return (",".join(self.columns) + "\r\n").encode() if self.fmt == "csv" else b""
+
+    def rows(self, rows) -> bytes:
+        if self.fmt == "ndjson":
+            return "".join(
+                json.dumps(dict(zip(self.columns, r)), default=_default, separators=(",", ":")) + "\n"
+                for r in rows
+            ).encode()
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        for r in rows:
+            w.writerow([_cell(v) for v in r])
+        return buf.getvalue().encode()
+
+
+def filename(name: str, fmt: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+
+
+async def astream(acquire: Callable[[], Awaitable[Any]], query: Tuple[str, tuple], enc: Encoder,
+                  batch: int = BATCH) -> AsyncIterator[bytes]:
+    """main.py: a dal pool connection, awaitable unbuffered cursor."""
+    conn = await acquire()
+    cur, finished = None, False
+    try:
+        cur = await conn.cursor()
+        await cur.execute(SET_TIMEOUT_SQL, (NET_WRITE_TIMEOUT,))
+        await cur.execute(*query)
+        yield enc.header()
+        while True:
+            rows = await cur.fetchmany(batch)
+            if not rows:
+                break
+            yield enc.rows(rows)
+        await cur.execute(RESET_TIMEOUT_SQL)
+        finished = True
+    finally:
+        if finished:
+            await cur.close(); await conn.close()
+        else:
+            await conn.discard()
+
+
+def stream(connect: Callable[[], Any], query: Tuple[str, tuple], enc: Encoder,
+           batch: int = BATCH) -> Iterator[bytes]:
+    """app_mpc: a dedicated blocking connection (Starlette iterates this in its threadpool)."""
+    conn = connect()
+    cur: Optional[Any] = None
+    finished = False
+    try:
+        cur = conn.cursor()
+        cur.execute(SET_TIMEOUT_SQL, (NET_WRITE_TIMEOUT,))
+        cur.execute(*query)
+        yield enc.header()
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield enc.rows(rows)
+        cur.execute(RESET_TIMEOUT_SQL)
+        finished = True
+    finally:
+        if finished:
+            cur.close(); conn.close()
+        else:
+            try:
+                # unread rows: drop the socket rather than drain them (pooled connections too)
+                getattr(conn, "discard", conn.close)()
+            except Exception:
+                pass
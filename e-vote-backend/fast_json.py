@@ -0,0 +1,66 @@
+# fast_json.py
+# JSON bytes for the list endpoints without FastAPI's jsonable_encoder pass.
+#
+# A handler that returns a dict has it walked twice: jsonable_encoder rebuilds
+# every dict / list / value in Python, then JSONResponse runs json.dumps over
+# the copy. Returning JSON(...) instead hands the object to orjson once:
+#
+#   records(COLUMNS, rows)   cursor tuples -> row objects via dict(zip()),
+#                            no per-field Python code in the handler
+#   JSON(content)            Response rendered by orjson (stdlib json when
+#                            orjson is not installed)
+#
+# datetime / date values are written by the encoder in the format the API has
+# always used ("YYYY-MM-DD HH:MM:SS", "YYYY-MM-DD"), so handlers no longer call
+# strftime per row. Decimal goes out as a number, like jsonable_encoder did.
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:     # optional: same output through the stdlib encoder, just slower
+    orjson = None
+
+
+def _default(v: Any):
+    if isinstance(v, datetime):
+        return v.isoformat(" ", "seconds")
+    if isinstance(v, (date, time)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME     # route datetimes through _default
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+
+def records(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """Tuple rows -> row objects keyed by `columns` (same order as the SELECT list)."""
+    return [dict(zip(columns, r)) for r in rows]
+
+
+class JSON(Response):
+    """JSONResponse without jsonable_encoder; content may also be pre-encoded bytes."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
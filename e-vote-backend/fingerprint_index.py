@@ -0,0 +1,258 @@
+# fingerprint_index.py
+# In-process fingerprint -> voter index for verify and cast (FP_INDEX=1).
+#
+# Every scan used to run SELECT ... FROM users WHERE fingerprint=%s. The index
+# keeps fingerprint -> (user_id, full_name, nic, email) in one dict whose
+# values are packed into a single str ("id\x1fname\x1fnic\x1femail"): about
+# 195 MiB per million voters, half of a dict of 4-tuples
+# (python -m bench.bench_fp_index).
+#
+#   load()/aload()    stream users in id order (keyset batches) into a new
+#                     dict and swap it in; put()/remove() calls that land
+#                     while loading are journaled and replayed onto it
+#   put()/remove()    called by register / admin update / admin delete
+#                     after their commit
+#   get()             Voter, or None when unknown or not loaded yet: callers
+#                     always fall back to SQL on None
+#   check()/acheck()  compare with the users table (missing / stale / extra)
+#
+# Verify answers from a hit as is; casts re-match the hit's user_id and
+# fingerprint inside their insert (cast_engine, mpc_preflight), so a stale hit
+# cannot cast as the wrong voter. Voter writes made by another process are only
+# seen on the next reload (FP_INDEX_RELOAD_S), so keep voter admin on the
+# process that serves casts or set a reload interval.
+import sys
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+SEP = "\x1f"
+
+LOAD_SQL = """
+    SELECT id, fingerprint, full_name, nic, email FROM users
+    WHERE id > %s AND fingerprint IS NOT NULL
+    ORDER BY id LIMIT %s
+"""
+
+
+class Voter(NamedTuple):
+    user_id: int
+    full_name: Optional[str]
+    nic: Optional[str]
+    email: Optional[str]
+
+
+def pack(v: Voter) -> str:
+    return SEP.join((str(v.user_id), v.full_name or "", v.nic or "", v.email or ""))
+
+
+def unpack(s: str) -> Voter:
+    user_id, full_name, nic, email = s.split(SEP)
+    return Voter(int(user_id), full_name or None, nic or None, email or None)
+
+
+def _entry_bytes(fp: str, packed: str) -> int:
+    return sys.getsizeof(fp) + sys.getsizeof(packed)
+
+
+class FingerprintIndex:
+    def __init__(self, enabled: bool = True, batch_size: int = 10000):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._map: Dict[str, str] = {}
+        self._payload = 0                     # bytes held by keys + values
+        self._journal: Optional[List] = None  # writes seen during a load
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.loaded_at: Optional[float] = None
+
+    # ---------------- lookups / upkeep ----------------
+    def get(self, fingerprint: str) -> Optional[Voter]:
+        if not self.ready:
+            return None
+        packed = self._map.get(fingerprint)
+        if packed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack(packed)
+
+    def put(self, fingerprint: Optional[str], voter: Voter):
+        if not self.enabled or not fingerprint:
+            return
+        packed = pack(voter)
+        with self._lock:
+            self._payload += self._set(self._map, fingerprint, packed)
+            if self._journal is not None:
+                self._journal.append((fingerprint, packed))
+
+    def remove(self, fingerprint: Optional[str]):
+        if not self.enabled or not fingerprint:
+            return
+        with self._lock:
+            self._payload += self._set(self._map, fingerprint, None)
+            if self._journal is not None:
+                self._journal.append((fingerprint, None))
+
+    @staticmethod
+    def _set(m: Dict[str, str], fp: str, packed: Optional[str]) -> int:
+        """Write or drop one entry; returns the payload byte delta."""
+        old = m.pop(fp, None)
+        delta = -_entry_bytes(fp, old) if old is not None else 0
+        if packed is not None:
+            m[fp] = packed
+            delta += _entry_bytes(fp, packed)
+        return delta
+
+    # ---------------- loading ----------------
+    def _begin(self):
+        with self._lock:
+            self._journal = []
+
+    def _add_rows(self, m: Dict[str, str], rows) -> int:
+        added = 0
+        for user_id, fp, full_name, nic, email in rows:
+            if fp:
+                added += self._set(m, str(fp), pack(Voter(int(user_id), full_name, nic, email)))
+        return added
+
+    def _finish(self, m: Dict[str, str], payload: int, started: float):
+        with self._lock:
+            for fp, packed in self._journal or ():
+                payload += self._set(m, fp, packed)
+            self._journal = None
+            self._map, self._payload = m, payload
+            self.ready = True
+        self.loads += 1
+        self.load_seconds = time.monotonic() - started
+        self.loaded_at = time.time()
+
+    def _abort(self):
+        with self._lock:
+            self._journal = None
+
+    def load(self, cur):
+        """Blocking cursor (app_mpc)."""
+        if not self.enabled:
+            return
+        started, m, payload, last_id = time.monotonic(), {}, 0, 0
+        self._begin()
+        try:
+            while True:
+                cur.execute(LOAD_SQL, (last_id, self.batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                payload += self._add_rows(m, rows)
+                last_id = rows[-1][0]
+        except BaseException:
+            self._abort()
+            raise
+        self._finish(m, payload, started)
+
+    async def aload(self, cur):
+        """Awaitable cursor (main.py adb())."""
+        if not self.enabled:
+            return
+        started, m, payload, last_id = time.monotonic(), {}, 0, 0
+        self._begin()
+        try:
+            while True:
+                await cur.execute(LOAD_SQL, (last_id, self.batch_size))
+                rows = await cur.fetchall()
+                if not rows:
+                    break
+                payload += self._add_rows(m, rows)
+                last_id = rows[-1][0]
+        except BaseException:
+            self._abort()
+            raise
+        self._finish(m, payload, started)
+
+    # ---------------- consistency check ----------------
+    def _compare(self, rows, seen: set, report: Dict[str, Any], fix: bool):
+        for user_id, fp, full_name, nic, email in rows:
+            if not fp:
+                continue
+            fp = str(fp)
+            seen.add(fp)
+            report["checked"] += 1
+            want = pack(Voter(int(user_id), full_name, nic, email))
+            have = self._map.get(fp)
+            if have == want:
+                continue
+            kind = "missing" if have is None else "stale"
+            report[kind] += 1
+            if len(report["samples"]) < 20:
+                report["samples"].append({"fingerprint": fp, "user_id": int(user_id), "problem": kind})
+            if fix:
+                self.put(fp, unpack(want))
+
+    def _finish_check(self, seen: set, report: Dict[str, Any], fix: bool) -> Dict[str, Any]:
+        extra = [fp for fp in list(self._map) if fp not in seen]
+        report["extra"] = len(extra)
+        for fp in extra[: max(0, 20 - len(report["samples"]))]:
+            packed = self._map.get(fp)
+            report["samples"].append({
+                "fingerprint": fp, "user_id": unpack(packed).user_id if packed else None, "problem": "extra",
+            })
+        if fix:
+            for fp in extra:
+                self.remove(fp)
+        report["fixed"] = bool(fix and (report["missing"] or report["stale"] or extra))
+        return report
+
+    def _new_report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "checked": 0, "missing": 0, "stale": 0, "extra": 0, "samples": []}
+
+    def check(self, cur, fix: bool = False) -> Dict[str, Any]:
+        """Stream the users table and diff it against the index.
+
+        Voter writes racing the scan can show up as differences; run it again
+        before acting on small counts.
+        """
+        report, seen, last_id = self._new_report(), set(), 0
+        while True:
+            cur.execute(LOAD_SQL, (last_id, self.batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            self._compare(rows, seen, report, fix)
+            last_id = rows[-1][0]
+        return self._finish_check(seen, report, fix)
+
+    async def acheck(self, cur, fix: bool = False) -> Dict[str, Any]:
+        report, seen, last_id = self._new_report(), set(), 0
+        while True:
+            await cur.execute(LOAD_SQL, (last_id, self.batch_size))
+            rows = await cur.fetchall()
+            if not rows:
+                break
+            self._compare(rows, seen, report, fix)
+            last_id = rows[-1][0]
+        return self._finish_check(seen, report, fix)
+
+    # ---------------- stats ----------------
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self._map) + self._payload
+
+    def stats(self) -> Dict[str, Any]:
+        n = len(self._map)
+        mem = self.memory_bytes()
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "entries": n,
+            "memory_bytes": mem,
+            "bytes_per_voter": round(mem / n, 1) if n else 0.0,
+            "mb_per_million_voters": round(mem / n * 1_000_000 / 2**20, 1) if n else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "last_load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at,
+        }
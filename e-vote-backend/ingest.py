@@ -0,0 +1,187 @@
+# ingest.py
+# Group commit for vote_records inserts (opt-in: CAST_GROUP_COMMIT=1).
+#
+# The cast handlers validate synchronously, release their connection and then
+# submit() the row here. Writer tasks drain the queue in micro-batches (at
+# most batch_size rows, or whatever arrived within flush_interval of the first
+# row), insert them with one executemany and commit once, so MySQL does one
+# log flush per batch instead of one per ballot. submit() only returns after
+# the batch holding the row has committed.
+#
+# The (vote_id, user_id) unique key still decides duplicates: if a batch hits
+# ER_DUP_ENTRY it is replayed row by row inside the same transaction, so only
+# the offending casts get a 409.
+#
+# before_commit(cur, rows) runs inside the batch transaction (derived tables
+# such as the per-party counters); after_commit(rows, info) runs once it is
+# durable, with whatever before_commit returned.
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
+from fastapi import HTTPException
+
+from cast_engine import ER_DUP_ENTRY
+
+INSERT_SQL = "INSERT INTO vote_records (vote_id, user_id, party_id) VALUES (%s, %s, %s)"
+
+Row = Tuple[int, int, Optional[int]]
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        acquire: Callable[[], Awaitable[Any]],
+        batch_size: int = 64,
+        flush_interval: float = 0.005,
+        writers: int = 2,
+        max_pending: int = 10000,
+        before_commit: Optional[Callable[[Any, List[Row]], Awaitable[Any]]] = None,
+        after_commit: Optional[Callable[[List[Row], Any], None]] = None,
+    ):
+        self._acquire = acquire
+        self._before_commit = before_commit
+        self._after_commit = after_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writers = writers
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = 0.0
+        # counters
+        self.batches = 0
+        self.rows = 0
+        self.replayed_batches = 0
+        self.failed_batches = 0
+        self.flush_seconds = 0.0
+        self.max_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.writers)]
+
+    async def stop(self):
+        """Flush what is queued, then stop the writers."""
+        if not self._tasks:
+            return
+        for _ in self._tasks:
+            await self._queue.put(None)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, vote_id: int, user_id: int, party_id: Optional[int]) -> None:
+        """Queue one ballot and wait until its batch is durable."""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put(((vote_id, user_id, party_id), fut))
+        await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Row, "asyncio.Future"]]):
+        rows = [row for row, _ in batch]
+        t0 = time.monotonic()
+        results: List[Optional[BaseException]] = [None] * len(rows)
+        committed: List[Row] = []
+        info = None
+        try:
+            conn = await self._acquire()
+            cur = await conn.cursor()
+            try:
+                try:
+                    await cur.executemany(INSERT_SQL, rows)
+                    if self._before_commit:
+                        info = await self._before_commit(cur, rows)
+                    await conn.commit()
+                    committed = rows
+                except mysql.connector.IntegrityError as e:
+                    if e.errno != ER_DUP_ENTRY:
+                        raise
+                    # someone in the batch already voted; replay one by one so
+                    # only that cast fails (a failed statement does not end the tx)
+                    await conn.rollback()
+                    self.replayed_batches += 1
+                    for i, row in enumerate(rows):
+                        try:
+                            await cur.execute(INSERT_SQL, row)
+                        except mysql.connector.IntegrityError as row_err:
+                            if row_err.errno != ER_DUP_ENTRY:
+                                raise
+                            results[i] = HTTPException(status_code=409, detail="User has already voted")
+                    ok_rows = [row for row, err in zip(rows, results) if err is None]
+                    if self._before_commit:
+                        info = await self._before_commit(cur, ok_rows)
+                    await conn.commit()
+                    committed = ok_rows
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await cur.close(); await conn.close()
+        except mysql.connector.Error as e:
+            self.failed_batches += 1
+            results = [HTTPException(status_code=400, detail=str(e))] * len(rows)
+        except Exception as e:
+            # e.g. PoolExhausted: hand the real error to every waiting caller
+            self.failed_batches += 1
+            results = [e] * len(rows)
+
+        if committed and self._after_commit:
+            self._after_commit(committed, info)
+        self.batches += 1
+        self.rows += len(rows)
+        self.max_batch = max(self.max_batch, len(rows))
+        self.flush_seconds += time.monotonic() - t0
+        for (_, fut), err in zip(batch, results):
+            if fut.done():
+                continue
+            if err is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(err)
+
+    def snapshot(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "enabled": self.running,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "writers": self.writers,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "replayed_batches": self.replayed_batches,
+            "failed_batches": self.failed_batches,
+            "avg_flush_ms": round(self.flush_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "commits_per_sec": round(self.batches / uptime, 2) if uptime else 0.0,
+            "rows_per_sec": round(self.rows / uptime, 2) if uptime else 0.0,
+        }
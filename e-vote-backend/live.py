@@ -0,0 +1,156 @@
+# live.py
+# In-process broadcast hub for live vote results (Server-Sent Events).
+#
+# Casts call publish() once they are committed. The hub keeps the current
+# per-party counts of every vote somebody is watching, coalesces changes for
+# `window` seconds and then encodes ONE message per vote that is handed to
+# every subscriber queue, so N viewers cost one fan-out instead of N
+# aggregate queries. Every `resync` seconds the watched votes are re-read
+# from vote_party_totals to pick up casts handled by other workers.
+#
+# Event payloads:
+#   snapshot  {"vote_id", "results": [{"party_id", "votes"}], "total"}
+#   delta     {"vote_id", "changes": [{"party_id", "votes"}], "total"}
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+
+def sse(event: str, payload: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class Subscription:
+    def __init__(self, vote_id: int, queue_size: int):
+        self.vote_id = vote_id
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=queue_size)
+        self.snapshot: bytes = b""
+
+
+class ResultsHub:
+    def __init__(
+        self,
+        load_counts: Callable[[int], Awaitable[Dict[int, int]]],
+        window: float = 0.25,
+        resync: float = 5.0,
+        queue_size: int = 32,
+    ):
+        self._load_counts = load_counts
+        self.window = window
+        self.resync = resync
+        self.queue_size = queue_size
+        self._subs: Dict[int, Set[Subscription]] = {}
+        self._counts: Dict[int, Dict[int, int]] = {}
+        self._dirty: Dict[int, Set[int]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._resync_task: Optional[asyncio.Task] = None
+        self.messages = 0
+        self.dropped = 0
+
+    async def start(self):
+        self._resync_task = asyncio.create_task(self._resync_loop())
+
+    async def stop(self):
+        if self._resync_task:
+            self._resync_task.cancel()
+            self._resync_task = None
+
+    def _snapshot(self, vote_id: int) -> bytes:
+        counts = self._counts[vote_id]
+        return sse("snapshot", {
+            "vote_id": vote_id,
+            "results": [{"party_id": p, "votes": n} for p, n in sorted(counts.items())],
+            "total": sum(counts.values()),
+        })
+
+    async def subscribe(self, vote_id: int) -> Subscription:
+        if vote_id not in self._counts:
+            counts = await self._load_counts(vote_id)
+            # another subscriber may have loaded it while we were awaiting
+            self._counts.setdefault(vote_id, counts)
+        sub = Subscription(vote_id, self.queue_size)
+        sub.snapshot = self._snapshot(vote_id)
+        self._subs.setdefault(vote_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subs.get(sub.vote_id)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subs[sub.vote_id]
+            self._counts.pop(sub.vote_id, None)
+            self._dirty.pop(sub.vote_id, None)
+
+    def subscribers(self) -> int:
+        return sum(len(s) for s in self._subs.values())
+
+    # ---------------- producers ----------------
+    def publish(self, deltas: Dict[Tuple[int, int], int]):
+        """Committed casts {(vote_id, party_id): n}; must run on the event loop."""
+        touched = False
+        for (vote_id, party_id), n in deltas.items():
+            counts = self._counts.get(vote_id)
+            if counts is None:
+                continue  # nobody is watching this vote
+            counts[party_id] = counts.get(party_id, 0) + n
+            self._dirty.setdefault(vote_id, set()).add(party_id)
+            touched = True
+        if touched and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        dirty, self._dirty = self._dirty, {}
+        for vote_id, parties in dirty.items():
+            counts = self._counts.get(vote_id)
+            if counts is None:
+                continue
+            msg = sse("delta", {
+                "vote_id": vote_id,
+                "changes": [{"party_id": p, "votes": counts.get(p, 0)} for p in sorted(parties)],
+                "total": sum(counts.values()),
+            })
+            self._broadcast(vote_id, msg)
+
+    def _broadcast(self, vote_id: int, msg: bytes):
+        self.messages += 1
+        for sub in self._subs.get(vote_id, ()):
+            try:
+                sub.queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                # slow client: throw its backlog away and let it start over from a snapshot
+                self.dropped += 1
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait(self._snapshot(vote_id))
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync)
+            for vote_id in list(self._subs):
+                try:
+                    fresh = await self._load_counts(vote_id)
+                except Exception:
+                    continue
+                counts = self._counts.get(vote_id)
+                if counts is None:
+                    continue
+                # counts only grow; a local publish that landed after the read
+                # must not be rolled back by the older database value
+                changed = {p for p, n in fresh.items() if n > counts.get(p, 0)}
+                for p in changed:
+                    counts[p] = fresh[p]
+                if changed:
+                    self._dirty.setdefault(vote_id, set()).update(changed)
+            if self._dirty and self._flush_handle is None:
+                self._flush()
+
+    def snapshot_stats(self) -> Dict[str, int]:
+        return {
+            "votes_watched": len(self._subs),
+            "subscribers": self.subscribers(),
+            "messages": self.messages,
+            "slow_client_resets": self.dropped,
+        }
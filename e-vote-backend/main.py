@@ -1,12 +1,36 @@
 # app.py
 from fastapi import FastAPI, HTTPException, Request, Path, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any, Union
 import mysql.connector
-from mysql.connector import pooling
 from datetime import datetime, timezone
-import threading
+import asyncio
+import json
+import logging
+import os
+import ballot_cache
+import cast_engine
+import counters
+import dal
+import exports
+import fast_json
+import db_pool
+import fingerprint_index
+import ingest
+import live
+import metrics
+import scan_buffer
+import slow_queries
+import sqlite_store
+import turnout
+import turnout_series
+import voted_bitmap
+import voter_import
+import voter_search
+
+log = logging.getLogger(__name__)
 
 # ---------------- App & CORS ----------------
 app = FastAPI(title="E-Vote Backend", version="1.0.0")
@@ -17,38 +41,229 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.RequestTimer, cast_routes={"/api/vote/cast_mpc", "/api/vote/cast"})
 
 # ---------------- MySQL connection pool ----------------
 dbconfig = {
-    "host": "localhost",
-    "user": "root",
-    "password": "",
-    "database": "voter_db",
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASS", ""),
+    "database": os.getenv("DB_NAME", "voter_db"),
     "charset": "utf8mb4",
     "autocommit": False,
 }
-pool = pooling.MySQLConnectionPool(pool_name="voter_pool", pool_size=6, **dbconfig)
+# "sync" (blocking pool + threadpool) | "async" (asyncio pool) | "sqlite" (embedded file, no server)
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "evote.db")
+pool_config = {
+    "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX", "20")),
+    "max_waiters": int(os.getenv("DB_POOL_MAX_WAITERS", "256")),
+    "checkout_timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    "idle_timeout": float(os.getenv("DB_POOL_IDLE", "60")),
+}
+
+def _connect():
+    if DB_MODE == "sqlite":
+        return sqlite_store.connect(SQLITE_PATH)
+    return mysql.connector.connect(**dbconfig)
+
+pool = db_pool.ElasticPool(_connect, **pool_config) if DB_MODE in ("sync", "sqlite") else None
+
+apool = dal.make_pool(DB_MODE, dbconfig, sync_pool=pool, **pool_config)
+metrics.REGISTRY.add_collector(metrics.pool_collector(lambda: apool.snapshot()))
+slow_log = slow_queries.SlowQueryLog(
+    threshold_ms=float(os.getenv("SLOW_QUERY_MS", "250")),      # < 0 disables
+    top_n=int(os.getenv("SLOW_QUERY_TOP", "50")),
+    explain_rate=float(os.getenv("SLOW_QUERY_EXPLAIN", "0")),   # fraction of slow statements to EXPLAIN
+)
+metrics.on_query(slow_log.record)
 
-def db():
-    conn = pool.get_connection()
-    cur = conn.cursor()
+async def adb():
+    """What the endpoints use: (conn, cur), awaitable in every DB_MODE."""
+    conn = await apool.acquire()
+    try:
+        cur = await conn.cursor()
+    except Exception:
+        await conn.close()
+        raise
     return conn, cur
 
-# ---------------- Fingerprint buffer (thread-safe) ----------------
-_fingerprint_lock = threading.Lock()
-fingerprint_storage = {"fingerprint": None, "updated_at": None}
+# ---------------- Cast side effects ----------------
+# rows are (vote_id, user_id, party_id); party_id is None for the legacy cast
+party_counts = counters.PartyCounters(ttl=float(os.getenv("RESULTS_CACHE_TTL", "2")))
+series = turnout_series.TurnoutSeries(
+    bucket_s=int(os.getenv("SERIES_BUCKET_S", "60")),
+    slots=int(os.getenv("SERIES_SLOTS", "1440")),          # 24h of minutes
+    enabled=os.getenv("TURNOUT_SERIES", "0") == "1",
+)
+SERIES_FLUSH_S = float(os.getenv("SERIES_FLUSH_S", "10"))
+_series_task: Optional[asyncio.Task] = None
+
+async def before_cast_commit(cur, rows, fingerprint: Optional[str] = None):
+    """Runs inside the transaction that inserts the vote_records rows; returns the voters' geography.
+
+    fingerprint: one ballot whose user_id the insert resolved (see turnout.bump).
+    """
+    await counters.bump(cur, counters.tally(rows))
+    return await turnout.bump(cur, rows, fingerprint)
+
+def after_cast_commit(rows, geo=None):
+    """Runs once the rows are durable."""
+    deltas = counters.tally(rows)
+    party_counts.add(deltas)
+    results_hub.publish(deltas)
+    geo = geo or {}
+    for vote_id, user_id, _party_id in rows:
+        g = geo.get(user_id)
+        series.record(vote_id, g[1] if g else None)
+    if voted.enabled:
+        for vote_id in {r[0] for r in rows}:
+            track_vote(vote_id)
+        voted.add_rows(rows)
+
+async def _load_live_counts(vote_id: int) -> Dict[int, int]:
+    conn, cur = await adb()
+    try:
+        return await counters.load(cur, vote_id)
+    finally:
+        await cur.close(); await conn.close()
 
-def set_fingerprint(value: Optional[str]):
-    with _fingerprint_lock:
-        fingerprint_storage["fingerprint"] = value
-        fingerprint_storage["updated_at"] = datetime.now(timezone.utc).isoformat()
+results_hub = live.ResultsHub(
+    _load_live_counts,
+    window=float(os.getenv("LIVE_WINDOW_MS", "250")) / 1000.0,
+    resync=float(os.getenv("LIVE_RESYNC_S", "5")),
+)
 
-def get_fingerprint() -> Dict[str, Optional[str]]:
-    with _fingerprint_lock:
-        return {
-            "fingerprint": fingerprint_storage["fingerprint"],
-            "updated_at": fingerprint_storage["updated_at"],
-        }
+# ---------------- Ballot cache (/api/vote/{vote_id}/public) ----------------
+ballots = ballot_cache.BytesCache(
+    max_entries=int(os.getenv("BALLOT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("BALLOT_CACHE_TTL", "30")),
+)
+
+# ---------------- Fingerprint -> voter index (opt-in) ----------------
+FP_INDEX_RELOAD_S = float(os.getenv("FP_INDEX_RELOAD_S", "0"))   # 0 = load once at startup
+fp_index = fingerprint_index.FingerprintIndex(enabled=os.getenv("FP_INDEX", "0") == "1")
+_fp_index_task: Optional[asyncio.Task] = None
+
+async def _fp_index_loop():
+    # lookups fall back to SQL until the first load finishes, so startup is not held up
+    while True:
+        try:
+            conn, cur = await adb()
+            try:
+                await fp_index.aload(cur)
+            finally:
+                await cur.close(); await conn.close()
+        except Exception as e:
+            log.warning("fingerprint index load failed: %s", e)
+        if FP_INDEX_RELOAD_S <= 0 and fp_index.ready:
+            return
+        await asyncio.sleep(FP_INDEX_RELOAD_S if FP_INDEX_RELOAD_S > 0 else 5)
+
+async def _flush_series():
+    if not series.pending:
+        return
+    try:
+        conn, cur = await adb()
+        try:
+            if await series.flush(cur):
+                await conn.commit()
+        finally:
+            await cur.close(); await conn.close()
+    except Exception as e:
+        log.warning("turnout series flush failed: %s", e)
+
+async def _series_loop():
+    while True:
+        await asyncio.sleep(SERIES_FLUSH_S)
+        await _flush_series()
+
+async def load_voter(cur, fingerprint: str) -> Optional[fingerprint_index.Voter]:
+    """users-table lookup for an index miss (misses are never trusted); fills the index."""
+    await cur.execute("SELECT id, full_name, nic, email FROM users WHERE fingerprint = %s", (fingerprint,))
+    row = await cur.fetchone()
+    if not row:
+        return None
+    voter = fingerprint_index.Voter(*row)
+    fp_index.put(fingerprint, voter)
+    return voter
+
+# ---------------- Voted bitmaps (opt-in) ----------------
+# one bitmap of voted user_ids per open vote; repeat casts with a known
+# user_id get their 409 without a vote_records lookup
+voted = voted_bitmap.VotedSets(enabled=os.getenv("VOTED_BITMAP", "0") == "1")
+
+def track_vote(vote_id: int):
+    if voted.begin(vote_id):
+        asyncio.create_task(_build_voted(vote_id))
+
+async def _build_voted(vote_id: int):
+    try:
+        conn, cur = await adb()
+        try:
+            await voted.abuild(cur, vote_id)
+        finally:
+            await cur.close(); await conn.close()
+    except Exception as e:
+        voted.drop(vote_id)   # retried on the next cast
+        log.warning("voted bitmap for vote %s failed: %s", vote_id, e)
+
+async def _track_open_votes():
+    conn, cur = await adb()
+    try:
+        await cur.execute("SELECT id FROM votes WHERE status = 'open'")
+        for (vote_id,) in await cur.fetchall():
+            track_vote(vote_id)
+    finally:
+        await cur.close(); await conn.close()
+
+# ---------------- Group commit for casts (opt-in) ----------------
+CAST_GROUP_COMMIT = os.getenv("CAST_GROUP_COMMIT", "0") == "1"
+vote_writer = ingest.GroupCommitWriter(
+    apool.acquire,
+    batch_size=int(os.getenv("CAST_BATCH_SIZE", "64")),
+    flush_interval=float(os.getenv("CAST_FLUSH_MS", "5")) / 1000.0,
+    writers=int(os.getenv("CAST_WRITERS", "2")),
+    before_commit=before_cast_commit,
+    after_commit=after_cast_commit,
+)
+
+@app.on_event("startup")
+async def _open_db():
+    await apool.open()
+    await results_hub.start()
+    if fp_index.enabled:
+        global _fp_index_task
+        _fp_index_task = asyncio.create_task(_fp_index_loop())
+    if voted.enabled:
+        await _track_open_votes()
+    if CAST_GROUP_COMMIT:
+        await vote_writer.start()
+    if series.enabled:
+        global _series_task
+        _series_task = asyncio.create_task(_series_loop())
+
+@app.on_event("shutdown")
+async def _close_db():
+    await vote_writer.stop()
+    if _fp_index_task:
+        _fp_index_task.cancel()
+    if _series_task:
+        _series_task.cancel()
+    await _flush_series()
+    await results_hub.stop()
+    await apool.close()
+
+@app.exception_handler(db_pool.PoolExhausted)
+async def _pool_exhausted(request: Request, exc: db_pool.PoolExhausted):
+    # the wait queue overflowed or timed out: tell clients to back off instead of a 500
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# ---------------- Fingerprint buffer (per station) ----------------
+scans = scan_buffer.ScanBuffer(ttl=float(os.getenv("SCAN_TTL_S", "60")))
+SCAN_MAX_WAIT_S = float(os.getenv("SCAN_MAX_WAIT_S", "30"))
 
 # ---------------- Models ----------------
 class RegisterRequest(BaseModel):
@@ -65,10 +280,12 @@ class RegisterRequest(BaseModel):
     polling: str
     gn: str
     fingerprint: Optional[str] = None
+    station: Optional[str] = None        # take the buffered scan of this station
 
 class FingerprintPayload(BaseModel):
     # accept "123" or 123
     fingerprint: Union[str, int]
+    station: Optional[str] = None
 
 class FingerVerifyPayload(BaseModel):
     fingerprint: Union[str, int]
@@ -95,11 +312,13 @@ class VoteStatusUpdate(BaseModel):
 class VoteCastPayload(BaseModel):
     fingerprint: str
     vote_id: int
+    station: Optional[str] = None   # or X-Station-Id; feeds the per-station turnout series
 
 class PublicVoteCastPayload(BaseModel):
     fingerprint: str
     vote_id: int
     party_id: int
+    station: Optional[str] = None
 
 class PartyCreatePayload(BaseModel):
     vote_id: int
@@ -155,84 +374,188 @@ def _normalize_fp(val: Union[str, int, None]) -> str:
 def health():
     return {"ok": True, "time": datetime.now(timezone.utc).isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape target: request / query latency histograms, pool gauges, cast outcomes."""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/admin/db/pool")
+async def db_pool_stats():
+    """Checkout wait, in-use and exhaustion counters for sizing DB_POOL_MIN/MAX."""
+    return apool.snapshot()
+
+@app.post("/api/admin/counters/verify")
+async def verify_counters(vote_id: Optional[int] = Query(None, gt=0), fix: bool = False):
+    """Recompute vote_party_totals from vote_records and report (optionally fix) drift."""
+    conn = await apool.acquire()
+    try:
+        report = await counters.verify(conn, vote_id, fix=fix)
+    finally:
+        await conn.close()
+    if report["fixed"]:
+        party_counts.invalidate(vote_id)
+    return report
+
+@app.post("/api/admin/turnout/rebuild")
+async def rebuild_turnout(vote_id: Optional[int] = Query(None, gt=0)):
+    """Recompute the vote_turnout rollups from vote_records."""
+    conn = await apool.acquire()
+    try:
+        return await turnout.rebuild(conn, vote_id)
+    finally:
+        await conn.close()
+
+@app.get("/api/admin/live")
+async def live_stats():
+    return results_hub.snapshot_stats()
+
+@app.get("/api/admin/cache/ballots")
+async def ballot_cache_stats():
+    return ballots.stats()
+
+@app.get("/api/admin/fp-index")
+async def fp_index_stats():
+    """Entries, memory per million voters and hit rate of the fingerprint index."""
+    return fp_index.stats()
+
+@app.post("/api/admin/fp-index/check")
+async def fp_index_check(fix: bool = False):
+    """Diff the fingerprint index against the users table (fix=true repairs it)."""
+    conn, cur = await adb()
+    try:
+        return await fp_index.acheck(cur, fix=fix)
+    finally:
+        await cur.close(); await conn.close()
+
+@app.get("/api/admin/voted")
+async def voted_bitmap_stats():
+    """Per-vote voted bitmaps: cardinality, bytes, containers, short-circuited repeats."""
+    return voted.stats()
+
+@app.get("/api/admin/ingest")
+async def ingest_stats():
+    """Group-commit batch sizes and commits/sec (CAST_GROUP_COMMIT=1)."""
+    return vote_writer.snapshot()
+
+@app.get("/api/admin/slow-queries")
+async def slow_queries_top(
+    limit: int = Query(20, ge=1, le=200),
+    order: str = Query("max", pattern="^(max|total|count|last)$"),
+    explain: bool = True,
+):
+    """Slowest statements (normalized SQL) above SLOW_QUERY_MS; runs pending EXPLAIN samples first."""
+    if explain and slow_log.pending():
+        conn, cur = await adb()
+        try:
+            await slow_log.aexplain(cur)
+        finally:
+            await cur.close(); await conn.close()
+    return slow_log.top(limit, order)
+
+@app.delete("/api/admin/slow-queries")
+async def slow_queries_reset():
+    slow_log.reset()
+    return {"status": "cleared"}
+
 # ---------------- Admin ----------------
 @app.post("/api/admin/create")
-def create_admin(data: AdminCreatePayload):
-    conn, cur = db()
+async def create_admin(data: AdminCreatePayload):
+    conn, cur = await adb()
     try:
-        cur.execute(
+        await cur.execute(
             "INSERT INTO admins (full_name, email, password) VALUES (%s, %s, %s)",
             (data.full_name, data.email, data.password),
         )
-        conn.commit()
+        await conn.commit()
         return {"status": "success", "message": "Admin created."}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.post("/api/admin/login")
-def admin_login(data: AdminLoginPayload):
-    conn, cur = db()
+async def admin_login(data: AdminLoginPayload):
+    conn, cur = await adb()
     try:
-        cur.execute(
+        await cur.execute(
             "SELECT id, full_name FROM admins WHERE email=%s AND password=%s",
             (data.email, data.password),
         )
-        row = cur.fetchone()
+        row = await cur.fetchone()
         if not row:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         return {"admin_id": row[0], "full_name": row[1]}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # ---------------- Fingerprint APIs (updated) ----------------
+def _station(*candidates: Optional[str]) -> str:
+    """First non-empty station id (body, query, X-Station-Id header) or the shared default."""
+    for c in candidates:
+        if c and c.strip():
+            station = c.strip()
+            if len(station) > 64:
+                raise HTTPException(status_code=400, detail="Station id is too long (max 64)")
+            return station
+    return scan_buffer.DEFAULT_STATION
+
 @app.post("/api/fingerprint/scan")
-def scan_fingerprint(data: FingerprintPayload):
+async def scan_fingerprint(data: FingerprintPayload, request: Request, station: Optional[str] = None):
     fp = _normalize_fp(data.fingerprint)
-    set_fingerprint(fp)
+    st = _station(data.station, station, request.headers.get("x-station-id"))
+    scan = scans.put(st, fp)
     # helpful to log/inspect what was buffered
-    return {"status": "success", "fingerprint": fp, "updated_at": fingerprint_storage["updated_at"]}
+    return {"status": "success", **scans.view(st, scan)}
 
 @app.get("/api/fingerprint/scan")
-def get_fingerprint_api():
-    # always return the buffered value as a string
-    j = get_fingerprint()
-    if j["fingerprint"] is not None:
-        j["fingerprint"] = str(j["fingerprint"])
-    return j
+async def get_fingerprint_api(
+    request: Request,
+    station: Optional[str] = None,
+    wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for a scan newer than `after`"),
+    after: int = Query(0, ge=0, description="seq of the last scan the caller has seen"),
+):
+    st = _station(station, request.headers.get("x-station-id"))
+    if wait > 0:
+        scan = await scans.wait(st, after, min(wait, SCAN_MAX_WAIT_S))
+    else:
+        scan = scans.get(st)
+    return scans.view(st, scan)
 
 @app.delete("/api/fingerprint/scan")
-def clear_fingerprint():
-    set_fingerprint(None)
-    return {"status": "cleared"}
+async def clear_fingerprint(request: Request, station: Optional[str] = None):
+    seq = scans.clear(_station(station, request.headers.get("x-station-id")))
+    return {"status": "cleared", "seq": seq}
+
+@app.get("/api/admin/scans")
+async def scan_buffer_stats():
+    return scans.stats()
 
 @app.post("/api/fingerprint/verify")
-def verify_fingerprint(data: FingerVerifyPayload):
+async def verify_fingerprint(data: FingerVerifyPayload):
     fp = _normalize_fp(data.fingerprint)
-    conn, cur = db()
-    try:
-        cur.execute(
-            "SELECT id, full_name, nic, email FROM users WHERE fingerprint = %s",
-            (fp,),
-        )
-        row = cur.fetchone()
-        if row:
-            return {"status": "success", "user": {
-                "id": row[0], "full_name": row[1], "nic": row[2], "email": row[3]
-            }}
-        return {"status": "fail", "message": "Fingerprint not found"}
-    finally:
-        cur.close(); conn.close()
+    voter = fp_index.get(fp)
+    if voter is None:
+        conn, cur = await adb()
+        try:
+            voter = await load_voter(cur, fp)
+        finally:
+            await cur.close(); await conn.close()
+    if voter:
+        return {"status": "success", "user": {
+            "id": voter.user_id, "full_name": voter.full_name, "nic": voter.nic, "email": voter.email
+        }}
+    return {"status": "fail", "message": "Fingerprint not found"}
 
 # ---------------- Registration (public) ----------------
 @app.post("/api/register")
-def register_user(data: RegisterRequest):
-    fp = data.fingerprint or get_fingerprint()["fingerprint"]
-    conn, cur = db()
+async def register_user(data: RegisterRequest):
+    station = _station(data.station)
+    buffered = scans.get(station)
+    fp = data.fingerprint or (buffered.fingerprint if buffered else None)
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        await cur.execute("""
             INSERT INTO users (full_name, nic, dob, gender, household, mobile, email,
                 location_id, administration, electoral, polling, gn, fingerprint)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -242,73 +565,128 @@ def register_user(data: RegisterRequest):
             data.location_id, data.administration, data.electoral,
             data.polling, data.gn, fp
         ))
-        conn.commit()
-        set_fingerprint(None)
+        user_id = cur.lastrowid
+        await conn.commit()
+        fp_index.put(fp, fingerprint_index.Voter(user_id, data.full_name, data.nic, data.email))
+        scans.clear(station)
         return {"status": "success", "message": "User registered successfully."}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # Admin route alias for create
 @app.post("/api/admin/voters")
-def admin_create_voter(data: RegisterRequest):
-    return register_user(data)
+async def admin_create_voter(data: RegisterRequest):
+    return await register_user(data)
+
+# ---------------- Bulk voter import ----------------
+# (declared before /api/admin/voters/{user_id} so "import" is not read as an id)
+imports = voter_import.ImportRegistry()
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+@app.post("/api/admin/voters/import")
+async def import_voters(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    job_id: Optional[str] = Query(None, max_length=64, description="Pick the id to poll progress with"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+):
+    """Stream a CSV (header row) or NDJSON voter roll into users; returns the job report."""
+    fmt = fmt or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    running = imports.get(job_id) if job_id else None
+    if running and running.status == "running":
+        raise HTTPException(status_code=409, detail="Import job already running")
+    job = imports.new(fmt, batch_size, job_id)
+    conn = await apool.acquire()
+    try:
+        await voter_import.run(
+            job,
+            voter_import.iter_records(request.stream(), fmt, RegisterRequest),
+            lambda rows: voter_import.write_batch_async(conn, rows, fp_index),
+        )
+    finally:
+        await conn.close()
+    return job.snapshot()
+
+@app.get("/api/admin/voters/import")
+async def list_imports():
+    return {"jobs": imports.list()}
+
+@app.get("/api/admin/voters/import/{job_id}")
+async def import_status(job_id: str):
+    job = imports.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.snapshot()
+
+# ---------------- Streaming exports ----------------
+@app.get("/api/admin/export/voters")
+async def export_voters(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    after_id: int = Query(0, ge=0, description="Resume after the last id received"),
+):
+    enc = exports.Encoder(fmt, exports.USER_COLUMNS)
+    return StreamingResponse(
+        exports.astream(apool.acquire, exports.users_query(after_id), enc),
+        media_type=enc.media_type, headers=exports.filename("voters", fmt),
+    )
+
+@app.get("/api/admin/export/votes/{vote_id}/records")
+async def export_vote_records(
+    vote_id: int = Path(..., gt=0),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    after_id: int = Query(0, ge=0, description="Resume after the last id received"),
+):
+    conn, cur = await adb()
+    try:
+        await cur.execute("SELECT id FROM votes WHERE id = %s", (vote_id,))
+        if await cur.fetchone() is None:
+            raise HTTPException(status_code=404, detail="Vote not found")
+    finally:
+        await cur.close(); await conn.close()
+    enc = exports.Encoder(fmt, exports.RECORD_COLUMNS)
+    return StreamingResponse(
+        exports.astream(apool.acquire, exports.records_query(vote_id, after_id), enc),
+        media_type=enc.media_type, headers=exports.filename(f"vote-{vote_id}-records", fmt),
+    )
 
 # ---------------- Admin Voters: LIST + CRUD ----------------
+VOTER_LIST_COLUMNS = ("id", "full_name", "nic", "email", "mobile", "fingerprint")
+
 @app.get("/api/admin/voters")
-def admin_list_voters(
+async def admin_list_voters(
     q: Optional[str] = Query(None, description="Search name/nic/email/mobile"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    after_id: Optional[int] = Query(None, ge=1, description="Keyset cursor: next_after_id of the previous page"),
+    match: str = Query("auto", pattern="^(auto|contains)$"),
 ):
-    conn, cur = db()
+    conn, cur = await adb()
     try:
-        if q:
-            like = f"%{q.strip()}%"
-            cur.execute(
-                """
-                SELECT id, full_name, nic, email, mobile, fingerprint
-                FROM users
-                WHERE full_name LIKE %s OR nic LIKE %s OR email LIKE %s OR mobile LIKE %s
-                ORDER BY id DESC
-                LIMIT %s OFFSET %s
-                """,
-                (like, like, like, like, limit, offset)
-            )
-        else:
-            cur.execute(
-                """
-                SELECT id, full_name, nic, email, mobile, fingerprint
-                FROM users
-                ORDER BY id DESC
-                LIMIT %s OFFSET %s
-                """,
-                (limit, offset)
-            )
-        rows = cur.fetchall()
-        items = [{
-            "id": r[0],
-            "full_name": r[1],
-            "nic": r[2],
-            "email": r[3],
-            "mobile": r[4],
-            "fingerprint": r[5],
-        } for r in rows]
-        return {"items": items, "limit": limit, "offset": offset}
+        sql, args = voter_search.build_list_query(
+            ", ".join(VOTER_LIST_COLUMNS), q, limit, offset, after_id, match
+        )
+        await cur.execute(sql, args)
+        rows = await cur.fetchall()
+        return fast_json.JSON({
+            "items": fast_json.records(VOTER_LIST_COLUMNS, rows),
+            "limit": limit, "offset": offset, "after_id": after_id,
+            "next_after_id": voter_search.next_cursor([r[0] for r in rows], limit),
+        })
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.get("/api/admin/voters/{user_id}")
-def admin_get_voter(user_id: int = Path(..., gt=0)):
-    conn, cur = db()
+async def admin_get_voter(user_id: int = Path(..., gt=0)):
+    conn, cur = await adb()
     try:
-        cur.execute(
+        await cur.execute(
             "SELECT id, full_name, nic, dob, gender, household, mobile, email, fingerprint FROM users WHERE id = %s",
             (user_id,)
         )
-        r = cur.fetchone()
+        r = await cur.fetchone()
         if not r:
             raise HTTPException(status_code=404, detail="User not found")
         return {
@@ -317,13 +695,16 @@ def admin_get_voter(user_id: int = Path(..., gt=0)):
             "fingerprint": r[8]
         }
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.put("/api/admin/voters/{user_id}")
-def admin_update_voter(user_id: int, data: RegisterRequest):
-    conn, cur = db()
+async def admin_update_voter(user_id: int, data: RegisterRequest):
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        # old fingerprint, so its index entry can be dropped after the commit
+        await cur.execute("SELECT fingerprint FROM users WHERE id=%s FOR UPDATE", (user_id,))
+        old = await cur.fetchone()
+        await cur.execute("""
             UPDATE users SET full_name=%s, nic=%s, dob=%s, gender=%s, household=%s,
                 mobile=%s, email=%s, location_id=%s, administration=%s,
                 electoral=%s, polling=%s, gn=%s, fingerprint=%s
@@ -333,30 +714,35 @@ def admin_update_voter(user_id: int, data: RegisterRequest):
             data.mobile, data.email, data.location_id, data.administration,
             data.electoral, data.polling, data.gn, data.fingerprint, user_id
         ))
-        if cur.rowcount == 0:
-            conn.rollback()
+        if old is None:
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="User not found")
-        conn.commit()
+        await conn.commit()
+        fp_index.remove(old[0])
+        fp_index.put(data.fingerprint, fingerprint_index.Voter(user_id, data.full_name, data.nic, data.email))
         return {"status": "success"}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.delete("/api/admin/voters/{user_id}")
-def admin_delete_voter(user_id: int):
-    conn, cur = db()
+async def admin_delete_voter(user_id: int):
+    conn, cur = await adb()
     try:
-        cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
+        await cur.execute("SELECT fingerprint FROM users WHERE id=%s FOR UPDATE", (user_id,))
+        old = await cur.fetchone()
+        await cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
         if cur.rowcount == 0:
-            conn.rollback()
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="User not found")
-        conn.commit()
+        await conn.commit()
+        fp_index.remove(old[0] if old else None)
         return {"status": "success"}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # ---------------- Votes ----------------
 @app.post("/api/vote/create")
-def create_vote(data: VoteCreatePayload, request: Request):
+async def create_vote(data: VoteCreatePayload, request: Request):
     admin_header = request.headers.get("x-admin-id")
     try:
         created_by = int(admin_header) if admin_header else None
@@ -372,58 +758,51 @@ def create_vote(data: VoteCreatePayload, request: Request):
     start_at = parse_dt_local(data.start_at)
     end_at = parse_dt_local(data.end_at)
 
-    conn, cur = db()
+    conn, cur = await adb()
     try:
-        cur.execute(
+        await cur.execute(
             """
             INSERT INTO votes (title, description, created_by, status, start_at, end_at)
             VALUES (%s, %s, %s, %s, %s, %s)
             """,
             (data.title, data.description, created_by, status, start_at, end_at),
         )
-        conn.commit()
+        await conn.commit()
         return {"status": "success", "message": "Vote created."}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.get("/api/votes")
-def get_all_votes():
-    conn, cur = db()
+async def get_all_votes():
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT id, title, status, start_at, end_at
             FROM votes
             ORDER BY id DESC
         """)
-        rows = cur.fetchall()
-        votes = [{
-            "id": r[0],
-            "title": r[1],
-            "status": r[2],
-            "start_at": r[3].strftime("%Y-%m-%d %H:%M:%S") if r[3] else None,
-            "end_at": r[4].strftime("%Y-%m-%d %H:%M:%S") if r[4] else None,
-        } for r in rows]
-        return {"votes": votes}
+        rows = await cur.fetchall()
+        return fast_json.JSON({"votes": fast_json.records(("id", "title", "status", "start_at", "end_at"), rows)})
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # singular + plural variants
 @app.get("/api/votes/{vote_id}")
 @app.get("/api/vote/{vote_id}")
-def get_vote_detail(vote_id: int = Path(..., gt=0)):
-    conn, cur = db()
+async def get_vote_detail(vote_id: int = Path(..., gt=0)):
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT v.id, v.title, v.description, v.status, v.start_at, v.end_at,
                    v.created_by, a.full_name AS created_by_name, v.created_at
             FROM votes v
             LEFT JOIN admins a ON a.id = v.created_by
             WHERE v.id = %s
         """, (vote_id,))
-        row = cur.fetchone()
+        row = await cur.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Vote not found")
 
@@ -440,95 +819,99 @@ def get_vote_detail(vote_id: int = Path(..., gt=0)):
         }
         return {"vote": vote}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # PATCH (singular) used by Remix + a POST (plural) alias
 @app.patch("/api/vote/{vote_id}/status")
-def patch_vote_status(vote_id: int, data: VoteStatusUpdate):
+async def patch_vote_status(vote_id: int, data: VoteStatusUpdate):
     status = (data.status or "").lower()
     if status not in ("draft", "open", "closed", "archived"):
         raise HTTPException(status_code=400, detail="Invalid status")
-    conn, cur = db()
+    conn, cur = await adb()
     try:
-        cur.execute("UPDATE votes SET status = %s WHERE id = %s", (status, vote_id))
+        await cur.execute("UPDATE votes SET status = %s WHERE id = %s", (status, vote_id))
         if cur.rowcount == 0:
-            conn.rollback()
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="Vote not found")
-        conn.commit()
+        await conn.commit()
+        ballots.invalidate(vote_id)
+        if status == "open":
+            track_vote(vote_id)
+        else:
+            voted.drop(vote_id)
         return {"status": "success"}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # alias to support older code paths
 @app.post("/api/votes/{vote_id}/status")
-def post_vote_status(vote_id: int, data: VoteStatusUpdate):
-    return patch_vote_status(vote_id, data)
+async def post_vote_status(vote_id: int, data: VoteStatusUpdate):
+    return await patch_vote_status(vote_id, data)
 
 @app.delete("/api/votes/{vote_id}")
-def delete_vote(vote_id: int = Path(..., gt=0)):
-    conn, cur = db()
+async def delete_vote(vote_id: int = Path(..., gt=0)):
+    conn, cur = await adb()
     try:
-        cur.execute("DELETE FROM votes WHERE id = %s", (vote_id,))
+        await cur.execute("DELETE FROM votes WHERE id = %s", (vote_id,))
         if cur.rowcount == 0:
-            conn.rollback()
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="Vote not found")
-        conn.commit()
+        await cur.execute("DELETE FROM vote_party_totals WHERE vote_id = %s", (vote_id,))
+        await conn.commit()
+        party_counts.invalidate(vote_id)
+        ballots.invalidate(vote_id)
+        voted.drop(vote_id)
         return {"status": "success"}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # ---------------- Parties ----------------
 @app.post("/api/party/create")
-def create_party(data: PartyCreatePayload, request: Request):
+async def create_party(data: PartyCreatePayload, request: Request):
     _validate_party_fields(data.name, data.code, data.symbol_url)
-    conn, cur = db()
+    conn, cur = await adb()
     try:
-        cur.execute("SELECT id FROM votes WHERE id = %s", (data.vote_id,))
-        if cur.fetchone() is None:
+        await cur.execute("SELECT id FROM votes WHERE id = %s", (data.vote_id,))
+        if await cur.fetchone() is None:
             raise HTTPException(status_code=404, detail="Vote not found")
 
-        cur.execute("""
+        await cur.execute("""
             INSERT INTO parties (vote_id, name, code, symbol_url, is_active)
             VALUES (%s, %s, %s, %s, %s)
         """, (data.vote_id, data.name.strip(), data.code, data.symbol_url,
               1 if (data.is_active is not False) else 0))
-        conn.commit()
+        await conn.commit()
+        ballots.invalidate(data.vote_id)
         return {"status": "success"}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         if e.errno in (1062,):
             raise HTTPException(status_code=409, detail="Party with same name or code already exists for this vote")
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
+
+PARTY_COLUMNS = ("id", "vote_id", "name", "code", "symbol_url", "is_active", "created_at", "updated_at")
 
 @app.get("/api/parties/{vote_id}")
-def list_parties(vote_id: int = Path(..., gt=0)):
-    conn, cur = db()
+async def list_parties(vote_id: int = Path(..., gt=0)):
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT id, vote_id, name, code, symbol_url, is_active, created_at, updated_at
             FROM parties
             WHERE vote_id = %s
             ORDER BY name ASC
         """, (vote_id,))
-        rows = cur.fetchall()
-        parties = [{
-            "id": r[0],
-            "vote_id": r[1],
-            "name": r[2],
-            "code": r[3],
-            "symbol_url": r[4],
-            "is_active": bool(r[5]),
-            "created_at": r[6].strftime("%Y-%m-%d %H:%M:%S") if r[6] else None,
-            "updated_at": r[7].strftime("%Y-%m-%d %H:%M:%S") if r[7] else None,
-        } for r in rows]
-        return {"parties": parties}
-    finally:
-        cur.close(); conn.close()
+        parties = fast_json.records(PARTY_COLUMNS, await cur.fetchall())
+        for p in parties:
+            p["is_active"] = bool(p["is_active"])
+        return fast_json.JSON({"parties": parties})
+    finally:
+        await cur.close(); await conn.close()
 
 @app.put("/api/party/{party_id}")
-def update_party(party_id: int, data: PartyUpdatePayload, request: Request):
+async def update_party(party_id: int, data: PartyUpdatePayload, request: Request):
     # Validate (only if provided)
     _validate_party_fields(data.name if data.name is not None else "ok", data.code, data.symbol_url)
 
@@ -545,43 +928,56 @@ def update_party(party_id: int, data: PartyUpdatePayload, request: Request):
         raise HTTPException(status_code=400, detail="No fields to update")
     params.append(party_id)
 
-    conn, cur = db()
+    conn, cur = await adb()
     try:
-        cur.execute(f"UPDATE parties SET {', '.join(sets)} WHERE id=%s", tuple(params))
+        await cur.execute(f"UPDATE parties SET {', '.join(sets)} WHERE id=%s", tuple(params))
         if cur.rowcount == 0:
-            conn.rollback()
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="Party not found")
-        conn.commit()
+        await cur.execute("SELECT vote_id FROM parties WHERE id=%s", (party_id,))
+        owner = await cur.fetchone()
+        await conn.commit()
+        ballots.invalidate(owner[0] if owner else None)
         return {"status": "success"}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         if e.errno in (1062,):
             raise HTTPException(status_code=409, detail="Party with same name or code already exists for this vote")
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.delete("/api/party/{party_id}")
-def delete_party(party_id: int):
-    conn, cur = db()
+async def delete_party(party_id: int):
+    conn, cur = await adb()
     try:
-        cur.execute("DELETE FROM parties WHERE id=%s", (party_id,))
+        await cur.execute("SELECT vote_id FROM parties WHERE id=%s", (party_id,))
+        owner = await cur.fetchone()
+        await cur.execute("DELETE FROM parties WHERE id=%s", (party_id,))
         if cur.rowcount == 0:
-            conn.rollback()
+            await conn.rollback()
             raise HTTPException(status_code=404, detail="Party not found")
-        conn.commit()
+        await cur.execute("DELETE FROM vote_party_totals WHERE party_id=%s", (party_id,))
+        await conn.commit()
+        party_counts.invalidate()
+        ballots.invalidate(owner[0] if owner else None)
         return {"status": "success"}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 # ---------------- Public vote page + cast (MPC) ----------------
 @app.get("/api/vote/{vote_id}/public")
-def vote_public(vote_id: int = Path(..., gt=0)):
+async def vote_public(vote_id: int = Path(..., gt=0)):
     """Public payload: vote (id, title, description) + active parties."""
-    conn, cur = db()
+    body = ballots.get(vote_id)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
+    generation = ballots.generation
+    conn, cur = await adb()
     try:
-        cur.execute("SELECT id, title, description, status, start_at, end_at FROM votes WHERE id=%s", (vote_id,))
-        row = cur.fetchone()
+        await cur.execute("SELECT id, title, description, status, start_at, end_at FROM votes WHERE id=%s", (vote_id,))
+        row = await cur.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Vote not found")
 
@@ -594,7 +990,7 @@ def vote_public(vote_id: int = Path(..., gt=0)):
             "end_at": row[5].strftime("%Y-%m-%d %H:%M:%S") if row[5] else None,
         }
 
-        cur.execute("""
+        await cur.execute("""
             SELECT id, name, code, symbol_url
             FROM parties
             WHERE vote_id=%s AND is_active=1
@@ -605,87 +1001,132 @@ def vote_public(vote_id: int = Path(..., gt=0)):
             "name": r[1],
             "code": r[2],
             "symbol_url": r[3],
-        } for r in cur.fetchall()]
+        } for r in await cur.fetchall()]
 
-        return {"vote": {"id": vote["id"], "title": vote["title"], "description": vote["description"]}, "parties": parties}
+        payload = {"vote": {"id": vote["id"], "title": vote["title"], "description": vote["description"]}, "parties": parties}
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        ballots.put(vote_id, body, generation)
+        return Response(content=body, media_type="application/json")
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.post("/api/vote/cast_mpc")
-def cast_vote_mpc(data: PublicVoteCastPayload):
+async def cast_vote_mpc(data: PublicVoteCastPayload, request: Request):
     """Authenticate via fingerprint, one vote per voter per vote_id, store party_id."""
     if not data.fingerprint.strip():
         raise HTTPException(status_code=400, detail="Fingerprint is required")
+    station = _station(data.station, request.headers.get("x-station-id"))
 
-    conn, cur = db()
+    voter = fp_index.get(data.fingerprint)
+    known_id = voter.user_id if voter else None
+    if voted.has_voted(data.vote_id, known_id):
+        raise HTTPException(status_code=409, detail="User has already voted")
+    conn, cur = await adb()
     try:
-        cur.execute("SELECT status FROM votes WHERE id=%s", (data.vote_id,))
-        v = cur.fetchone()
-        if not v:
-            raise HTTPException(status_code=404, detail="Vote not found")
-        # Optional: enforce open status
-        # if v[0] != "open":
-        #     raise HTTPException(status_code=403, detail="Vote is not open")
-
-        cur.execute("SELECT id FROM parties WHERE id=%s AND vote_id=%s AND is_active=1", (data.party_id, data.vote_id))
-        if cur.fetchone() is None:
-            raise HTTPException(status_code=404, detail="Party not found for this vote or inactive")
-
-        cur.execute("SELECT id FROM users WHERE fingerprint=%s", (data.fingerprint,))
-        u = cur.fetchone()
-        if not u:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = u[0]
-
-        cur.execute("SELECT id FROM vote_records WHERE vote_id=%s AND user_id=%s", (data.vote_id, user_id))
-        if cur.fetchone():
-            raise HTTPException(status_code=409, detail="User has already voted")
-
-        cur.execute("INSERT INTO vote_records (vote_id, user_id, party_id) VALUES (%s, %s, %s)", (data.vote_id, user_id, data.party_id))
-        conn.commit()
-        return {"status": "success", "message": "Vote recorded"}
+        if known_id is None and voted.tracked(data.vote_id):
+            # the bitmap needs a user_id to answer; resolve it (and fill the index)
+            voter = await load_voter(cur, data.fingerprint)
+            known_id = voter.user_id if voter else None
+            if voted.has_voted(data.vote_id, known_id):
+                raise HTTPException(status_code=409, detail="User has already voted")
+        if vote_writer.running:
+            # validate now, insert with the next group commit (after the connection is back)
+            user_id = await cast_engine.validate(cur, data.vote_id, data.party_id, data.fingerprint, known_id)
+        else:
+            # validation + insert in one statement; the (vote_id, user_id) key enforces one vote
+            user_id = await cast_engine.cast(cur, data.vote_id, data.party_id, data.fingerprint, known_id)
+            rows = [(data.vote_id, user_id, data.party_id)]
+            if known_id is not None and user_id is None:
+                fp_index.remove(data.fingerprint)      # stale hit; the next load_voter refills it
+            if user_id is None:
+                # the insert resolved the voter by fingerprint; the turnout read returns its user_id
+                geo = await before_cast_commit(cur, rows, data.fingerprint)
+                rows = [(data.vote_id, next(iter(geo)), data.party_id)]
+            else:
+                geo = await before_cast_commit(cur, rows)
+            await conn.commit()
+            after_cast_commit(rows, geo)
+            series.record_station(data.vote_id, station)
+            return {"status": "success", "message": "Vote recorded"}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
+
+    await vote_writer.submit(data.vote_id, user_id, data.party_id)
+    series.record_station(data.vote_id, station)
+    return {"status": "success", "message": "Vote recorded"}
 
 # ---------------- Legacy cast + analytics ----------------
 @app.post("/api/vote/cast")
-def cast_vote(data: VoteCastPayload):
-    conn, cur = db()
+async def cast_vote(data: VoteCastPayload, request: Request):
+    station = _station(data.station, request.headers.get("x-station-id"))
+    voter = fp_index.get(data.fingerprint)
+    if voter and voted.has_voted(data.vote_id, voter.user_id):
+        raise HTTPException(status_code=409, detail="User has already voted")
+    if vote_writer.running:
+        conn, cur = await adb()
+        try:
+            user_id = await cast_engine.validate(
+                cur, data.vote_id, None, data.fingerprint, voter.user_id if voter else None
+            )
+        except mysql.connector.Error as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            await cur.close(); await conn.close()
+        await vote_writer.submit(data.vote_id, user_id, None)
+        series.record_station(data.vote_id, station)
+        return {"status": "success", "message": "Vote recorded"}
+
+    conn, cur = await adb()
     try:
-        cur.execute("SELECT id FROM users WHERE fingerprint = %s", (data.fingerprint,))
-        user = cur.fetchone()
-        if not user:
+        voter = voter or await load_voter(cur, data.fingerprint)
+        if not voter:
             raise HTTPException(status_code=404, detail="User not found")
-        user_id = user[0]
+        user_id = voter.user_id
+        if voted.has_voted(data.vote_id, user_id):
+            raise HTTPException(status_code=409, detail="User has already voted")
 
-        cur.execute("SELECT id FROM vote_records WHERE vote_id = %s AND user_id = %s", (data.vote_id, user_id))
-        if cur.fetchone():
+        await cur.execute("SELECT id FROM vote_records WHERE vote_id = %s AND user_id = %s", (data.vote_id, user_id))
+        if await cur.fetchone():
             raise HTTPException(status_code=409, detail="User has already voted")
 
-        cur.execute("INSERT INTO vote_records (vote_id, user_id) VALUES (%s, %s)", (data.vote_id, user_id))
-        conn.commit()
+        # matched on the fingerprint too: an index hit may be stale
+        await cur.execute(
+            "INSERT INTO vote_records (vote_id, user_id) SELECT %s, id FROM users WHERE id = %s AND fingerprint = %s",
+            (data.vote_id, user_id, data.fingerprint),
+        )
+        if cur.rowcount != 1:
+            fp_index.remove(data.fingerprint)
+            raise HTTPException(status_code=409, detail="Voter record changed, please retry")
+        rows = [(data.vote_id, user_id, None)]
+        geo = await before_cast_commit(cur, rows)
+        await conn.commit()
+        after_cast_commit(rows, geo)
+        series.record_station(data.vote_id, station)
         return {"status": "success", "message": "Vote recorded"}
     except mysql.connector.Error as e:
-        conn.rollback()
+        await conn.rollback()
+        if e.errno == cast_engine.ER_DUP_ENTRY:
+            # lost the race against a concurrent cast for the same voter
+            raise HTTPException(status_code=409, detail="User has already voted")
         raise HTTPException(status_code=400, detail=str(e))
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
 
 @app.get("/api/vote/analytics")
-def vote_analytics():
-    conn, cur = db()
+async def vote_analytics():
+    conn, cur = await adb()
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT v.id, v.title, COUNT(r.id) as total_votes
             FROM votes v
-            LEFT JOIN vote_records r ON v.id = r.vote_id
+            LEFT JOIN vote_records r ON v.id = r.vote_id AND r.status = 'cast'
             GROUP BY v.id, v.title
             ORDER BY v.id DESC
         """)
-        results = cur.fetchall()
+        results = await cur.fetchall()
         analytics = [{
             "vote_id": row[0],
             "title": row[1],
@@ -693,16 +1134,81 @@ def vote_analytics():
         } for row in results]
         return {"analytics": analytics}
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
+
+@app.get("/api/votes/{vote_id}/turnout")
+async def vote_turnout(vote_id: int = Path(..., gt=0)):
+    """Voters who cast a ballot: the voted bitmap's cardinality when this process tracks the vote."""
+    n = voted.turnout(vote_id)
+    if n is not None:
+        return {"vote_id": vote_id, "voted": n, "source": "bitmap"}
+    conn, cur = await adb()
+    try:
+        await cur.execute(
+            "SELECT (SELECT COUNT(*) FROM votes WHERE id = %s), (SELECT COUNT(*) FROM vote_records WHERE vote_id = %s AND status = 'cast')",
+            (vote_id, vote_id),
+        )
+        exists, n = await cur.fetchone()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Vote not found")
+        return {"vote_id": vote_id, "voted": int(n), "source": "db"}
+    finally:
+        await cur.close(); await conn.close()
+
+@app.get("/api/votes/{vote_id}/turnout/breakdown")
+async def vote_turnout_breakdown(
+    vote_id: int = Path(..., gt=0),
+    electoral: Optional[str] = Query(None, description="Drill into this electoral district"),
+    polling: Optional[str] = Query(None, description="Drill into this polling division (needs electoral)"),
+):
+    """Voters per electoral district, polling division or GN division, from the vote_turnout rollups."""
+    if polling is not None and electoral is None:
+        raise HTTPException(status_code=400, detail="polling needs electoral")
+    conn, cur = await adb()
+    try:
+        await cur.execute("SELECT id FROM votes WHERE id = %s", (vote_id,))
+        if await cur.fetchone() is None:
+            raise HTTPException(status_code=404, detail="Vote not found")
+        return await turnout.drill(cur, vote_id, electoral, polling)
+    finally:
+        await cur.close(); await conn.close()
+
+@app.get("/api/votes/{vote_id}/turnout/series")
+async def vote_turnout_series(
+    vote_id: int = Path(..., gt=0),
+    dimension: str = Query("all", pattern="^(all|polling|station)$"),
+    name: Optional[str] = Query(None, description="One polling division / station; all of them when omitted"),
+    window: int = Query(3600, gt=0, description="Seconds back from now"),
+    resolution: int = Query(60, gt=0, description="Seconds per point (a multiple of SERIES_BUCKET_S)"),
+    source: str = Query("memory", pattern="^(memory|db)$",
+                        description="memory: this process, live; db: every worker, as of the last flush"),
+):
+    """Casts per time step for a vote, overall or per polling division / station."""
+    if source == "memory" and not series.enabled:
+        raise HTTPException(status_code=404, detail="In-memory turnout series is off (TURNOUT_SERIES=1); use source=db")
+    try:
+        if source == "memory":
+            return series.series(vote_id, dimension, name, window, resolution)
+        series.check(window, resolution, in_memory=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    conn, cur = await adb()
+    try:
+        return await series.db_series(cur, vote_id, dimension, name, window, resolution)
+    finally:
+        await cur.close(); await conn.close()
 
+@app.get("/api/admin/turnout/series")
+async def turnout_series_stats():
+    return series.stats()
 
 # ---------------- Vote results (per party) ----------------
 @app.get("/api/votes/{vote_id}/results")
-def get_vote_results(vote_id: int = Path(..., gt=0)):
-    conn, cur = db()
+async def get_vote_results(vote_id: int = Path(..., gt=0)):
+    conn, cur = await adb()
     try:
         # 1) Make sure the vote exists
-        cur.execute(
+        await cur.execute(
             """
             SELECT id, title, description, status, start_at, end_at
             FROM votes
@@ -710,39 +1216,35 @@ def get_vote_results(vote_id: int = Path(..., gt=0)):
             """,
             (vote_id,),
         )
-        vr = cur.fetchone()
+        vr = await cur.fetchone()
         if not vr:
             raise HTTPException(status_code=404, detail="Vote not found")
 
-        vote = {
-            "id": vr[0],
-            "title": vr[1],
-            "description": vr[2],
-            "status": vr[3],
-            "start_at": vr[4].strftime("%Y-%m-%d %H:%M:%S") if vr[4] else None,
-            "end_at": vr[5].strftime("%Y-%m-%d %H:%M:%S") if vr[5] else None,
-        }
+        vote = dict(zip(("id", "title", "description", "status", "start_at", "end_at"), vr))
 
-        # 2) Count votes per party (include all parties for this vote; add AND p.is_active=1 if you want only active)
-        cur.execute(
-            """
-            SELECT
-              p.id            AS party_id,
-              p.name          AS name,
-              p.code          AS code,
-              p.symbol_url    AS symbol_url,
-              COALESCE(COUNT(r.id), 0) AS votes
-            FROM parties p
-            LEFT JOIN vote_records r
-              ON r.party_id = p.id
-             AND r.vote_id  = %s
-            WHERE p.vote_id = %s
-            GROUP BY p.id, p.name, p.code, p.symbol_url
-            ORDER BY votes DESC, p.name ASC
-            """,
-            (vote_id, vote_id),
-        )
-        rows = cur.fetchall()
+        # 2) Per-party counts come from vote_party_totals (kept in step with every cast)
+        #    or the in-process copy of it; include all parties for this vote
+        counts = party_counts.get(vote_id)
+        if counts is None:
+            await cur.execute(
+                """
+                SELECT p.id, p.name, p.code, p.symbol_url, COALESCE(t.votes, 0)
+                FROM parties p
+                LEFT JOIN vote_party_totals t
+                  ON t.vote_id = p.vote_id
+                 AND t.party_id = p.id
+                WHERE p.vote_id = %s
+                """,
+                (vote_id,),
+            )
+            rows = await cur.fetchall()
+            party_counts.put(vote_id, {r[0]: int(r[4]) for r in rows})
+        else:
+            await cur.execute(
+                "SELECT id, name, code, symbol_url FROM parties WHERE vote_id = %s",
+                (vote_id,),
+            )
+            rows = [r + (counts.get(r[0], 0),) for r in await cur.fetchall()]
 
         results = [
             {
@@ -754,13 +1256,41 @@ def get_vote_results(vote_id: int = Path(..., gt=0)):
             }
             for r in rows
         ]
+        results.sort(key=lambda item: (-item["votes"], item["name"]))
         total_votes = sum(item["votes"] for item in results)
 
-        return {
+        return fast_json.JSON({
             "vote": vote,
             "results": results,
             "total_votes": total_votes,
             "updated_at": datetime.now(timezone.utc).isoformat(),
-        }
+        })
+    finally:
+        await cur.close(); await conn.close()
+
+@app.get("/api/votes/{vote_id}/results/stream")
+async def stream_vote_results(request: Request, vote_id: int = Path(..., gt=0)):
+    """Server-Sent Events: one `snapshot`, then coalesced `delta` events as casts commit."""
+    conn, cur = await adb()
+    try:
+        await cur.execute("SELECT id FROM votes WHERE id = %s", (vote_id,))
+        if not await cur.fetchone():
+            raise HTTPException(status_code=404, detail="Vote not found")
     finally:
-        cur.close(); conn.close()
+        await cur.close(); await conn.close()
+
+    sub = await results_hub.subscribe(vote_id)
+
+    async def events():
+        try:
+            yield sub.snapshot
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            results_hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
@@ -0,0 +1,397 @@
+# metrics.py
+# Prometheus text-format metrics for main.py and app_mpc.py (GET /metrics).
+#
+# Kept dependency-free: a metric is a dict of label values -> counts behind one
+# lock, so an observation is a bisect and two additions. Histograms keep
+# per-bucket counts and are made cumulative only when /metrics is scraped.
+#
+#   HTTP_SECONDS    RequestTimer middleware: route template, method, status
+#   CASTS           outcome of every cast route (success / not_found /
+#                   already_voted / rejected / error), from the same middleware
+#   QUERY_SECONDS   every cur.execute / executemany, labelled "<verb> <table>"
+#                   (TimedCursor / AsyncTimedCursor)
+#   pool_collector  connection pool size, in use, saturation and checkout wait
+#                   (read from the pool's own PoolStats at scrape time)
+#   http_pool_collector
+#                   keep-alive requests / connections opened per share node
+#   on_query()      extra per-statement hooks (slow_queries.SlowQueryLog);
+#                   current_endpoint() names the request a query ran for
+#
+# app_mpc adds its share node prepare / commit / abort latency.
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, n: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        out.extend(f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items)
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            v[i] += 1
+            v[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for k, v in items:
+            out.extend(histogram_lines(self.name, self.labelnames, k, self.buckets, v[:-1], v[-1]))
+        return out
+
+
+def histogram_lines(name: str, labelnames: Sequence[str], labels: Sequence[str],
+                    buckets: Sequence[float], counts: Sequence[int], total: float) -> List[str]:
+    """Per-bucket (non-cumulative, last one = +Inf) counts -> _bucket/_sum/_count lines."""
+    out, running = [], 0
+    for le, n in zip(list(buckets) + [float("inf")], counts):
+        running += n
+        le_label = 'le="' + _num(le) + '"'
+        out.append(f"{name}_bucket{_labels(labelnames, labels, le_label)} {running}")
+    out.append(f"{name}_sum{_labels(labelnames, labels)} {_num(float(total))}")
+    out.append(f"{name}_count{_labels(labelnames, labels)} {running}")
+    return out
+
+
+class _Timer:
+    __slots__ = ("h", "labels", "t0")
+
+    def __init__(self, h: Histogram, labels: Tuple[str, ...]):
+        self.h, self.labels = h, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.h.observe(time.perf_counter() - self.t0, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        m = Counter(name, help, labels)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labels, buckets)
+        self._metrics.append(m)
+        return m
+
+    def add_collector(self, fn: Callable[[], Iterable[str]]):
+        """fn() -> exposition lines, called on every scrape (gauges read from elsewhere)."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        for fn in self._collectors:
+            try:
+                lines.extend(fn())
+            except Exception as e:   # a broken collector must not take /metrics down
+                lines.append(f"# collector error: {type(e).__name__}: {e}".replace("\n", " "))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_SECONDS = REGISTRY.histogram(
+    "evote_http_request_duration_seconds",
+    "Time to response start, by route template, method and status.",
+    ("route", "method", "status"),
+)
+CASTS = REGISTRY.counter("evote_cast_total", "Cast attempts by route and outcome.", ("route", "outcome"))
+QUERY_SECONDS = REGISTRY.histogram(
+    "evote_db_query_duration_seconds",
+    "cursor.execute / executemany time, by statement verb and table.",
+    ("statement",),
+)
+
+
+# ---------------- requests ----------------
+CAST_OUTCOMES = {200: "success", 201: "success", 404: "not_found", 409: "already_voted"}
+
+
+def cast_outcome(status: int) -> str:
+    return CAST_OUTCOMES.get(status) or ("rejected" if status < 500 else "error")
+
+
+_SCOPE: contextvars.ContextVar = contextvars.ContextVar("evote_request_scope", default=None)
+
+
+def current_endpoint() -> Optional[str]:
+    """'GET /api/votes/{vote_id}' for the request being served (threadpool calls included)."""
+    scope = _SCOPE.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope.get('path', '')}"
+
+
+class RequestTimer:
+    """ASGI middleware; app.add_middleware(RequestTimer, cast_routes={...})."""
+
+    def __init__(self, app, cast_routes: Iterable[str] = ()):
+        self.app = app
+        self.cast_routes = frozenset(cast_routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        done = False
+        _SCOPE.set(scope)
+
+        def record(status: int):
+            nonlocal done
+            done = True
+            # the router leaves the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - t0, path, scope["method"], str(status))
+            if path in self.cast_routes:
+                CASTS.inc(path, cast_outcome(status))
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and not done:
+                # streams (SSE, exports, long-polls) count until their first byte
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        except BaseException:
+            if not done:
+                record(500)
+            raise
+
+
+# ---------------- queries ----------------
+_STATEMENT = re.compile(
+    r"^\s*(?:\(\s*)?(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+_statement_cache: Dict[str, str] = {}
+
+
+def statement_label(sql: str) -> str:
+    """'SELECT ... FROM users WHERE ...' -> 'select users' (bounded label cardinality)."""
+    label = _statement_cache.get(sql)
+    if label is None:
+        m = _STATEMENT.match(sql or "")
+        if not m:
+            label = "other"
+        else:
+            verb = m.group(1).lower()
+            if verb == "update":
+                t = re.match(r"^\s*update\s+`?(\w+)", sql, re.IGNORECASE)
+                label = f"update {t.group(1)}" if t else "update"
+            else:
+                label = f"{verb} {m.group(2)}" if m.group(2) else verb
+        if len(_statement_cache) < 4096:   # SQL text is almost always a constant
+            _statement_cache[sql] = label
+    return label
+
+
+_query_hooks: List[Callable[[str, Any, float, bool], None]] = []
+
+
+def on_query(hook: Callable[[str, Any, float, bool], None]):
+    """hook(sql, params, seconds, many) after every timed execute / executemany."""
+    _query_hooks.append(hook)
+
+
+def _observe_query(sql: str, params: Any, seconds: float, many: bool):
+    QUERY_SECONDS.observe(seconds, statement_label(sql))
+    for hook in _query_hooks:
+        hook(sql, params, seconds, many)
+
+
+class TimedCursor:
+    """Blocking cursor proxy timing execute / executemany."""
+
+    __slots__ = ("_cur",)
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._cur.execute(sql, params, *args, **kwargs)
+        finally:
+            _observe_query(sql, params, time.perf_counter() - t0, False)
+
+    def executemany(self, sql, seq_params, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._cur.executemany(sql, seq_params, *args, **kwargs)
+        finally:
+            _observe_query(sql, seq_params, time.perf_counter() - t0, True)
+
+
+class AsyncTimedCursor:
+    """Awaitable cursor proxy (dal.ThreadedCursor or a mysql.connector.aio cursor)."""
+
+    __slots__ = ("_cur",)
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    async def execute(self, sql, params=None, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await self._cur.execute(sql, params, *args, **kwargs)
+        finally:
+            _observe_query(sql, params, time.perf_counter() - t0, False)
+
+    async def executemany(self, sql, seq_params, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await self._cur.executemany(sql, seq_params, *args, **kwargs)
+        finally:
+            _observe_query(sql, seq_params, time.perf_counter() - t0, True)
+
+
+class TimedConnection:
+    """Blocking connection proxy whose cursors are TimedCursors (app_mpc)."""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+
+# ---------------- pools ----------------
+def pool_collector(snapshot: Callable[[], Dict[str, Any]], pool: str = "main") -> Callable[[], List[str]]:
+    """Exposition lines for a db_pool / dal pool snapshot()."""
+    names = ("pool",)
+    lbl = _labels(names, (pool,))
+
+    def collect() -> List[str]:
+        s = snapshot()
+        size, in_use, max_size = s.get("size", 0), s.get("in_use", 0), s.get("max_size", 0) or 1
+        out = []
+        for name, help, value in (
+            ("evote_db_pool_size", "Open connections.", size),
+            ("evote_db_pool_in_use", "Checked-out connections.", in_use),
+            ("evote_db_pool_max_size", "Pool max_size.", s.get("max_size", 0)),
+            ("evote_db_pool_waiters", "Checkouts queued for a connection.", s.get("waiters", 0)),
+            ("evote_db_pool_saturation", "in_use / max_size.", round(in_use / max_size, 4)),
+        ):
+            out += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name}{lbl} {_num(value)}"]
+        for name, help, key in (
+            ("evote_db_pool_checkouts_total", "Connection checkouts.", "checkouts"),
+            ("evote_db_pool_checkouts_waited_total", "Checkouts that found the pool saturated.", "checkouts_waited"),
+            ("evote_db_pool_exhausted_total", "Checkouts that got PoolExhausted (timeout or full queue).", None),
+        ):
+            value = s.get(key, 0) if key else s.get("exhausted_timeouts", 0) + s.get("exhausted_rejected", 0)
+            out += [f"# HELP {name} {help}", f"# TYPE {name} counter", f"{name}{lbl} {_num(value)}"]
+        buckets = s.get("wait_seconds_buckets") or {}
+        if buckets:
+            les = [float(k) for k in buckets if k != "+Inf"]
+            counts = [buckets[k] for k in buckets if k != "+Inf"] + [buckets.get("+Inf", 0)]
+            name = "evote_db_pool_checkout_wait_seconds"
+            out += [f"# HELP {name} Time to get a connection from the pool.", f"# TYPE {name} histogram"]
+            out += histogram_lines(name, names, (pool,), les, counts, s.get("wait_seconds_sum", 0.0))
+        return out
+
+    return collect
+
+
+def http_pool_collector(snapshot: Callable[[], Dict[str, Any]]) -> Callable[[], List[str]]:
+    """Exposition lines for a share_http.ShareClients stats()."""
+    names = ("node",)
+
+    def collect() -> List[str]:
+        nodes = snapshot().get("nodes", {})
+        out = []
+        for name, help, kind, key in (
+            ("evote_share_http_requests_total", "Requests sent to the share node.", "counter", "requests"),
+            ("evote_share_http_connections_opened_total", "TCP connections opened to the share node.", "counter",
+             "connections_opened"),
+            ("evote_share_http_connections_idle", "Keep-alive connections parked in the pool.", "gauge", "idle"),
+            ("evote_share_http_reuse_ratio", "Share of requests sent on a reused connection.", "gauge", "reuse_ratio"),
+        ):
+            out += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            out += [f"{name}{_labels(names, (node,))} {_num(s[key])}" for node, s in sorted(nodes.items())]
+        return out
+
+    return collect
@@ -0,0 +1,184 @@
+# mpc_batch.py
+# Micro-batched share transactions for app_mpc cast_mpc (opt-in: MPC_BATCH_WINDOW_MS > 0).
+#
+# Per ballot, cast_mpc wrote a share_transactions row on each node and sent
+# each of them a prepare and a commit, so coordinator -> node traffic grew
+# with ballots. With batching, cast_mpc reserves the voter's slot as before,
+# splits its ballot into the two deltas and submit()s them here. Flusher
+# threads drain the queue in micro-batches (at most batch_size ballots, or
+# whatever arrived within window of the first one), add the deltas up per
+# (vote_id, party_id) for each node and run one 2PC per batch through
+# `two_pc(tx_id, entries_a, entries_b)`: one prepare_batch and one
+# commit_batch per node, applied to share_totals in a single transaction.
+#
+# submit() does not block: it returns a BallotFuture that resolves to the
+# batch tx_id once the batch holding the ballot has committed on both nodes,
+# or to the batch's error (cast_mpc then releases the reservation). The
+# batch tx_id goes to each ballot's mpc_audit row. A ballot whose future is
+# cancelled while still queued is left out of its batch; once the batch is
+# on the wire cancel() fails and future.tx_id names the batch, so the caller
+# can ask the share nodes how it ended.
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Ballot = Tuple[int, int, int, int]          # (vote_id, party_id, delta_a, delta_b)
+Entry = Dict[str, int]                      # {"vote_id", "party_id", "delta"} as the share nodes take it
+
+
+class BallotFuture(Future):
+    """A queued ballot; tx_id is set when its batch is flushed."""
+
+    tx_id: Optional[str] = None
+
+
+def aggregate(ballots: List[Ballot], modulus: int) -> Tuple[List[Entry], List[Entry]]:
+    """Sum the ballots' deltas per (vote_id, party_id), separately for node A and node B."""
+    a: Dict[Tuple[int, int], int] = defaultdict(int)
+    b: Dict[Tuple[int, int], int] = defaultdict(int)
+    for vote_id, party_id, delta_a, delta_b in ballots:
+        a[(vote_id, party_id)] = (a[(vote_id, party_id)] + delta_a) % modulus
+        b[(vote_id, party_id)] = (b[(vote_id, party_id)] + delta_b) % modulus
+
+    def entries(sums):
+        return [{"vote_id": v, "party_id": p, "delta": d} for (v, p), d in sorted(sums.items())]
+
+    return entries(a), entries(b)
+
+
+class ShareBatcher:
+    def __init__(
+        self,
+        two_pc: Callable[[str, List[Entry], List[Entry]], None],
+        modulus: int,
+        window: float = 0.005,
+        batch_size: int = 256,
+        flushers: int = 2,
+        max_pending: int = 10000,
+    ):
+        self._two_pc = two_pc
+        self.modulus = modulus
+        self.window = window
+        self.batch_size = batch_size
+        self.flushers = flushers
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._started_at = 0.0
+        # counters
+        self.batches = 0
+        self.ballots = 0
+        self.entries = 0
+        self.failed_batches = 0
+        self.cancelled = 0
+        self.flush_seconds = 0.0
+        self.max_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._threads = [threading.Thread(target=self._run, name=f"mpc-batch-{i}", daemon=True)
+                         for i in range(self.flushers)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Flush what is queued, then stop the flushers."""
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, vote_id: int, party_id: int, delta_a: int, delta_b: int) -> BallotFuture:
+        """Queue one ballot's deltas; raises queue.Full when max_pending ballots are waiting."""
+        fut = BallotFuture()
+        self._queue.put_nowait(((vote_id, party_id, delta_a, delta_b), fut))
+        return fut
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Ballot, BallotFuture]]):
+        tx_id = uuid.uuid4().hex
+        live = []
+        for item in batch:
+            item[1].tx_id = tx_id
+            # from here on cancel() fails: the caller has to resolve the batch instead
+            if item[1].set_running_or_notify_cancel():
+                live.append(item)
+        if len(live) < len(batch):
+            with self._lock:
+                self.cancelled += len(batch) - len(live)
+            batch = live
+            if not batch:
+                return
+        ballots = [b for b, _ in batch]
+        entries_a, entries_b = aggregate(ballots, self.modulus)
+        t0 = time.monotonic()
+        err: Optional[BaseException] = None
+        try:
+            self._two_pc(tx_id, entries_a, entries_b)
+        except Exception as e:
+            err = e
+        with self._lock:
+            self.batches += 1
+            self.ballots += len(ballots)
+            self.entries += len(entries_a)
+            self.failed_batches += err is not None
+            self.max_batch = max(self.max_batch, len(ballots))
+            self.flush_seconds += time.monotonic() - t0
+        for _, fut in batch:
+            if err is None:
+                fut.set_result(tx_id)
+            else:
+                fut.set_exception(err)
+
+    def snapshot(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        with self._lock:
+            return {
+                "enabled": self.running,
+                "window_ms": self.window * 1000,
+                "batch_size": self.batch_size,
+                "flushers": self.flushers,
+                "pending": self._queue.qsize(),
+                "batches": self.batches,
+                "ballots": self.ballots,
+                "avg_batch": round(self.ballots / self.batches, 2) if self.batches else 0.0,
+                "max_batch": self.max_batch,
+                "share_rows_per_node": self.entries,
+                "failed_batches": self.failed_batches,
+                "cancelled_ballots": self.cancelled,
+                "avg_2pc_ms": round(self.flush_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+                "batches_per_sec": round(self.batches / uptime, 2) if uptime else 0.0,
+                "ballots_per_sec": round(self.ballots / uptime, 2) if uptime else 0.0,
+            }
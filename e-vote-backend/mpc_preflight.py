@@ -0,0 +1,156 @@
+# mpc_preflight.py
+# One-round-trip pre-flight for app_mpc cast_mpc (sql/006_vote_records_pending.sql).
+#
+# cast_mpc used to run three helpers before contacting the share nodes (vote
+# open and inside its time window; voter by fingerprint plus a double-vote
+# SELECT; party active in the vote), so two concurrent casts for one voter
+# could both pass and both run the 2PC. reserve() does all of it in a single
+# INSERT ... SELECT that only produces a row when every check passes, and the
+# row it writes is the voter's 'pending' vote_records entry: the
+# uq_vote_records_vote_user key rejects the second cast (ER_DUP_ENTRY -> 409)
+# before any share traffic.
+#
+#   reserve()   validate + reserve, committed right away so the slot is held
+#               (not locked) while the 2PC runs; only a rejected cast pays a
+#               second query, to tell which check failed
+#   confirm()   both nodes committed: 'pending' -> 'cast' plus the mpc_audit row
+#   release()   the 2PC failed: drop the reservation so the voter can retry
+#
+# When the caller already knows the voter (fingerprint_index hit) it passes
+# user_id and users is joined by primary key, still matching the fingerprint
+# (the index may be stale); a stale hit is then handled as a miss.
+from datetime import datetime
+from typing import Optional
+
+import mysql.connector
+from fastapi import HTTPException
+
+ER_DUP_ENTRY = 1062
+ER_NO_REFERENCED_ROW_2 = 1452
+
+_OPEN = """
+    WHERE v.id = %s AND v.status = 'open'
+      AND (v.start_at IS NULL OR v.start_at <= %s) AND (v.end_at IS NULL OR v.end_at >= %s)
+"""
+
+RESERVE_SQL = """
+    INSERT INTO vote_records (vote_id, user_id, status)
+    SELECT v.id, u.id, 'pending'
+    FROM votes v
+    JOIN parties p ON p.id = %s AND p.vote_id = v.id AND p.is_active = 1
+    JOIN users u ON u.fingerprint = %s
+""" + _OPEN
+
+RESERVE_BY_USER_SQL = """
+    INSERT INTO vote_records (vote_id, user_id, status)
+    SELECT v.id, u.id, 'pending'
+    FROM votes v
+    JOIN parties p ON p.id = %s AND p.vote_id = v.id AND p.is_active = 1
+    JOIN users u ON u.id = %s AND u.fingerprint = %s
+""" + _OPEN
+
+DIAGNOSE_SQL = """
+    SELECT v.id, v.status, v.start_at, v.end_at, u.id,
+      (SELECT COUNT(*) FROM vote_records r WHERE r.vote_id = %s AND r.user_id = u.id),
+      (SELECT COUNT(*) FROM parties WHERE id = %s AND vote_id = %s AND is_active = 1)
+    FROM (SELECT 1) one
+    LEFT JOIN votes v ON v.id = %s
+    LEFT JOIN users u ON u.fingerprint = %s
+"""
+
+AUDIT_SQL = """
+    INSERT INTO mpc_audit (tx_id, vote_id, party_id, user_id, node_a_delta, node_b_delta, status)
+    SELECT %s, vote_id, %s, user_id, %s, %s, 'success' FROM vote_records WHERE id = %s
+"""
+
+
+def reserve(conn, vote_id: int, party_id: int, fingerprint: str, user_id: Optional[int] = None,
+            now: Optional[datetime] = None) -> int:
+    """Check everything and hold the voter's slot, or raise the HTTPException the old helpers did.
+
+    Returns the pending vote_records id; the reservation is committed.
+    """
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    cur = conn.cursor()
+    try:
+        try:
+            if user_id is not None:
+                cur.execute(RESERVE_BY_USER_SQL, (party_id, user_id, fingerprint, vote_id, now, now))
+            if user_id is None or cur.rowcount != 1:
+                # no index hit, or a stale one (or a failed check, which the diagnose below names)
+                cur.execute(RESERVE_SQL, (party_id, fingerprint, vote_id, now, now))
+        except mysql.connector.IntegrityError as e:
+            conn.rollback()
+            if e.errno == ER_DUP_ENTRY:
+                raise HTTPException(409, "User has already voted in this vote")
+            if e.errno == ER_NO_REFERENCED_ROW_2:
+                # the voter was deleted after the caller looked it up
+                raise HTTPException(404, "User not found by fingerprint")
+            raise
+        if cur.rowcount == 1:
+            record_id = cur.lastrowid
+            conn.commit()
+            return record_id
+        conn.rollback()
+
+        # nothing reserved: find out which check failed (same order as the old helpers)
+        cur.execute(DIAGNOSE_SQL, (vote_id, party_id, vote_id, vote_id, fingerprint))
+        found, status, start_at, end_at, uid, voted, has_party = cur.fetchone()
+        conn.rollback()
+        if not found:
+            raise HTTPException(404, "Vote not found")
+        if status != "open":
+            raise HTTPException(409, "Vote is not open")
+        if start_at and now < start_at:
+            raise HTTPException(409, "Vote not started")
+        if end_at and now > end_at:
+            raise HTTPException(409, "Vote ended")
+        if not uid:
+            raise HTTPException(404, "User not found by fingerprint")
+        if voted:
+            raise HTTPException(409, "User has already voted in this vote")
+        if not has_party:
+            raise HTTPException(404, "Party not found in this vote or inactive")
+        # everything passes now, so a concurrent admin change raced the reservation
+        raise HTTPException(409, "Vote could not be recorded, please retry")
+    finally:
+        cur.close()
+
+
+def confirm(conn, record_id: int, tx_id: str, party_id: int, delta_a: int, delta_b: int) -> int:
+    """Both share nodes committed: mark the ballot cast and audit it. Returns the voter's user_id."""
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE vote_records SET status = 'cast' WHERE id = %s", (record_id,))
+        cur.execute(AUDIT_SQL, (tx_id, party_id, delta_a, delta_b, record_id))
+        cur.execute("SELECT user_id FROM vote_records WHERE id = %s", (record_id,))
+        user_id = int(cur.fetchone()[0])
+        conn.commit()
+        return user_id
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def release(conn, record_id: int) -> Optional[int]:
+    """Drop a reservation whose 2PC failed; a row already marked cast is left alone.
+
+    Returns the voter's user_id when a reservation was dropped.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT user_id FROM vote_records WHERE id = %s AND status = 'pending' FOR UPDATE", (record_id,))
+        row = cur.fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        cur.execute("DELETE FROM vote_records WHERE id = %s AND status = 'pending'", (record_id,))
+        conn.commit()
+        return int(row[0])
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,124 @@
+# scan_buffer.py
+# Fingerprint scan buffer keyed by station (registration desk / ESP32 id).
+#
+# Replaces the single global {"fingerprint": ...} slot, where two desks
+# overwrote each other's scans. Every station has its own entry that expires
+# after `ttl` seconds, and a per-station sequence number so readers can
+# long-poll: wait(station, after=seq) returns as soon as a scan newer than
+# `seq` arrives (or the timeout passes) instead of the browser polling every
+# second. Requests without a station use DEFAULT_STATION, which behaves like
+# the old global buffer.
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_STATION = "default"
+
+
+class Scan:
+    __slots__ = ("fingerprint", "seq", "at", "updated_at")
+
+    def __init__(self, fingerprint: Optional[str], seq: int):
+        self.fingerprint = fingerprint
+        self.seq = seq
+        self.at = time.monotonic()
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+
+
+class ScanBuffer:
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._scans: Dict[str, Scan] = {}
+        self._seq: Dict[str, int] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self.scans = 0
+        self.long_polls = 0
+
+    def _live(self, station: str, now: float) -> Optional[Scan]:
+        s = self._scans.get(station)
+        if s is not None and now - s.at > self.ttl:
+            del self._scans[station]
+            return None
+        return s
+
+    def _sweep(self, now: float):
+        for station in [k for k, s in self._scans.items() if now - s.at > self.ttl]:
+            del self._scans[station]
+
+    def _set(self, station: str, fingerprint: Optional[str]) -> Scan:
+        with self._lock:
+            self._sweep(time.monotonic())
+            seq = self._seq.get(station, 0) + 1
+            self._seq[station] = seq
+            scan = Scan(fingerprint, seq)
+            if fingerprint is None:
+                self._scans.pop(station, None)
+            else:
+                self._scans[station] = scan
+                self.scans += 1
+            waiters = self._waiters.pop(station, []) if fingerprint is not None else []
+        for loop, fut in waiters:
+            # callers may be threadpool endpoints; futures belong to the event loop
+            loop.call_soon_threadsafe(_resolve, fut, scan)
+        return scan
+
+    def put(self, station: str, fingerprint: str) -> Scan:
+        return self._set(station, fingerprint)
+
+    def clear(self, station: str) -> int:
+        """Drop the station's scan; returns the seq to long-poll after for the next one."""
+        return self._set(station, None).seq
+
+    def get(self, station: str) -> Optional[Scan]:
+        with self._lock:
+            return self._live(station, time.monotonic())
+
+    async def wait(self, station: str, after: int, timeout: float) -> Optional[Scan]:
+        """A live scan with seq > after, waiting up to `timeout` seconds for one."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            s = self._live(station, time.monotonic())
+            if s is not None and s.seq > after:
+                return s
+            fut = loop.create_future()
+            self._waiters.setdefault(station, []).append((loop, fut))
+        self.long_polls += 1
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(station)
+                if waiters:
+                    waiters[:] = [w for w in waiters if w[1] is not fut]
+                    if not waiters:
+                        del self._waiters[station]
+
+    def view(self, station: str, scan: Optional[Scan]) -> Dict[str, Any]:
+        return {
+            "station": station,
+            "fingerprint": scan.fingerprint if scan else None,
+            "updated_at": scan.updated_at if scan else None,
+            "seq": scan.seq if scan else self._seq.get(station, 0),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sweep(time.monotonic())
+            return {
+                "ttl_s": self.ttl,
+                "stations_with_scan": len(self._scans),
+                "stations_seen": len(self._seq),
+                "waiting": sum(len(w) for w in self._waiters.values()),
+                "scans": self.scans,
+                "long_polls": self.long_polls,
+            }
+
+
+def _resolve(fut: asyncio.Future, scan: Scan):
+    if not fut.done():
+        fut.set_result(scan)
@@ -0,0 +1,95 @@
+# share_http.py
+# Keep-alive HTTP clients for coordinator -> share node calls (app_mpc).
+#
+# The module-level requests.post / requests.get open a new TCP connection for
+# every call, so one ballot paid a handshake per prepare / commit. ShareClients
+# keeps one requests.Session per share node (keyed by the URL's origin), each
+# mounted with its own urllib3 pool:
+#
+#   pool_size        persistent connections kept per node; size it to at
+#                    least the number of threads calling the node at once
+#                    (SHARE_FANOUT_THREADS), extra concurrent calls get a
+#                    throwaway connection
+#   connect_timeout  TCP connect, separate from
+#   read_timeout     waiting for the node's answer
+#
+# stats() reports, per node, requests made and connections opened; the
+# difference is connections reused. Nodes passed as `names` ({"A": base url})
+# are reported under that name, anything else under its origin.
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class ShareClients:
+    def __init__(self, pool_size: int = 32, connect_timeout: float = 2.0, read_timeout: float = 10.0,
+                 names: Optional[Dict[str, str]] = None):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.names = {_origin(url): name for name, url in (names or {}).items() if url}
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+
+    def session(self, url: str) -> requests.Session:
+        origin = _origin(url)
+        s = self._sessions.get(origin)
+        if s is None:
+            with self._lock:
+                s = self._sessions.get(origin)
+                if s is None:
+                    s = requests.Session()
+                    # no retries: a prepare / commit must not be sent twice behind the coordinator's back
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    s.mount(origin, adapter)
+                    self._sessions[origin] = s
+        return s
+
+    def post(self, url: str, **kw) -> requests.Response:
+        kw.setdefault("timeout", self.timeout)
+        return self.session(url).post(url, **kw)
+
+    def get(self, url: str, **kw) -> requests.Response:
+        kw.setdefault("timeout", self.timeout)
+        return self.session(url).get(url, **kw)
+
+    def close(self):
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        nodes = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for origin, s in sessions:
+            pm = s.get_adapter(origin).poolmanager
+            reqs = conns = idle = 0
+            for key in list(pm.pools.keys()):
+                pool = pm.pools.get(key)
+                if pool is None:
+                    continue
+                reqs += pool.num_requests
+                conns += pool.num_connections
+                idle += sum(1 for c in list(pool.pool.queue) if c is not None) if pool.pool else 0
+            nodes[self.names.get(origin, origin)] = {
+                "requests": reqs,
+                "connections_opened": conns,
+                "connections_reused": max(0, reqs - conns),
+                "reuse_ratio": round(1 - conns / reqs, 4) if reqs else 0.0,
+                "idle": idle,
+            }
+        return {
+            "pool_size": self.pool_size,
+            "connect_timeout_s": self.timeout[0],
+            "read_timeout_s": self.timeout[1],
+            "nodes": nodes,
+        }
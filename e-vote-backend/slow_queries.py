@@ -0,0 +1,201 @@
+# slow_queries.py
+# Slow statement capture for the timed cursors (metrics.on_query).
+#
+# Every execute / executemany slower than threshold_ms is
+#   - logged as one warning: duration, calling endpoint, normalized SQL and the
+#     shape of its parameters (types only: fingerprints and NICs never leave
+#     the process)
+#   - folded into a per-statement entry keyed by normalized SQL (count, total,
+#     max, last, endpoints), of which the slowest `top_n` are kept
+#   - with probability explain_rate, kept as a sample for EXPLAIN
+#
+# EXPLAIN never runs on the caller's connection (it may still hold unread rows
+# and an open transaction). Samples wait until explain()/aexplain() is called
+# with a fresh cursor, which the admin endpoint does before answering.
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("select", "update", "delete", "with")
+
+_normalized: Dict[str, str] = {}
+
+
+def normalize(sql: str) -> str:
+    """Literals and placeholders -> ?, IN lists -> (?+), whitespace collapsed."""
+    out = _normalized.get(sql)
+    if out is None:
+        out = _STRING.sub("?", sql)
+        out = _NUMBER.sub("?", out)
+        out = _PARAM.sub("?", out)
+        out = _IN_LIST.sub("(?+)", out)
+        out = _SPACE.sub(" ", out).strip()
+        if len(_normalized) < 4096:
+            _normalized[sql] = out
+    return out
+
+
+def param_shape(params: Any, many: bool) -> str:
+    if many:
+        rows = list(params) if not isinstance(params, (list, tuple)) else params
+        return f"{len(rows)} x {param_shape(rows[0], False)}" if rows else "0 rows"
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+class SlowStatement:
+    __slots__ = ("sql", "count", "total", "max", "last", "last_at", "shape",
+                 "endpoints", "plan", "explained_at", "sample")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.last_at = 0.0
+        self.shape = ""
+        self.endpoints: Counter = Counter()
+        self.plan: Optional[List[Dict[str, Any]]] = None
+        self.explained_at: Optional[float] = None
+        self.sample: Optional[Tuple[str, Any]] = None   # raw (sql, params) awaiting EXPLAIN
+
+    def view(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 1),
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 1),
+            "last_ms": round(self.last * 1000, 1),
+            "last_at": self.last_at,
+            "params": self.shape,
+            "endpoints": dict(self.endpoints.most_common(5)),
+            "plan": self.plan,
+            "explained_at": self.explained_at,
+            "explain_pending": self.sample is not None,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = 250, top_n: int = 50, explain_rate: float = 0.0,
+                 log: bool = True):
+        self.threshold = threshold_ms / 1000
+        self.top_n = top_n
+        self.explain_rate = explain_rate
+        self.log = log
+        self._lock = threading.Lock()
+        self._stmts: Dict[str, SlowStatement] = {}
+        self.slow = 0
+
+    def record(self, sql: str, params: Any, seconds: float, many: bool):
+        """metrics.on_query hook; must stay cheap below the threshold."""
+        if seconds < self.threshold or self.threshold < 0:
+            return
+        if sql.lstrip()[:7].lower() == "explain":
+            return
+        norm = normalize(sql)
+        endpoint = metrics.current_endpoint() or "background"
+        shape = param_shape(params, many)
+        if self.log:
+            log.warning("slow query %.0fms [%s] %s %s", seconds * 1000, endpoint, norm, shape)
+        with self._lock:
+            self.slow += 1
+            s = self._stmts.get(norm)
+            if s is None:
+                if len(self._stmts) >= self.top_n:
+                    # keep the slowest top_n statements by worst case
+                    victim = min(self._stmts.values(), key=lambda e: e.max)
+                    if victim.max >= seconds:
+                        return
+                    del self._stmts[victim.sql]
+                s = self._stmts[norm] = SlowStatement(norm)
+            s.count += 1
+            s.total += seconds
+            s.max = max(s.max, seconds)
+            s.last, s.last_at, s.shape = seconds, time.time(), shape
+            s.endpoints[endpoint] += 1
+            if (not many and s.sample is None and self.explain_rate > 0
+                    and norm.split(" ", 1)[0].lower() in _EXPLAINABLE
+                    and random.random() < self.explain_rate):
+                s.sample = (sql, params)
+
+    # ---------------- EXPLAIN ----------------
+    def _pending(self) -> List[SlowStatement]:
+        with self._lock:
+            return [s for s in self._stmts.values() if s.sample is not None]
+
+    @staticmethod
+    def _plan(cur, rows) -> List[Dict[str, Any]]:
+        cols = [d[0] for d in cur.description or ()]
+        return [dict(zip(cols, r)) for r in rows]
+
+    def _store(self, s: SlowStatement, plan: List[Dict[str, Any]]):
+        s.plan, s.explained_at, s.sample = plan, time.time(), None
+
+    def explain(self, cur) -> int:
+        """Blocking cursor (app_mpc); EXPLAIN every pending sample. Returns how many ran."""
+        n = 0
+        for s in self._pending():
+            sql, params = s.sample
+            try:
+                cur.execute("EXPLAIN " + sql, params)
+                self._store(s, self._plan(cur, cur.fetchall()))
+            except Exception as e:
+                self._store(s, [{"error": str(e)}])
+            n += 1
+        return n
+
+    async def aexplain(self, cur) -> int:
+        """Awaitable cursor (main.py adb())."""
+        n = 0
+        for s in self._pending():
+            sql, params = s.sample
+            try:
+                await cur.execute("EXPLAIN " + sql, params)
+                self._store(s, self._plan(cur, await cur.fetchall()))
+            except Exception as e:
+                self._store(s, [{"error": str(e)}])
+            n += 1
+        return n
+
+    def pending(self) -> int:
+        return len(self._pending())
+
+    # ---------------- reporting ----------------
+    ORDER = {"max": lambda s: s.max, "total": lambda s: s.total, "count": lambda s: s.count,
+             "last": lambda s: s.last_at}
+
+    def top(self, limit: int = 20, order: str = "max") -> Dict[str, Any]:
+        key = self.ORDER.get(order)
+        if key is None:
+            raise ValueError(f"order must be one of {', '.join(self.ORDER)}")
+        with self._lock:
+            stmts = sorted(self._stmts.values(), key=key, reverse=True)[:limit]
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "explain_rate": self.explain_rate,
+                "slow_queries": self.slow,
+                "statements": [s.view() for s in stmts],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stmts.clear()
+            self.slow = 0
@@ -0,0 +1,13 @@
+-- 001: let the database enforce "one vote per voter per vote".
+--
+-- cast_vote_mpc used to SELECT for an existing row and then INSERT, so two
+-- concurrent casts for the same voter could both pass the check. With this
+-- key the second INSERT fails with ER_DUP_ENTRY (1062), which the cast
+-- engine maps to 409.
+--
+-- Existing duplicates must be resolved before the key can be added:
+--   SELECT vote_id, user_id, COUNT(*) c FROM vote_records
+--   GROUP BY vote_id, user_id HAVING c > 1;
+
+ALTER TABLE vote_records
+  ADD UNIQUE KEY uq_vote_records_vote_user (vote_id, user_id);
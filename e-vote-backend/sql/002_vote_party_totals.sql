@@ -0,0 +1,21 @@
+-- 002: materialized per-party counters for /api/votes/{vote_id}/results.
+--
+-- Maintained in the same transaction as every cast (counters.bump), so the
+-- results endpoint reads O(parties) rows instead of aggregating vote_records.
+-- `python -m counters verify [--fix]` recomputes them and reports drift.
+
+CREATE TABLE IF NOT EXISTS vote_party_totals (
+  vote_id    INT NOT NULL,
+  party_id   INT NOT NULL,
+  votes      BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (vote_id, party_id)
+) ENGINE=InnoDB;
+
+-- backfill from the ballots already cast
+INSERT INTO vote_party_totals (vote_id, party_id, votes)
+SELECT vote_id, party_id, COUNT(*)
+FROM vote_records
+WHERE party_id IS NOT NULL
+GROUP BY vote_id, party_id
+ON DUPLICATE KEY UPDATE votes = VALUES(votes);
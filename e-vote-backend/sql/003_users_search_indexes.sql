@@ -0,0 +1,12 @@
+-- 003: indexes behind the admin voter search (voter_search.py).
+--
+-- NIC / email / mobile searches are prefix matches and use these B-tree
+-- indexes; names go through the FULLTEXT index (or the B-tree prefix index
+-- for terms shorter than innodb_ft_min_token_size). Skip any line whose
+-- index already exists (e.g. a UNIQUE key on nic or fingerprint).
+
+ALTER TABLE users ADD INDEX idx_users_nic (nic);
+ALTER TABLE users ADD INDEX idx_users_email (email);
+ALTER TABLE users ADD INDEX idx_users_mobile (mobile);
+ALTER TABLE users ADD INDEX idx_users_full_name (full_name);
+ALTER TABLE users ADD FULLTEXT INDEX ft_users_full_name (full_name);
@@ -0,0 +1,15 @@
+-- 005: per-minute cast counts for /api/votes/{vote_id}/turnout/series?source=db.
+--
+-- Written by turnout_series.TurnoutSeries.flush() every SERIES_FLUSH_S seconds
+-- from the in-memory rings; each worker adds its own deltas, so the rows are
+-- the cluster-wide totals. dim is 'all' (name ''), 'polling' (polling division)
+-- or 'station'; bucket_at is the unix time the bucket starts.
+
+CREATE TABLE IF NOT EXISTS vote_turnout_series (
+  vote_id   INT NOT NULL,
+  dim       VARCHAR(16) NOT NULL,
+  name      VARCHAR(64) NOT NULL DEFAULT '',
+  bucket_at BIGINT NOT NULL,
+  casts     INT UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (vote_id, dim, name, bucket_at)
+) ENGINE=InnoDB;
@@ -0,0 +1,16 @@
+-- 006: reserve the voter's slot before app_mpc talks to the share nodes.
+--
+-- cast_mpc's pre-flight (mpc_preflight.py) writes the vote_records row as
+-- 'pending' in the same statement that checks the vote, party and voter, so
+-- uq_vote_records_vote_user turns away a concurrent duplicate before any
+-- share traffic. The row becomes 'cast' together with its mpc_audit row once
+-- both nodes committed, and is deleted if the 2PC fails. Rows written by
+-- main.py are 'cast' from the start.
+--
+-- A 'pending' row that stays pending means the coordinator died mid-2PC; the
+-- voter stays blocked until it is resolved against mpc_audit and the share
+-- nodes' share_transactions:
+--   SELECT * FROM vote_records WHERE status = 'pending' AND created_at < NOW() - INTERVAL 1 MINUTE;
+
+ALTER TABLE vote_records
+  ADD COLUMN status ENUM('pending', 'cast') NOT NULL DEFAULT 'cast';
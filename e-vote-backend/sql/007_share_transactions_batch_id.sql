@@ -0,0 +1,11 @@
+-- 007: share node rows of a micro-batched 2PC (app_mpc MPC_BATCH_WINDOW_MS > 0).
+--
+-- prepare_batch stores entry i of batch <tx_id> as share_transactions row
+-- "<tx_id>:<i>" and now also records <tx_id> in batch_id, so commit_batch /
+-- abort_batch / batch_status find the batch's rows by equality on an index
+-- instead of a LIKE on the tx_id prefix. Per-ballot rows leave it NULL.
+-- Run on each share node's database.
+
+ALTER TABLE share_transactions
+  ADD COLUMN batch_id VARCHAR(64) NULL,
+  ADD INDEX idx_share_transactions_batch (batch_id);
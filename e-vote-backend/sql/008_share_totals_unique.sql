@@ -0,0 +1,31 @@
+-- 008: one share_totals row per (vote_id, party_id).
+--
+-- share_commit / commit_batch add their delta with INSERT ... ON DUPLICATE
+-- KEY UPDATE (app_mpc SHARE_TOTALS_ADD_SQL), which only adds to the existing
+-- row when this key exists; without it every commit inserts another row and
+-- share_snapshot / tally_mpc keep an arbitrary one per party.
+-- Run on each share node's database.
+--
+-- Existing duplicates must be merged before the key can be added:
+--   SELECT vote_id, party_id, COUNT(*) c FROM share_totals
+--   GROUP BY vote_id, party_id HAVING c > 1;
+-- Each duplicate holds part of the party's share, so the statements below sum
+-- them modulo app_mpc MODULUS (2^61 - 1) into a single row. Stop the node's
+-- commits while they run.
+
+CREATE TEMPORARY TABLE share_totals_merged AS
+  SELECT vote_id, party_id, MOD(SUM(share), 2305843009213693951) AS share
+  FROM share_totals
+  GROUP BY vote_id, party_id
+  HAVING COUNT(*) > 1;
+
+DELETE t FROM share_totals t
+  JOIN share_totals_merged m ON m.vote_id = t.vote_id AND m.party_id = t.party_id;
+
+INSERT INTO share_totals (vote_id, party_id, share)
+  SELECT vote_id, party_id, share FROM share_totals_merged;
+
+DROP TEMPORARY TABLE share_totals_merged;
+
+ALTER TABLE share_totals
+  ADD UNIQUE KEY uq_share_totals_vote_party (vote_id, party_id);
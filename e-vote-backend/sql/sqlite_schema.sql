@@ -0,0 +1,131 @@
+-- SQLite schema for DB_MODE=sqlite (sqlite_store.py).
+--
+-- Mirrors the MySQL tables the services use, with migrations 001-007 folded
+-- in. Applied with CREATE ... IF NOT EXISTS on every start, so keep it
+-- additive. The coordinator and share node tables live side by side; a share
+-- node simply leaves the voter tables empty.
+
+CREATE TABLE IF NOT EXISTS admins (
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  full_name  TEXT NOT NULL,
+  email      TEXT NOT NULL UNIQUE,
+  password   TEXT NOT NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+  id             INTEGER PRIMARY KEY AUTOINCREMENT,
+  full_name      TEXT NOT NULL,
+  nic            TEXT NOT NULL UNIQUE,
+  dob            DATE,
+  gender         TEXT,
+  household      TEXT,
+  mobile         TEXT,
+  email          TEXT,
+  location_id    TEXT,
+  administration TEXT,
+  electoral      TEXT,
+  polling        TEXT,
+  gn             TEXT,
+  fingerprint    TEXT UNIQUE,
+  created_at     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS idx_users_mobile ON users (mobile);
+CREATE INDEX IF NOT EXISTS idx_users_full_name ON users (full_name);
+
+CREATE TABLE IF NOT EXISTS votes (
+  id          INTEGER PRIMARY KEY AUTOINCREMENT,
+  title       TEXT NOT NULL,
+  description TEXT,
+  created_by  INTEGER REFERENCES admins (id) ON DELETE SET NULL,
+  status      TEXT NOT NULL DEFAULT 'draft',
+  start_at    DATETIME,
+  end_at      DATETIME,
+  created_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_votes_status ON votes (status);
+
+CREATE TABLE IF NOT EXISTS parties (
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  vote_id    INTEGER NOT NULL REFERENCES votes (id) ON DELETE CASCADE,
+  name       TEXT NOT NULL,
+  code       TEXT,
+  symbol_url TEXT,
+  is_active  INTEGER NOT NULL DEFAULT 1,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE (vote_id, name),
+  UNIQUE (vote_id, code)
+);
+
+CREATE TABLE IF NOT EXISTS vote_records (
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  vote_id    INTEGER NOT NULL REFERENCES votes (id) ON DELETE CASCADE,
+  user_id    INTEGER NOT NULL REFERENCES users (id),
+  party_id   INTEGER REFERENCES parties (id) ON DELETE SET NULL,
+  status     TEXT NOT NULL DEFAULT 'cast',
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vote_records_vote_user ON vote_records (vote_id, user_id);
+
+CREATE TABLE IF NOT EXISTS vote_party_totals (
+  vote_id    INTEGER NOT NULL,
+  party_id   INTEGER NOT NULL,
+  votes      INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (vote_id, party_id)
+);
+
+CREATE TABLE IF NOT EXISTS mpc_audit (
+  id           INTEGER PRIMARY KEY AUTOINCREMENT,
+  tx_id        TEXT NOT NULL,
+  vote_id      INTEGER NOT NULL,
+  party_id     INTEGER NOT NULL,
+  user_id      INTEGER NOT NULL,
+  node_a_delta INTEGER NOT NULL,
+  node_b_delta INTEGER NOT NULL,
+  status       TEXT NOT NULL,
+  created_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- share nodes (app_mpc MODE=share)
+CREATE TABLE IF NOT EXISTS share_transactions (
+  tx_id      TEXT PRIMARY KEY,
+  vote_id    INTEGER NOT NULL,
+  party_id   INTEGER NOT NULL,
+  delta      INTEGER NOT NULL,
+  status     TEXT NOT NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  batch_id   TEXT
+);
+-- idx_share_transactions_batch (007) is created by sqlite_store.init_db, after
+-- ADDED_COLUMNS has given an older file the column
+
+CREATE TABLE IF NOT EXISTS share_totals (
+  vote_id  INTEGER NOT NULL,
+  party_id INTEGER NOT NULL,
+  share    INTEGER NOT NULL,
+  PRIMARY KEY (vote_id, party_id)
+);
+
+-- turnout rollups (004_vote_turnout.sql)
+CREATE TABLE IF NOT EXISTS vote_turnout (
+  vote_id    INTEGER NOT NULL,
+  electoral  TEXT NOT NULL DEFAULT '',
+  polling    TEXT NOT NULL DEFAULT '',
+  gn         TEXT NOT NULL DEFAULT '',
+  voters     INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (vote_id, electoral, polling, gn)
+);
+
+-- per-minute cast counts (005_vote_turnout_series.sql)
+CREATE TABLE IF NOT EXISTS vote_turnout_series (
+  vote_id   INTEGER NOT NULL,
+  dim       TEXT NOT NULL,
+  name      TEXT NOT NULL DEFAULT '',
+  bucket_at INTEGER NOT NULL,
+  casts     INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (vote_id, dim, name, bucket_at)
+);
@@ -0,0 +1,328 @@
+# sqlite_store.py
+# Embedded SQLite engine behind the same connection / cursor surface the
+# services use for MySQL (DB_MODE=sqlite in main.py, COORD_SQLITE_PATH /
+# SHARE_SQLITE_PATH in app_mpc).
+#
+# A single polling station does not need a MySQL server: SQLiteConnection
+# looks like a mysql.connector connection, so db_pool.ElasticPool pools it,
+# dal.ThreadedPool makes it awaitable and every endpoint runs unchanged.
+#
+#   translate()   the MySQL dialect the endpoints speak -> SQLite
+#                 (%s placeholders, ON DUPLICATE KEY UPDATE, FOR UPDATE,
+#                 MATCH ... AGAINST, LIKE escapes, parenthesized UNION arms;
+#                 SET SESSION becomes a no-op)
+#   errors        sqlite3 errors are re-raised as the mysql.connector error
+#                 the handlers already catch, with the MySQL errno (1062
+#                 duplicate key, 1452 / 1451 foreign key, ...)
+#   PRAGMAS       WAL journal, synchronous=NORMAL, foreign keys on, busy
+#                 timeout, 64 MiB page cache, mmap
+#
+# Write transactions start with BEGIN IMMEDIATE, so concurrent writers queue
+# on busy_timeout instead of failing a lock upgrade. The schema lives in
+# sql/sqlite_schema.sql and is applied by init_db().
+#
+# This is a dialect adapter, not a repository layer: the endpoints keep their
+# SQL and only the statements they actually run are covered. A query using
+# MySQL syntax not listed above fails on SQLite; tests/test_sqlite_store.py
+# runs the schema and the cast / search queries against a real file.
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Sequence
+
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "sqlite_schema.sql")
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",     # durable at checkpoints; a power cut loses at most the last commits
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",      # KiB
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+# ---------------- type mapping ----------------
+def _to_datetime(b: bytes):
+    s = b.decode()
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return s
+
+
+def _to_date(b: bytes):
+    s = b.decode()
+    try:
+        return date.fromisoformat(s[:10])
+    except ValueError:
+        return s
+
+
+sqlite3.register_converter("DATETIME", _to_datetime)
+sqlite3.register_converter("TIMESTAMP", _to_datetime)
+sqlite3.register_converter("DATE", _to_date)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, str)
+
+
+# ---------------- dialect ----------------
+_PLACEHOLDER = re.compile(r"%s|'(?:[^'\\]|\\.)*'")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_ON_DUP = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_FN = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+_MATCH = re.compile(r"MATCH\s*\(\s*(\w+)\s*\)\s*AGAINST\s*\(\s*%s\s+IN\s+BOOLEAN\s+MODE\s*\)", re.IGNORECASE)
+_LIKE = re.compile(r"\bLIKE\s+\?", re.IGNORECASE)
+_UNION_FIRST = re.compile(r"\(\s*\(\s*SELECT\b", re.IGNORECASE)
+_UNION_NEXT = re.compile(r"\)\s*UNION(\s+ALL)?\s*\(\s*SELECT\b", re.IGNORECASE)
+_SKIP = re.compile(r"^\s*SET\s+(SESSION\s+)?\w+\s*=", re.IGNORECASE)
+
+_translated: Dict[str, Optional[str]] = {}
+
+
+def translate(sql: str) -> Optional[str]:
+    """MySQL statement -> SQLite statement; None for session settings SQLite has no use for."""
+    out = _translated.get(sql, "")
+    if out != "":
+        return out
+    if _SKIP.match(sql):
+        out = None
+    else:
+        out = _MATCH.sub(r"evote_match(\1, %s)", sql)
+        out = _PLACEHOLDER.sub(lambda m: "?" if m.group(0) == "%s" else m.group(0), out)
+        # MySQL's LIKE escapes with a backslash by default, SQLite's only when told
+        out = _LIKE.sub(r"LIKE ? ESCAPE '\\'", out)
+        out = _FOR_UPDATE.sub("", out)
+        if _ON_DUP.search(out):
+            head, tail = _ON_DUP.split(out, 1)
+            out = head + "ON CONFLICT DO UPDATE SET" + _VALUES_FN.sub(r"excluded.\1", tail)
+        # SQLite does not take parenthesized compound arms: (SELECT ..) UNION (SELECT ..)
+        out = _UNION_FIRST.sub("(SELECT * FROM (SELECT", out)
+        out = _UNION_NEXT.sub(lambda m: f") UNION{m.group(1) or ''} SELECT * FROM (SELECT", out)
+    if len(_translated) < 4096:
+        _translated[sql] = out
+    return out
+
+
+def evote_match(text: Optional[str], query: str) -> int:
+    """MATCH ... AGAINST ('+word* +word*' IN BOOLEAN MODE) for the voter search."""
+    if not text:
+        return 0
+    words = re.findall(r"\w+", text.lower())
+    for term in query.lower().split():
+        required, term = term.startswith("+"), term.lstrip("+")
+        prefix, term = term.endswith("*"), term.rstrip("*")
+        hit = any(w.startswith(term) if prefix else w == term for w in words)
+        if required and not hit:
+            return 0
+    return 1
+
+
+# ---------------- errors ----------------
+_UNIQUE = re.compile(r"UNIQUE constraint failed: (.+)")
+_NOT_NULL = re.compile(r"NOT NULL constraint failed: \w+\.(\w+)")
+
+
+def mysql_error(e: sqlite3.Error, sql: str = "") -> mysql.connector.Error:
+    msg = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        m = _UNIQUE.search(msg)
+        if m:
+            cols = [c.strip() for c in m.group(1).split(",")]
+            table = cols[0].split(".")[0]
+            key = "_".join(c.split(".")[-1] for c in cols)
+            if key == "rowid" or key == "id":
+                key = "PRIMARY"
+            return mysql_errors.IntegrityError(msg=f"Duplicate entry '...' for key '{table}.{key}'", errno=1062)
+        if "FOREIGN KEY" in msg:
+            if sql.lstrip()[:6].upper() in ("DELETE", "UPDATE"):
+                return mysql_errors.IntegrityError(
+                    msg="Cannot delete or update a parent row: a foreign key constraint fails", errno=1451)
+            return mysql_errors.IntegrityError(
+                msg="Cannot add or update a child row: a foreign key constraint fails", errno=1452)
+        m = _NOT_NULL.search(msg)
+        if m:
+            return mysql_errors.IntegrityError(msg=f"Column '{m.group(1)}' cannot be null", errno=1048)
+        return mysql_errors.IntegrityError(msg=msg, errno=3819)
+    if isinstance(e, sqlite3.OperationalError):
+        if "locked" in msg or "busy" in msg:
+            return mysql_errors.OperationalError(msg=msg, errno=1205)   # lock wait timeout
+        if "syntax error" in msg or "no such" in msg:
+            return mysql_errors.ProgrammingError(msg=msg, errno=1064)
+        return mysql_errors.OperationalError(msg=msg, errno=2013)
+    if isinstance(e, sqlite3.DataError):
+        return mysql_errors.DataError(msg=msg, errno=1406)
+    return mysql_errors.DatabaseError(msg=msg, errno=1105)
+
+
+# ---------------- connection / cursor ----------------
+class SQLiteCursor:
+    def __init__(self, conn: "SQLiteConnection", dictionary: bool = False):
+        self._conn = conn
+        self._cur = conn.raw.cursor()
+        self._dict = dictionary
+        self._skipped = False
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self._cur.lastrowid
+
+    @property
+    def description(self):
+        return None if self._skipped else self._cur.description
+
+    @property
+    def with_rows(self) -> bool:
+        return self.description is not None
+
+    def _row(self, row):
+        if row is None or not self._dict:
+            return row
+        return dict(zip([d[0] for d in self._cur.description], row))
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None):
+        stmt = translate(sql)
+        self._skipped = stmt is None
+        if stmt is None:
+            return None
+        try:
+            self._cur.execute(stmt, tuple(params) if params is not None else ())
+        except sqlite3.Error as e:
+            raise mysql_error(e, sql) from e
+
+    def executemany(self, sql: str, seq_params):
+        stmt = translate(sql)
+        if stmt is None:
+            return None
+        try:
+            self._cur.executemany(stmt, [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise mysql_error(e, sql) from e
+
+    def fetchone(self):
+        if self._skipped:
+            return None
+        return self._row(self._cur.fetchone())
+
+    def fetchmany(self, size: int = 1):
+        if self._skipped:
+            return []
+        return [self._row(r) for r in self._cur.fetchmany(size)]
+
+    def fetchall(self):
+        if self._skipped:
+            return []
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    """The slice of the mysql.connector connection API the services and db_pool use."""
+
+    unread_result = False
+
+    def __init__(self, path: str):
+        self.path = path
+        # pooled connections move between threadpool threads, one user at a time
+        self.raw = sqlite3.connect(
+            path, check_same_thread=False, isolation_level="IMMEDIATE",
+            detect_types=sqlite3.PARSE_DECLTYPES, timeout=5.0,
+        )
+        self.raw.create_function("evote_match", 2, evote_match, deterministic=True)
+        for p in PRAGMAS:
+            self.raw.execute(p)
+        self._open = True
+
+    def cursor(self, dictionary: bool = False, **_ignored) -> SQLiteCursor:
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.raw.in_transaction
+
+    def consume_results(self):
+        pass
+
+    def commit(self):
+        try:
+            self.raw.commit()
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def rollback(self):
+        try:
+            self.raw.rollback()
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def is_connected(self) -> bool:
+        return self._open
+
+    def ping(self, reconnect: bool = False, attempts: int = 1, delay: int = 0):
+        if not self._open:
+            raise mysql_errors.InterfaceError(msg="connection is closed", errno=2055)
+
+    def close(self):
+        if self._open:
+            self._open = False
+            self.raw.close()
+
+
+_init_lock = threading.Lock()
+_initialized: set = set()
+
+# columns later migrations added to tables an older file already has
+# (CREATE TABLE IF NOT EXISTS leaves those alone): (table, column, definition)
+ADDED_COLUMNS = (
+    ("vote_records", "status", "TEXT NOT NULL DEFAULT 'cast'"),      # 006
+    ("share_transactions", "batch_id", "TEXT"),                      # 007
+)
+# indexes on ADDED_COLUMNS, created once the columns exist
+ADDED_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_share_transactions_batch ON share_transactions (batch_id)",   # 007
+)
+
+
+def init_db(path: str):
+    """Create the file and apply sql/sqlite_schema.sql once per process."""
+    with _init_lock:
+        if path in _initialized:
+            return
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            with open(SCHEMA_FILE) as f:
+                conn.executescript(f.read())
+            for table, column, ddl in ADDED_COLUMNS:
+                if column not in {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            for ddl in ADDED_INDEXES:
+                conn.execute(ddl)
+            conn.commit()
+        finally:
+            conn.close()
+        _initialized.add(path)
+
+
+def connect(path: str) -> SQLiteConnection:
+    init_db(path)
+    return SQLiteConnection(path)
@@ -0,0 +1,55 @@
+import ballot_cache
+from ballot_cache import BytesCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    cache = BytesCache(max_entries=2)
+    cache.put(1, b"one")
+    cache.put(2, b"two")
+    assert cache.get(1) == b"one"          # 2 is now least recently used
+    cache.put(3, b"three")
+    assert cache.get(2) is None and cache.get(1) == b"one" and cache.get(3) == b"three"
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ballot_cache.time, "monotonic", clock)
+    cache = BytesCache(ttl=30)
+    cache.put(1, b"one")
+    clock.now += 29
+    assert cache.get(1) == b"one"
+    clock.now += 1
+    assert cache.get(1) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = BytesCache()
+    gen = cache.generation
+    cache.invalidate(1)                     # a mutation raced the read
+    cache.put(1, b"stale", generation=gen)
+    assert cache.get(1) is None
+    cache.put(1, b"fresh", generation=cache.generation)
+    assert cache.get(1) == b"fresh"
+
+
+def test_invalidate_one_or_all_and_stats():
+    cache = BytesCache()
+    for k in (1, 2, 3):
+        cache.put(k, b"x")
+    cache.invalidate(1)
+    assert cache.get(1) is None and cache.get(2) == b"x"
+    cache.invalidate()
+    assert cache.get(3) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 2)
+    assert stats["hit_ratio"] == round(1 / 3, 4)
@@ -0,0 +1,148 @@
+import threading
+
+import mysql.connector
+import pytest
+
+import db_pool
+from db_pool import ElasticPool, PoolExhausted
+
+
+class FakeConn:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.unread_result = False
+        self.in_transaction = False
+        self.broken = False
+
+    def consume_results(self):
+        self.unread_result = False
+
+    def rollback(self):
+        if self.broken:
+            raise mysql.connector.errors.OperationalError("lost connection")
+        self.in_transaction = False
+
+    def is_connected(self):
+        return not self.broken
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def connect(opened):
+    def connect():
+        conn = FakeConn(len(opened))
+        opened.append(conn)
+        return conn
+    return connect
+
+
+# ---------------- checkout ----------------
+def test_grows_to_max_size_then_times_out(connect, opened):
+    pool = ElasticPool(connect, min_size=0, max_size=2, checkout_timeout=0.05)
+    a, b = pool.get_connection(), pool.get_connection()
+    with pytest.raises(PoolExhausted):
+        pool.get_connection()
+    snap = pool.snapshot()
+    assert (snap["size"], snap["in_use"], snap["exhausted_timeouts"]) == (2, 2, 1)
+    a.close()
+    a.close()                                   # a second close is a no-op
+    c = pool.get_connection()
+    assert c._conn is opened[0] and len(opened) == 2
+    assert pool.snapshot()["in_use"] == 2
+
+
+def test_full_wait_queue_is_rejected_at_once(connect):
+    pool = ElasticPool(connect, min_size=0, max_size=1, max_waiters=0, checkout_timeout=5)
+    pool.get_connection()
+    with pytest.raises(PoolExhausted, match="wait queue is full"):
+        pool.get_connection()
+    assert pool.stats.rejected == 1 and pool.stats.timeouts == 0
+
+
+def test_waiter_gets_the_released_connection(connect):
+    pool = ElasticPool(connect, min_size=0, max_size=1, checkout_timeout=5)
+    held = pool.get_connection()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.get_connection()))
+    t.start()
+    while pool.snapshot()["waiters"] == 0:
+        pass
+    held._conn.in_transaction = True
+    held.close()
+    t.join(5)
+    assert got[0]._conn is held._conn and not held._conn.in_transaction
+    assert pool.stats.waited == 1
+
+
+def test_connect_error_frees_the_slot(opened):
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise mysql.connector.errors.InterfaceError("refused")
+        return FakeConn(len(calls))
+
+    pool = ElasticPool(connect, min_size=0, max_size=1, checkout_timeout=0.05)
+    with pytest.raises(mysql.connector.errors.InterfaceError):
+        pool.get_connection()
+    assert pool.get_connection() is not None
+    assert pool.stats.connect_errors == 1 and pool.snapshot()["size"] == 1
+
+
+# ---------------- release / reaping ----------------
+def test_broken_and_discarded_connections_are_closed(connect, opened):
+    pool = ElasticPool(connect, min_size=0, max_size=2)
+    a, b = pool.get_connection(), pool.get_connection()
+    a._conn.in_transaction, a._conn.broken = True, True
+    a.close()
+    b.discard()
+    assert opened[0].closed and opened[1].closed
+    snap = pool.snapshot()
+    assert (snap["size"], snap["in_use"], snap["idle"]) == (0, 0, 0)
+
+
+def test_idle_connections_are_reaped_down_to_min_size(connect, opened, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool.time, "monotonic", clock)
+    pool = ElasticPool(connect, min_size=1, max_size=3, idle_timeout=60, ping_after=3600)
+    conns = [pool.get_connection() for _ in range(3)]
+    for c in conns:
+        c.close()
+        clock.now += 1
+    clock.now += 58                              # only the first release is past idle_timeout
+    conn = pool.get_connection()
+    assert [c.closed for c in opened] == [True, False, False]
+    assert conn._conn is opened[2]               # most recently used first
+    conn.close()
+    clock.now += 3600
+    pool.get_connection()
+    assert [c.closed for c in opened] == [True, True, False]
+    assert pool.snapshot()["size"] == 1
+
+
+def test_stale_idle_connection_is_replaced(connect, opened, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool.time, "monotonic", clock)
+    pool = ElasticPool(connect, min_size=0, max_size=1, idle_timeout=3600, ping_after=30)
+    pool.get_connection().close()
+    opened[0].broken = True                     # server closed it while idle
+    clock.now += 31
+    conn = pool.get_connection()
+    assert opened[0].closed and conn._conn is opened[1]
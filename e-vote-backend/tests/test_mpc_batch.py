@@ -0,0 +1,76 @@
+import queue
+import threading
+
+import pytest
+
+import mpc_batch
+
+M = 2**61 - 1
+
+
+def test_aggregate_sums_per_party_and_node():
+    a, b = mpc_batch.aggregate([(1, 2, 5, M - 4), (1, 2, M - 1, 3), (1, 3, 7, 8)], M)
+    assert a == [{"vote_id": 1, "party_id": 2, "delta": 4}, {"vote_id": 1, "party_id": 3, "delta": 7}]
+    assert b == [{"vote_id": 1, "party_id": 2, "delta": M - 1}, {"vote_id": 1, "party_id": 3, "delta": 8}]
+
+
+def test_batch_resolves_every_ballot_with_its_tx_id():
+    calls = []
+    batcher = mpc_batch.ShareBatcher(lambda tx, a, b: calls.append((tx, a, b)), M, window=0.05, flushers=1)
+    batcher.start()
+    try:
+        futs = [batcher.submit(1, 2, 1, 0) for _ in range(3)]
+        tx_ids = {f.result(5) for f in futs}
+    finally:
+        batcher.stop()
+    assert tx_ids == {calls[0][0]} and {f.tx_id for f in futs} == tx_ids
+    assert calls[0][1] == [{"vote_id": 1, "party_id": 2, "delta": 3}]
+    assert batcher.snapshot()["ballots"] == 3
+
+
+def test_failed_batch_fails_every_ballot():
+    def two_pc(tx, a, b):
+        raise RuntimeError("node down")
+
+    batcher = mpc_batch.ShareBatcher(two_pc, M, window=0.01, flushers=1)
+    batcher.start()
+    try:
+        fut = batcher.submit(1, 2, 1, 0)
+        with pytest.raises(RuntimeError):
+            fut.result(5)
+    finally:
+        batcher.stop()
+    assert batcher.snapshot()["failed_batches"] == 1
+
+
+def test_cancelled_ballot_is_left_out_of_its_batch():
+    release = threading.Event()
+    calls = []
+
+    def two_pc(tx, a, b):
+        calls.append(a)
+        release.wait(5)
+
+    batcher = mpc_batch.ShareBatcher(two_pc, M, window=0.0, flushers=1)
+    batcher.start()
+    try:
+        first = batcher.submit(1, 2, 1, 0)          # holds the only flusher
+        while not first.running():
+            pass
+        queued = batcher.submit(1, 2, 10, 0)
+        kept = batcher.submit(1, 3, 100, 0)
+        assert queued.cancel() and not first.cancel()
+        assert first.tx_id is not None
+        release.set()
+        kept.result(5)
+    finally:
+        batcher.stop()
+    assert calls[1] == [{"vote_id": 1, "party_id": 3, "delta": 100}]
+    assert batcher.snapshot()["cancelled_ballots"] == 1
+
+
+def test_submit_does_not_block_when_full():
+    batcher = mpc_batch.ShareBatcher(lambda tx, a, b: None, M, max_pending=1)
+    batcher.submit(1, 2, 1, 0)
+    with pytest.raises(queue.Full):
+        batcher.submit(1, 2, 1, 0)
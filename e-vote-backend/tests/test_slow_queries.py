@@ -0,0 +1,67 @@
+import pytest
+
+from slow_queries import SlowQueryLog, normalize, param_shape
+
+
+# ---------------- normalize ----------------
+def test_normalize_literals_and_placeholders():
+    assert normalize("SELECT id FROM users WHERE nic = '90\\'1V' AND age > 18 AND vote_id = %s") == \
+        "SELECT id FROM users WHERE nic = ? AND age > ? AND vote_id = ?"
+    assert normalize("UPDATE t SET a = %(a)s WHERE b = \"x\"") == "UPDATE t SET a = ? WHERE b = ?"
+
+
+def test_normalize_in_lists_and_whitespace():
+    assert normalize("SELECT *\n  FROM t\tWHERE id IN (%s, %s,%s)") == "SELECT * FROM t WHERE id IN (?+)"
+    assert normalize("SELECT * FROM t WHERE id IN (1, 2)") == normalize("SELECT * FROM t WHERE id IN (%s,%s,%s)")
+    # identifiers with digits are kept
+    assert normalize("SELECT col2 FROM t2") == "SELECT col2 FROM t2"
+
+
+# ---------------- param_shape ----------------
+def test_param_shape():
+    assert param_shape(None, False) == "()"
+    assert param_shape((1, "fp"), False) == "(int, str)"
+    assert param_shape({"k": 1.5}, False) == "{k: float}"
+    assert param_shape([(1,), (2,)], True) == "2 x (int)"
+    assert param_shape(iter([(1, None)]), True) == "1 x (int, NoneType)"
+    assert param_shape([], True) == "0 rows"
+
+
+# ---------------- SlowQueryLog ----------------
+def test_record_folds_by_statement_and_keeps_the_slowest(caplog):
+    q = SlowQueryLog(threshold_ms=100, top_n=2)
+    q.record("SELECT 1 FROM a WHERE id = %s", (1,), 0.05, False)       # under the threshold
+    q.record("SELECT 1 FROM a WHERE id = %s", ("901234567V",), 0.2, False)
+    q.record("SELECT 1 FROM a WHERE id = 7", None, 0.3, False)
+    q.record("SELECT 1 FROM b", None, 0.15, False)
+    q.record("SELECT 1 FROM c", None, 0.12, False)                      # slower than nothing kept
+    q.record("SELECT 1 FROM d", None, 0.5, False)                       # evicts b
+    stmts = q.top()["statements"]
+    assert [(s["sql"], s["count"], s["max_ms"]) for s in stmts] == [
+        ("SELECT ? FROM d", 1, 500.0), ("SELECT ? FROM a WHERE id = ?", 2, 300.0)]
+    assert q.slow == 5
+    assert "slow query 200ms" in caplog.text and "(str)" in caplog.text
+    assert "901234567V" not in caplog.text
+    with pytest.raises(ValueError):
+        q.top(order="avg")
+
+
+def test_explain_runs_pending_samples():
+    class Cur:
+        description = (("id",), ("type",))
+
+        def execute(self, sql, params):
+            assert sql.startswith("EXPLAIN ")
+
+        def fetchall(self):
+            return [(1, "ref")]
+
+    q = SlowQueryLog(threshold_ms=0, explain_rate=1.0, log=False)
+    q.record("SELECT * FROM users WHERE nic = %s", ("901234567V",), 0.01, False)
+    q.record("INSERT INTO t VALUES (%s)", (1,), 0.01, False)            # not explainable
+    assert q.pending() == 1
+    assert q.explain(Cur()) == 1 and q.pending() == 0
+    plan = next(s for s in q.top()["statements"] if s["sql"].startswith("SELECT"))["plan"]
+    assert plan == [{"id": 1, "type": "ref"}]
+    q.reset()
+    assert q.top()["statements"] == [] and q.slow == 0
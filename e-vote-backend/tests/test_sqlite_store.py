@@ -0,0 +1,208 @@
+import pytest
+from fastapi import HTTPException
+from mysql.connector import errors as mysql_errors
+
+import cast_engine
+import counters
+import mpc_preflight
+import sqlite_store
+import voter_search
+from sqlite_store import translate
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = sqlite_store.connect(str(tmp_path / "evote.db"))
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def vote(conn):
+    """One open vote with two parties and three voters: (vote_id, [party ids], {fingerprint: user_id})."""
+    cur = conn.cursor()
+    cur.execute("INSERT INTO votes (title, status) VALUES (%s, 'open')", ("General",))
+    vote_id = cur.lastrowid
+    parties = []
+    for name in ("Blue", "Green"):
+        cur.execute("INSERT INTO parties (vote_id, name, code) VALUES (%s, %s, %s)", (vote_id, name, name[0]))
+        parties.append(cur.lastrowid)
+    voters = {}
+    for i, (name, nic, mobile, email) in enumerate([
+        ("Nimal Perera", "901234567V", "0771234567", "nimal@example.lk"),
+        ("Kamala Silva", "199012345678", "0719876543", "kamala@example.lk"),
+        ("Sunil 50% Fernando", "881112223X", "+94 77 555 0000", "sunil_f@example.lk"),
+    ]):
+        cur.execute("INSERT INTO users (full_name, nic, mobile, email, fingerprint) VALUES (%s, %s, %s, %s, %s)",
+                    (name, nic, mobile, email, f"fp-{i}"))
+        voters[f"fp-{i}"] = cur.lastrowid
+    conn.commit()
+    cur.close()
+    return vote_id, parties, voters
+
+
+def fetch(conn, sql, args=()):
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, args)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+# ---------------- translate ----------------
+def test_translate_placeholders_skip_quoted_strings():
+    assert translate("SELECT '%s', x FROM t WHERE a = %s AND b = 'it''s'") == \
+        "SELECT '%s', x FROM t WHERE a = ? AND b = 'it''s'"
+
+
+def test_translate_on_duplicate_key():
+    out = translate(counters.UPSERT_SQL)
+    assert "ON CONFLICT DO UPDATE SET votes = votes + excluded.votes" in out
+    assert "%s" not in out
+
+
+def test_translate_drops_for_update_and_session_settings():
+    assert translate("SELECT id FROM users WHERE id = %s FOR UPDATE") == "SELECT id FROM users WHERE id = ?"
+    assert translate("SET SESSION net_write_timeout = %s") is None
+
+
+def test_translate_like_escape_and_match():
+    assert translate("SELECT 1 FROM users WHERE email LIKE %s") == "SELECT 1 FROM users WHERE email LIKE ? ESCAPE '\\'"
+    assert translate("SELECT 1 FROM users WHERE MATCH(full_name) AGAINST (%s IN BOOLEAN MODE)") == \
+        "SELECT 1 FROM users WHERE evote_match(full_name, ?)"
+
+
+def test_translate_parenthesized_union():
+    out = translate("SELECT * FROM ((SELECT id FROM a LIMIT %s) UNION (SELECT id FROM b LIMIT %s)) u")
+    assert out == "SELECT * FROM (SELECT * FROM (SELECT id FROM a LIMIT ?) UNION SELECT * FROM (SELECT id FROM b LIMIT ?)) u"
+
+
+def test_evote_match():
+    assert sqlite_store.evote_match("Nimal Perera", "+nim* +per*") == 1
+    assert sqlite_store.evote_match("Nimal Perera", "+nim* +sil*") == 0
+    assert sqlite_store.evote_match(None, "+nim*") == 0
+
+
+# ---------------- schema ----------------
+def test_schema_is_reapplied_idempotently(tmp_path):
+    path = str(tmp_path / "again.db")
+    sqlite_store.init_db(path)
+    sqlite_store._initialized.discard(path)
+    sqlite_store.init_db(path)
+    c = sqlite_store.connect(path)
+    try:
+        cols = {r[1] for r in fetch(c, "PRAGMA table_info(vote_records)")}
+        assert {"vote_id", "user_id", "party_id", "status"} <= cols
+        assert "batch_id" in {r[1] for r in fetch(c, "PRAGMA table_info(share_transactions)")}
+    finally:
+        c.close()
+
+
+def test_errors_carry_mysql_errnos(conn, vote):
+    vote_id, parties, voters = vote
+    cur = conn.cursor()
+    with pytest.raises(mysql_errors.IntegrityError) as e:
+        cur.execute("INSERT INTO users (full_name, nic) VALUES (%s, %s)", ("Dup", "901234567V"))
+    assert e.value.errno == 1062
+    conn.rollback()
+    with pytest.raises(mysql_errors.IntegrityError) as e:
+        cur.execute("INSERT INTO vote_records (vote_id, user_id) VALUES (%s, %s)", (vote_id, 99999))
+    assert e.value.errno == 1452
+    conn.rollback()
+
+
+# ---------------- cast ----------------
+def test_cast_sql_one_vote_per_voter(conn, vote):
+    vote_id, parties, voters = vote
+    cur = conn.cursor()
+    cur.execute(cast_engine.CAST_SQL, (parties[0], "fp-0", vote_id))
+    assert cur.rowcount == 1
+    cur.execute(cast_engine.CAST_BY_USER_SQL, (parties[1], voters["fp-2"], "fp-1", vote_id))
+    assert cur.rowcount == 0                        # stale index hit: fp-1 is not that voter's
+    cur.execute(cast_engine.CAST_BY_USER_SQL, (parties[1], voters["fp-1"], "fp-1", vote_id))
+    assert cur.rowcount == 1
+    conn.commit()
+    with pytest.raises(mysql_errors.IntegrityError) as e:
+        cur.execute(cast_engine.CAST_SQL, (parties[1], "fp-0", vote_id))
+    assert e.value.errno == cast_engine.ER_DUP_ENTRY
+    conn.rollback()
+    # an unknown fingerprint inserts nothing, and the diagnose query says why
+    cur.execute(cast_engine.CAST_SQL, (parties[0], "fp-missing", vote_id))
+    assert cur.rowcount == 0
+    cur.execute(cast_engine.DIAGNOSE_SQL, (vote_id, parties[0], vote_id, "fp-missing"))
+    assert cur.fetchone() == (1, 1, 0)
+    conn.rollback()
+    cur.close()
+
+
+def test_counter_upsert(conn, vote):
+    vote_id, parties, _ = vote
+    cur = conn.cursor()
+    cur.executemany(counters.UPSERT_SQL, [(vote_id, parties[0], 2), (vote_id, parties[0], 3)])
+    conn.commit()
+    cur.close()
+    assert fetch(conn, "SELECT votes FROM vote_party_totals WHERE vote_id = %s", (vote_id,)) == [(5,)]
+
+
+def test_mpc_reserve_confirm_release(conn, vote):
+    vote_id, parties, voters = vote
+    record_id = mpc_preflight.reserve(conn, vote_id, parties[0], "fp-0")
+    with pytest.raises(HTTPException) as e:
+        mpc_preflight.reserve(conn, vote_id, parties[0], "fp-0")
+    assert e.value.status_code == 409
+    assert mpc_preflight.confirm(conn, record_id, "tx-1", parties[0], 1, 2) == voters["fp-0"]
+    assert fetch(conn, "SELECT status FROM vote_records WHERE id = %s", (record_id,)) == [("cast",)]
+    # a confirmed ballot is not released
+    assert mpc_preflight.release(conn, record_id) is None
+
+    record_id = mpc_preflight.reserve(conn, vote_id, parties[1], "fp-1", user_id=voters["fp-1"])
+    assert mpc_preflight.release(conn, record_id) == voters["fp-1"]
+    assert fetch(conn, "SELECT COUNT(*) FROM vote_records WHERE id = %s", (record_id,)) == [(0,)]
+
+
+def test_mpc_reserve_stale_index_hit(conn, vote):
+    vote_id, parties, voters = vote
+    # the index still maps fp-2 to fp-0's voter: the ballot goes to fp-2's
+    record_id = mpc_preflight.reserve(conn, vote_id, parties[0], "fp-2", user_id=voters["fp-0"])
+    assert fetch(conn, "SELECT user_id FROM vote_records WHERE id = %s", (record_id,)) == [(voters["fp-2"],)]
+    with pytest.raises(HTTPException) as e:
+        mpc_preflight.reserve(conn, vote_id, parties[0], "fp-missing", user_id=voters["fp-1"])
+    assert (e.value.status_code, e.value.detail) == (404, "User not found by fingerprint")
+
+
+def test_mpc_reserve_diagnoses(conn, vote):
+    vote_id, parties, _ = vote
+    with pytest.raises(HTTPException) as e:
+        mpc_preflight.reserve(conn, vote_id, parties[0], "fp-missing")
+    assert (e.value.status_code, e.value.detail) == (404, "User not found by fingerprint")
+    with pytest.raises(HTTPException) as e:
+        mpc_preflight.reserve(conn, vote_id + 1, parties[0], "fp-0")
+    assert (e.value.status_code, e.value.detail) == (404, "Vote not found")
+
+
+# ---------------- voter search ----------------
+def search(conn, q, limit=10, **kw):
+    sql, args = voter_search.build_list_query("id, full_name", q, limit, **kw)
+    return [name for _, name in fetch(conn, sql, args)]
+
+
+def test_search_paths(conn, vote):
+    assert search(conn, "nimal@") == ["Nimal Perera"]
+    assert search(conn, "199012345678") == ["Kamala Silva"]
+    assert search(conn, "0719") == ["Kamala Silva"]                 # mobile prefix, UNION with nic
+    assert search(conn, "9012") == ["Nimal Perera"]                 # nic prefix, UNION with mobile
+    assert search(conn, "kamala silva") == ["Kamala Silva"]         # FULLTEXT -> evote_match
+    assert search(conn, "Su") == ["Sunil 50% Fernando"]             # short term: name prefix
+    assert search(conn, "sunil_f@") == ["Sunil 50% Fernando"]       # _ is escaped, not a wildcard
+    assert search(conn, "50%", match="contains") == ["Sunil 50% Fernando"]
+
+
+def test_search_keyset_pages(conn, vote):
+    sql, args = voter_search.build_list_query("id", None, 2)
+    first = [r[0] for r in fetch(conn, sql, args)]
+    after = voter_search.next_cursor(first, 2)
+    sql, args = voter_search.build_list_query("id", None, 2, after_id=after)
+    second = [r[0] for r in fetch(conn, sql, args)]
+    assert len(first) == 2 and len(second) == 1 and max(second) < min(first)
+    assert voter_search.next_cursor(second, 2) is None
@@ -0,0 +1,61 @@
+import pytest
+
+from turnout_series import Ring, TurnoutSeries
+
+
+# ---------------- Ring ----------------
+def test_ring_counts_per_bucket():
+    ring = Ring(4)
+    ring.add(10, 1, 600.0)
+    ring.add(10, 2, 601.0)
+    ring.add(11, 5, 660.0)
+    assert (ring.get(10), ring.get(11), ring.get(12)) == (3, 5, 0)
+    assert ring.last_at == 660.0
+
+
+def test_ring_reuses_a_slot_for_a_newer_bucket():
+    ring = Ring(4)
+    ring.add(10, 3, 600.0)
+    ring.add(14, 1, 840.0)           # same slot, one lap later
+    assert ring.get(14) == 1 and ring.get(10) == 0
+
+
+def test_ring_ignores_buckets_it_no_longer_reaches():
+    ring = Ring(4)
+    ring.add(14, 1, 840.0)
+    ring.add(10, 3, 600.0)
+    assert ring.get(14) == 1 and ring.get(10) == 0
+    assert ring.last_at == 840.0
+
+
+# ---------------- TurnoutSeries ----------------
+def test_series_steps_and_dimensions():
+    ts = TurnoutSeries(bucket_s=60, slots=60)
+    for at in (0.0, 30.0, 60.0, 179.0):
+        ts.record(1, "Colombo", at=at)
+    ts.record(1, None, at=120.0)
+    ts.record_station(1, "S-1", at=120.0)
+    out = ts.series(1, window_s=240, resolution_s=120, now=179.0)
+    assert out["start"] == -60
+    assert out["series"][0]["counts"] == [2, 3] and out["series"][0]["total"] == 5
+    polling = ts.series(1, "polling", window_s=180, resolution_s=60, now=179.0)["series"]
+    assert [(s["name"], s["counts"]) for s in polling] == [("Colombo", [2, 1, 1])]
+    assert ts.series(1, "station", "S-1", window_s=60, now=179.0)["series"][0]["counts"] == [1]
+
+
+def test_disabled_series_records_nothing():
+    ts = TurnoutSeries(enabled=False)
+    ts.record(1, "Colombo")
+    ts.record_station(1, "S-1")
+    assert not ts.pending and ts.series(1)["series"] == []
+
+
+def test_check_rejects_bad_windows():
+    ts = TurnoutSeries(bucket_s=60, slots=10)
+    with pytest.raises(ValueError):
+        ts.check(3600, 90)
+    with pytest.raises(ValueError):
+        ts.check(30, 60)
+    with pytest.raises(ValueError):
+        ts.check(1200, 60)                    # past the ring
+    ts.check(1200, 60, in_memory=False)
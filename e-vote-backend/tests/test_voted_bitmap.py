@@ -0,0 +1,72 @@
+import voted_bitmap
+from voted_bitmap import ARRAY_MAX, ChunkedBitmap, VotedSets
+
+
+# ---------------- ChunkedBitmap ----------------
+def test_add_contains_discard():
+    bits = ChunkedBitmap()
+    assert bits.add(5) and bits.add(1 << 16 | 5) and not bits.add(5)
+    assert 5 in bits and (1 << 16 | 5) in bits and 6 not in bits and (2 << 16) not in bits
+    assert len(bits) == 2 and bits.containers() == {"array": 2, "bitset": 0}
+    assert bits.discard(5) and not bits.discard(5) and not bits.discard(7 << 16)
+    assert 5 not in bits and len(bits) == 1
+    # the emptied chunk is dropped
+    assert bits.containers() == {"array": 1, "bitset": 0}
+
+
+def test_array_chunk_stays_sorted():
+    bits = ChunkedBitmap()
+    for x in (900, 3, 4464, 41):
+        bits.add(x)
+    assert list(bits._chunks[0]) == sorted(bits._chunks[0])
+
+
+def test_array_converts_to_bitset_past_array_max():
+    bits = ChunkedBitmap()
+    for x in range(0, 2 * (ARRAY_MAX + 1), 2):
+        bits.add(x)
+    assert bits.containers() == {"array": 0, "bitset": 1}
+    assert bits.nbytes() == voted_bitmap.BITSET_BYTES
+    assert len(bits) == ARRAY_MAX + 1
+    assert 2 * ARRAY_MAX in bits and 1 not in bits
+    assert not bits.add(0)
+    assert bits.discard(0) and 0 not in bits and not bits.discard(0)
+    assert len(bits) == ARRAY_MAX and bits.containers()["bitset"] == 1
+
+
+# ---------------- VotedSets ----------------
+class Rows:
+    """Blocking cursor answering BUILD_SQL from a list of user_ids."""
+
+    def __init__(self, user_ids):
+        self.user_ids = sorted(user_ids)
+        self._rows = []
+
+    def execute(self, sql, args):
+        _vote_id, after, limit = args
+        self._rows = [(u,) for u in self.user_ids if u > after][:limit]
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_only_built_votes_answer():
+    sets = VotedSets(batch_size=2)
+    assert sets.begin(1) and not sets.begin(1)
+    sets.add(1, 10)
+    assert not sets.has_voted(1, 10)          # still building
+    sets.build(Rows([3, 7, 8, 20, 21]), 1)
+    assert all(sets.has_voted(1, u) for u in (3, 7, 8, 10, 20, 21))
+    assert not sets.has_voted(1, 4) and not sets.has_voted(1, None) and not sets.has_voted(2, 3)
+    assert sets.turnout(1) == 6 and sets.turnout(2) is None
+    sets.discard(1, 10)
+    assert not sets.has_voted(1, 10) and sets.turnout(1) == 5
+
+
+def test_disabled_and_dropped():
+    assert not VotedSets(enabled=False).begin(1)
+    sets = VotedSets()
+    sets.begin(1)
+    sets.drop(1)
+    sets.build(Rows([1]), 1)
+    assert not sets.tracked(1) and not sets.has_voted(1, 1)
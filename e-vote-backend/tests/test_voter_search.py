@@ -0,0 +1,45 @@
+from voter_search import build_list_query, like_prefix, next_cursor, search_branches
+
+
+# ---------------- search_branches ----------------
+def test_like_prefix_escapes_wildcards():
+    assert like_prefix("a_b%c\\") == "a\\_b\\%c\\\\%"
+
+
+def test_branch_per_term_kind():
+    assert search_branches(" nimal@ex ") == [("email LIKE %s", ["nimal@ex%"])]
+    assert search_branches("901234567v") == [("nic = %s", ["901234567v"])]
+    assert search_branches("199012345678") == [("nic = %s", ["199012345678"])]
+    assert search_branches("+94 77-555") == [("nic LIKE %s", ["+9477555%"]), ("mobile LIKE %s", ["+9477555%"])]
+    assert search_branches("kamala (silva)") == \
+        [("MATCH(full_name) AGAINST (%s IN BOOLEAN MODE)", ["+kamala* +silva*"])]
+    assert search_branches("de silva") == [("full_name LIKE %s", ["de silva%"])]
+
+
+def test_contains_searches_every_column():
+    cond, args = search_branches("50%", match="contains")[0]
+    assert cond.count("LIKE %s") == 4 and args == ["%50%%"] * 4
+
+
+# ---------------- build_list_query ----------------
+def test_single_branch_page():
+    sql, args = build_list_query("id", None, 20, offset=40)
+    assert sql == "SELECT id FROM users WHERE 1=1 ORDER BY id DESC LIMIT %s OFFSET %s"
+    assert args == [20, 40]
+    sql, args = build_list_query("id", "x@y", 20, after_id=500)
+    assert "WHERE email LIKE %s AND id < %s ORDER BY id DESC" in sql
+    assert args == ["x@y%", 500, 20, 0]
+
+
+def test_union_page_limits_each_branch():
+    sql, args = build_list_query("id", "0771", 10, offset=5, after_id=90)
+    assert sql.count("UNION") == 1 and sql.startswith("SELECT * FROM ((SELECT id FROM users WHERE nic LIKE")
+    assert sql.endswith(") u ORDER BY id DESC LIMIT %s OFFSET %s")
+    assert args == ["0771%", 90, 15, "0771%", 90, 15, 10, 5]
+
+
+# ---------------- next_cursor ----------------
+def test_next_cursor():
+    assert next_cursor([9, 7, 4], 3) == 4
+    assert next_cursor([9, 7], 3) is None
+    assert next_cursor([], 0) is None
@@ -0,0 +1,160 @@
+# turnout.py
+# Turnout rollups by electoral geography (sql/004_vote_turnout.sql).
+#
+#   bump()       inside the cast transaction: vote_turnout += voters per
+#                (vote, electoral, polling, gn); the geography is read from
+#                users by primary key (never a join over vote_records) and
+#                returned, so after-commit hooks can use it too; a cast that
+#                only knows the fingerprint gets its user_id from the same read
+#   drill()      one level of electoral > polling > gn, optionally inside a
+#                parent division, read from the rollup rows only
+#   rebuild()    recompute from vote_records JOIN users (after a restore, or
+#                for casts written by something that did not bump)
+#
+# NULL geography is stored as '' (primary key columns) and reported as null.
+#
+# CLI:  python -m turnout rebuild [--vote-id N]
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+GEO_SQL = """
+    SELECT id, COALESCE(electoral, ''), COALESCE(polling, ''), COALESCE(gn, '')
+    FROM users WHERE id IN ({ids})
+"""
+
+GEO_BY_FINGERPRINT_SQL = """
+    SELECT id, COALESCE(electoral, ''), COALESCE(polling, ''), COALESCE(gn, '')
+    FROM users WHERE fingerprint = %s
+"""
+
+UPSERT_SQL = """
+    INSERT INTO vote_turnout (vote_id, electoral, polling, gn, voters) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE voters = voters + VALUES(voters)
+"""
+
+Geo = Tuple[str, str, str]     # (electoral, polling, gn), '' where unknown
+
+
+def voters_by_vote(rows: Iterable[Tuple[int, int, Optional[int]]]) -> Dict[int, List[int]]:
+    """(vote_id, user_id, party_id) rows -> {vote_id: [user_id, ...]}; every ballot counts, party or not."""
+    out: Dict[int, List[int]] = defaultdict(list)
+    for vote_id, user_id, _party_id in rows:
+        out[vote_id].append(user_id)
+    return out
+
+
+async def bump(cur, rows, fingerprint: Optional[str] = None) -> Dict[int, Geo]:
+    """Add the ballots to vote_turnout; returns {user_id: geography} for in-process consumers.
+
+    With fingerprint, rows is the one ballot of that voter and its user_id may be
+    None: the voter is looked up by fingerprint and the returned key is its id.
+    """
+    if fingerprint is not None:
+        await cur.execute(GEO_BY_FINGERPRINT_SQL, (fingerprint,))
+        geo = {int(r[0]): (r[1], r[2], r[3]) for r in await cur.fetchall()}
+        by_vote = {vote_id: list(geo) for vote_id, _user_id, _party_id in rows}
+    else:
+        by_vote = voters_by_vote(rows)
+        user_ids = sorted({u for users in by_vote.values() for u in users})
+        if not user_ids:
+            return {}
+        await cur.execute(GEO_SQL.format(ids=", ".join(["%s"] * len(user_ids))), user_ids)
+        geo = {int(r[0]): (r[1], r[2], r[3]) for r in await cur.fetchall()}
+    deltas: Dict[Tuple[int, str, str, str], int] = Counter()
+    for vote_id, users in by_vote.items():
+        for u in users:
+            if u in geo:
+                deltas[(vote_id, *geo[u])] += 1
+    # sorted so concurrent transactions lock rollup rows in the same order
+    params = [key + (n,) for key, n in sorted(deltas.items())]
+    if len(params) == 1:
+        await cur.execute(UPSERT_SQL, params[0])
+    elif params:
+        await cur.executemany(UPSERT_SQL, params)
+    return geo
+
+
+def _level(electoral: Optional[str], polling: Optional[str]) -> str:
+    if electoral is None:
+        return "electoral"
+    return "polling" if polling is None else "gn"
+
+
+async def drill(cur, vote_id: int, electoral: Optional[str] = None, polling: Optional[str] = None) -> Dict[str, Any]:
+    """Voters per division one level below the given parent (none: electoral districts)."""
+    if polling is not None and electoral is None:
+        raise ValueError("polling needs electoral")
+    level = _level(electoral, polling)
+    where, args = "vote_id = %s", [vote_id]
+    for col, val in (("electoral", electoral), ("polling", polling)):
+        if val is not None:
+            where += f" AND {col} = %s"
+            args.append(val)
+    await cur.execute(
+        f"SELECT {level}, SUM(voters) FROM vote_turnout WHERE {where} GROUP BY {level} ORDER BY {level}", args
+    )
+    items = [{"name": name or None, "voted": int(n)} for name, n in await cur.fetchall()]
+    return {
+        "vote_id": vote_id, "level": level, "electoral": electoral, "polling": polling,
+        "voted": sum(i["voted"] for i in items), "items": items,
+    }
+
+
+# ---------------- Rebuild ----------------
+async def rebuild(conn, vote_id: Optional[int] = None) -> Dict[str, Any]:
+    """Rewrite vote_turnout from vote_records.
+
+    Same locking as counters.verify: the rollup rows are locked FOR UPDATE
+    first, so casts for the vote(s) queue behind us, and the recount is a
+    plain (non-locking) read taken after that.
+    """
+    cur = await conn.cursor()
+    try:
+        where, args = ("WHERE vote_id = %s", (vote_id,)) if vote_id else ("", ())
+        await cur.execute(f"SELECT vote_id, electoral, polling, gn, voters FROM vote_turnout {where} FOR UPDATE", args)
+        before = sum(int(r[4]) for r in await cur.fetchall())
+        await cur.execute(
+            f"""SELECT r.vote_id, COALESCE(u.electoral, '') AS e, COALESCE(u.polling, '') AS p,
+                       COALESCE(u.gn, '') AS g, COUNT(*)
+                FROM vote_records r JOIN users u ON u.id = r.user_id
+                WHERE r.status = 'cast' {'AND r.vote_id = %s' if vote_id else ''}
+                GROUP BY r.vote_id, e, p, g""",
+            args,
+        )
+        fresh = [(int(v), e, p, g, int(n)) for v, e, p, g, n in await cur.fetchall()]
+        await cur.execute(f"DELETE FROM vote_turnout {where}", args)
+        if fresh:
+            await cur.executemany(
+                "INSERT INTO vote_turnout (vote_id, electoral, polling, gn, voters) VALUES (%s, %s, %s, %s, %s)",
+                fresh,
+            )
+        await conn.commit()
+        return {"rows": len(fresh), "voters": sum(r[4] for r in fresh), "voters_before": before}
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await cur.close()
+
+
+async def _cli(args):
+    from main import apool  # reuse main.py's DB settings and pool
+
+    await apool.open()
+    conn = await apool.acquire()
+    try:
+        report = await rebuild(conn, args.vote_id)
+    finally:
+        await conn.close()
+        await apool.close()
+    print(f"rebuilt {report['rows']} rollup rows: {report['voters']} voters (was {report['voters_before']})")
+    return 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="rebuild vote_turnout from vote_records")
+    ap.add_argument("command", choices=("rebuild",))
+    ap.add_argument("--vote-id", type=int)
+    raise SystemExit(asyncio.run(_cli(ap.parse_args())))
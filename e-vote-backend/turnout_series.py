@@ -0,0 +1,215 @@
+# turnout_series.py
+# Cast rate over time per vote, in fixed-width buckets (sql/005_vote_turnout_series.sql).
+#
+#   Ring            `slots` counters of `bucket_s` seconds each; bucket b lives
+#                   in slot b % slots and a slot still tagged with an older
+#                   bucket is reset on the next write, so memory is fixed and
+#                   history older than slots * bucket_s simply falls off
+#   TurnoutSeries   one Ring per (vote, dimension, name):
+#                     all       every cast
+#                     polling   the voter's polling division (turnout.bump)
+#                     station   the station id sent with the cast
+#   flush()         adds what was recorded since the last flush to
+#                   vote_turnout_series; the upsert is additive, so every
+#                   worker can flush into the same rows
+#   series()        counts for a window at a resolution (a multiple of
+#                   bucket_s), O(window / bucket_s) per series whatever the
+#                   number of ballots; db_series() answers the same query
+#                   from the persisted rows
+#
+# The rings hold this process's casts since start; with several workers, or
+# to look further back than the ring, query the persisted rows. Off unless
+# enabled (main.py TURNOUT_SERIES=1): record() is then a no-op.
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+DIMENSIONS = ("all", "polling", "station")
+
+UPSERT_SQL = """
+    INSERT INTO vote_turnout_series (vote_id, dim, name, bucket_at, casts) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE casts = casts + VALUES(casts)
+"""
+
+Key = Tuple[int, str, str]     # (vote_id, dimension, name)
+
+
+class Ring:
+    __slots__ = ("counts", "tags", "last_at")
+
+    def __init__(self, slots: int):
+        self.counts = array("q", bytes(8 * slots))
+        self.tags = array("q", [-1]) * slots
+        self.last_at = 0.0
+
+    def add(self, bucket: int, n: int, at: float):
+        i = bucket % len(self.tags)
+        tag = self.tags[i]
+        if tag != bucket:
+            if tag > bucket:
+                return          # older than the ring reaches
+            self.tags[i] = bucket
+            self.counts[i] = 0
+        self.counts[i] += n
+        self.last_at = max(self.last_at, at)
+
+    def get(self, bucket: int) -> int:
+        i = bucket % len(self.tags)
+        return self.counts[i] if self.tags[i] == bucket else 0
+
+
+class TurnoutSeries:
+    def __init__(self, bucket_s: int = 60, slots: int = 1440, max_series: int = 20000, enabled: bool = True):
+        self.enabled = enabled
+        self.bucket_s = bucket_s
+        self.slots = slots
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._rings: Dict[Key, Ring] = {}
+        self._pending: Dict[Tuple[int, str, str, int], int] = {}
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    # ---------------- recording ----------------
+    def _add(self, key: Key, bucket: int, n: int, at: float):
+        ring = self._rings.get(key)
+        if ring is None:
+            if len(self._rings) >= self.max_series:
+                self.dropped += n
+                return
+            ring = self._rings[key] = Ring(self.slots)
+        ring.add(bucket, n, at)
+        pk = key + (bucket,)
+        self._pending[pk] = self._pending.get(pk, 0) + n
+
+    def record(self, vote_id: int, polling: Optional[str] = None, at: Optional[float] = None):
+        """One committed ballot (after_cast_commit); polling '' or None counts under 'all' only."""
+        if not self.enabled:
+            return
+        at = time.time() if at is None else at
+        bucket = int(at // self.bucket_s)
+        with self._lock:
+            self.recorded += 1
+            self._add((vote_id, "all", ""), bucket, 1, at)
+            if polling:
+                self._add((vote_id, "polling", polling), bucket, 1, at)
+
+    def record_station(self, vote_id: int, station: str, at: Optional[float] = None):
+        if not self.enabled:
+            return
+        at = time.time() if at is None else at
+        with self._lock:
+            self._add((vote_id, "station", station), int(at // self.bucket_s), 1, at)
+
+    # ---------------- persistence ----------------
+    @property
+    def pending(self) -> bool:
+        """Anything for flush() to write (check before taking a connection)."""
+        return bool(self._pending)
+
+    async def flush(self, cur) -> int:
+        """Write the casts recorded since the last flush; the caller commits."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        params = [(v, d, name, b * self.bucket_s, n) for (v, d, name, b), n in sorted(pending.items())]
+        try:
+            await cur.executemany(UPSERT_SQL, params)
+        except BaseException:
+            # keep the deltas for the next attempt
+            with self._lock:
+                self.flush_errors += 1
+                for pk, n in pending.items():
+                    self._pending[pk] = self._pending.get(pk, 0) + n
+            raise
+        self.flushed_rows += len(params)
+        return len(params)
+
+    # ---------------- queries ----------------
+    def check(self, window_s: int, resolution_s: int, in_memory: bool = True):
+        if resolution_s <= 0 or resolution_s % self.bucket_s:
+            raise ValueError(f"resolution must be a multiple of {self.bucket_s}s")
+        if window_s < resolution_s:
+            raise ValueError("window must be at least one resolution step")
+        if window_s // resolution_s > 5000:
+            raise ValueError("too many points (window / resolution > 5000)")
+        if in_memory and window_s > self.slots * self.bucket_s:
+            raise ValueError(f"the in-memory series covers {self.slots * self.bucket_s}s; use source=db")
+
+    def _frame(self, window_s: int, resolution_s: int, now: Optional[float]) -> Tuple[int, int, int]:
+        """(first bucket, buckets per step, steps); the last step ends with the current bucket."""
+        now = time.time() if now is None else now
+        per_step = resolution_s // self.bucket_s
+        steps = window_s // resolution_s
+        last = int(now // self.bucket_s)
+        return last - steps * per_step + 1, per_step, steps
+
+    def _view(self, vote_id: int, dim: str, window_s: int, resolution_s: int, first: int,
+              series: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "vote_id": vote_id, "dimension": dim, "bucket_s": self.bucket_s, "resolution_s": resolution_s,
+            "window_s": window_s, "start": first * self.bucket_s, "series": series,
+        }
+
+    def series(self, vote_id: int, dim: str = "all", name: Optional[str] = None, window_s: int = 3600,
+               resolution_s: int = 60, now: Optional[float] = None) -> Dict[str, Any]:
+        self.check(window_s, resolution_s)
+        first, per_step, steps = self._frame(window_s, resolution_s, now)
+        with self._lock:
+            keys = [k for k in self._rings if k[0] == vote_id and k[1] == dim and (name is None or k[2] == name)]
+            out = []
+            for key in sorted(keys):
+                ring = self._rings[key]
+                counts = [
+                    sum(ring.get(b) for b in range(first + s * per_step, first + (s + 1) * per_step))
+                    for s in range(steps)
+                ]
+                out.append({"name": key[2] or None, "counts": counts, "total": sum(counts),
+                            "last_cast_at": ring.last_at or None})
+        return self._view(vote_id, dim, window_s, resolution_s, first, out)
+
+    async def db_series(self, cur, vote_id: int, dim: str = "all", name: Optional[str] = None,
+                        window_s: int = 3600, resolution_s: int = 60, now: Optional[float] = None) -> Dict[str, Any]:
+        """Same answer from vote_turnout_series (all workers, as of their last flush)."""
+        self.check(window_s, resolution_s, in_memory=False)
+        first, per_step, steps = self._frame(window_s, resolution_s, now)
+        where, args = "vote_id = %s AND dim = %s", [vote_id, dim]
+        if name is not None:
+            where += " AND name = %s"
+            args.append(name)
+        args += [first * self.bucket_s, (first + steps * per_step) * self.bucket_s]
+        await cur.execute(
+            f"SELECT name, bucket_at, casts FROM vote_turnout_series "
+            f"WHERE {where} AND bucket_at >= %s AND bucket_at < %s",
+            args,
+        )
+        by_name: Dict[str, List[int]] = {}
+        last: Dict[str, int] = {}
+        for n, bucket_at, casts in await cur.fetchall():
+            counts = by_name.setdefault(n, [0] * steps)
+            counts[(int(bucket_at) // self.bucket_s - first) // per_step] += int(casts)
+            last[n] = max(last.get(n, 0), int(bucket_at))
+        out = [{"name": n or None, "counts": c, "total": sum(c), "last_bucket_at": last[n]}
+               for n, c in sorted(by_name.items())]
+        return self._view(vote_id, dim, window_s, resolution_s, first, out)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "bucket_s": self.bucket_s,
+                "slots": self.slots,
+                "horizon_s": self.bucket_s * self.slots,
+                "series": len(self._rings),
+                "max_series": self.max_series,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "pending_rows": len(self._pending),
+                "flushed_rows": self.flushed_rows,
+                "flush_errors": self.flush_errors,
+                "approx_mb": round(len(self._rings) * self.slots * 16 / 2**20, 1),
+            }
@@ -0,0 +1,215 @@
+# voted_bitmap.py
+# Per-vote sets of user_ids that have voted (VOTED_BITMAP=1).
+#
+# Repeat attempts used to cost `SELECT id FROM vote_records WHERE vote_id=%s
+# AND user_id=%s` each. VotedSets keeps one ChunkedBitmap per tracked vote,
+# filled from vote_records when the vote opens (or on its first cast) and
+# advanced after every committed cast, so a repeat attempt whose user_id is
+# known is answered with 409 before touching MySQL.
+#
+# Only "voted" answers are trusted. A user missing from the bitmap (cast on
+# another worker, bitmap still building) is checked by the database as before,
+# and the uq_vote_records_vote_user key remains the real guard. Only 'cast'
+# rows are loaded; app_mpc's 'pending' reservations may still be released.
+#
+# ChunkedBitmap is roaring-style: user_ids are split into 2^16 chunks; a chunk
+# holds a sorted array('H') of its low 16 bits until it has ARRAY_MAX members,
+# then switches to a fixed 8 KiB bitset.
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional, Union
+
+ARRAY_MAX = 4096           # 4096 * 2 bytes == the 8 KiB bitset
+BITSET_BYTES = 1 << 13
+
+BUILD_SQL = """
+    SELECT user_id FROM vote_records
+    WHERE vote_id = %s AND status = 'cast' AND user_id > %s
+    ORDER BY user_id LIMIT %s
+"""
+
+
+class ChunkedBitmap:
+    def __init__(self):
+        self._chunks: Dict[int, Union[array, bytearray]] = {}
+        self._card = 0
+
+    def add(self, x: int) -> bool:
+        hi, lo = x >> 16, x & 0xFFFF
+        c = self._chunks.get(hi)
+        if c is None:
+            self._chunks[hi] = array("H", (lo,))
+            self._card += 1
+            return True
+        if isinstance(c, bytearray):
+            byte, bit = lo >> 3, 1 << (lo & 7)
+            if c[byte] & bit:
+                return False
+            c[byte] |= bit
+            self._card += 1
+            return True
+        i = bisect_left(c, lo)
+        if i < len(c) and c[i] == lo:
+            return False
+        c.insert(i, lo)
+        self._card += 1
+        if len(c) > ARRAY_MAX:
+            bits = bytearray(BITSET_BYTES)
+            for v in c:
+                bits[v >> 3] |= 1 << (v & 7)
+            self._chunks[hi] = bits
+        return True
+
+    def discard(self, x: int) -> bool:
+        """Remove x; a chunk that went bitset stays one (cheaper than counting its bits back down)."""
+        hi, lo = x >> 16, x & 0xFFFF
+        c = self._chunks.get(hi)
+        if c is None:
+            return False
+        if isinstance(c, bytearray):
+            byte, bit = lo >> 3, 1 << (lo & 7)
+            if not c[byte] & bit:
+                return False
+            c[byte] &= ~bit & 0xFF
+        else:
+            i = bisect_left(c, lo)
+            if i == len(c) or c[i] != lo:
+                return False
+            del c[i]
+            if not c:
+                del self._chunks[hi]
+        self._card -= 1
+        return True
+
+    def __contains__(self, x: int) -> bool:
+        c = self._chunks.get(x >> 16)
+        if c is None:
+            return False
+        lo = x & 0xFFFF
+        if isinstance(c, bytearray):
+            return bool(c[lo >> 3] & (1 << (lo & 7)))
+        i = bisect_left(c, lo)
+        return i < len(c) and c[i] == lo
+
+    def __len__(self) -> int:
+        return self._card
+
+    def nbytes(self) -> int:
+        return sum(len(c) if isinstance(c, bytearray) else c.itemsize * len(c) for c in self._chunks.values())
+
+    def containers(self) -> Dict[str, int]:
+        bitsets = sum(1 for c in self._chunks.values() if isinstance(c, bytearray))
+        return {"array": len(self._chunks) - bitsets, "bitset": bitsets}
+
+
+class _Tracked:
+    __slots__ = ("bits", "ready")
+
+    def __init__(self):
+        self.bits = ChunkedBitmap()
+        self.ready = False
+
+
+class VotedSets:
+    def __init__(self, enabled: bool = True, batch_size: int = 50000):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._votes: Dict[int, _Tracked] = {}
+        self.short_circuits = 0
+
+    def begin(self, vote_id: int) -> bool:
+        """Start tracking a vote; True when the caller should now build() it."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if vote_id in self._votes:
+                return False
+            # created before the build so casts committed meanwhile are kept
+            self._votes[vote_id] = _Tracked()
+            return True
+
+    def tracked(self, vote_id: int) -> bool:
+        return vote_id in self._votes
+
+    def drop(self, vote_id: int):
+        with self._lock:
+            self._votes.pop(vote_id, None)
+
+    def add(self, vote_id: int, user_id: Optional[int]):
+        t = self._votes.get(vote_id)
+        if t is not None and user_id is not None:
+            with self._lock:
+                t.bits.add(int(user_id))
+
+    def discard(self, vote_id: int, user_id: Optional[int]):
+        """A reservation that was rolled back (app_mpc cast_mpc release)."""
+        t = self._votes.get(vote_id)
+        if t is not None and user_id is not None:
+            with self._lock:
+                t.bits.discard(int(user_id))
+
+    def add_rows(self, rows: Iterable):
+        """Committed (vote_id, user_id, party_id) rows; user_id may be None."""
+        for vote_id, user_id, _party_id in rows:
+            self.add(vote_id, user_id)
+
+    def has_voted(self, vote_id: int, user_id: Optional[int]) -> bool:
+        """True only when the vote's bitmap is built and holds the user."""
+        t = self._votes.get(vote_id)
+        if t is None or not t.ready or user_id is None:
+            return False
+        if user_id in t.bits:
+            self.short_circuits += 1
+            return True
+        return False
+
+    def turnout(self, vote_id: int) -> Optional[int]:
+        t = self._votes.get(vote_id)
+        return len(t.bits) if t is not None and t.ready else None
+
+    # ---------------- building ----------------
+    def _absorb(self, vote_id: int, user_ids) -> bool:
+        t = self._votes.get(vote_id)
+        if t is None:
+            return False   # dropped while building
+        with self._lock:
+            for (u,) in user_ids:
+                t.bits.add(int(u))
+        return True
+
+    def _ready(self, vote_id: int):
+        t = self._votes.get(vote_id)
+        if t is not None:
+            t.ready = True
+
+    def build(self, cur, vote_id: int):
+        """Blocking cursor (app_mpc)."""
+        last = 0
+        while True:
+            cur.execute(BUILD_SQL, (vote_id, last, self.batch_size))
+            rows = cur.fetchall()
+            if not rows or not self._absorb(vote_id, rows):
+                break
+            last = rows[-1][0]
+        self._ready(vote_id)
+
+    async def abuild(self, cur, vote_id: int):
+        """Awaitable cursor (main.py adb())."""
+        last = 0
+        while True:
+            await cur.execute(BUILD_SQL, (vote_id, last, self.batch_size))
+            rows = await cur.fetchall()
+            if not rows or not self._absorb(vote_id, rows):
+                break
+            last = rows[-1][0]
+        self._ready(vote_id)
+
+    def stats(self) -> Dict[str, Any]:
+        votes = {}
+        for vote_id, t in list(self._votes.items()):
+            votes[str(vote_id)] = {
+                "ready": t.ready, "voted": len(t.bits), "bytes": t.bits.nbytes(), **t.bits.containers(),
+            }
+        return {"enabled": self.enabled, "short_circuits": self.short_circuits, "votes": votes}
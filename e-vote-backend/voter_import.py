@@ -0,0 +1,291 @@
+# voter_import.py
+# Streaming bulk import of voter rolls (POST /api/admin/voters/import).
+#
+# The request body (CSV with a header row, or NDJSON) is read chunk by chunk:
+#   iter_records()  bytes -> lines -> RegisterRequest-validated tuples, one at
+#                   a time; bad rows become per-line errors
+#   run()           groups valid rows into batches of `batch_size`, inserts
+#                   each batch with one executemany and commits it (one
+#                   transaction per chunk, so a bad row never costs the file)
+#   write_batch*()  on a failed executemany the chunk is rolled back and
+#                   replayed row by row in the same transaction, so only the
+#                   offending rows (duplicate fingerprint / NIC, bad data) are
+#                   reported; the committed voters are then put in the
+#                   fingerprint index (FP_INDEX=1), like a single register
+#
+# Jobs are kept in an ImportRegistry so GET .../import/{job_id} can show
+# progress while the upload is still streaming.
+import codecs
+import csv
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+import mysql.connector
+from pydantic import BaseModel, ValidationError
+
+from fingerprint_index import FingerprintIndex, Voter
+
+COLUMNS = (
+    "full_name", "nic", "dob", "gender", "household", "mobile", "email",
+    "location_id", "administration", "electoral", "polling", "gn", "fingerprint",
+)
+INSERT_SQL = f"""
+    INSERT INTO users ({", ".join(COLUMNS)})
+    VALUES ({", ".join(["%s"] * len(COLUMNS))})
+"""
+INDEX_SQL = "SELECT id, fingerprint, full_name, nic, email FROM users WHERE fingerprint IN ({fps})"
+MAX_ERRORS = 1000          # per job; later errors are only counted
+
+Row = Tuple[Any, ...]
+
+
+# ---------------- parsing ----------------
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail.strip():
+        yield tail.rstrip("\r")
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def _to_row(model: Type[BaseModel], data: Dict[str, Any]) -> Row:
+    # NDJSON rolls often carry NICs / phone numbers as numbers
+    clean = {k: None if v is None else (str(v).strip() or None) for k, v in data.items() if k in COLUMNS}
+    rec = model(**clean)
+    return tuple(getattr(rec, c, None) for c in COLUMNS)
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], fmt: str, model: Type[BaseModel]
+) -> AsyncIterator[Tuple[int, Optional[Row], Optional[str]]]:
+    """Yield (line_no, row, None) or (line_no, None, error) per input record."""
+    header: Optional[List[str]] = None
+    pending, start = "", 0
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if fmt == "csv":
+            # a quoted field may contain a newline: keep joining until quotes balance
+            pending = f"{pending}\n{line}" if pending else line
+            if pending.count('"') % 2:
+                start = start or line_no
+                continue
+            text, first, pending, start = pending, start or line_no, "", 0
+            if not text.strip():
+                continue
+            values = next(csv.reader([text]))
+            if header is None:
+                header = [h.strip().lower() for h in values]   # unknown columns are ignored
+                continue
+            if len(values) != len(header):
+                yield first, None, f"expected {len(header)} fields, got {len(values)}"
+                continue
+            data = dict(zip(header, values))
+        else:
+            first = line_no
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                yield first, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(data, dict):
+                yield first, None, "expected a JSON object"
+                continue
+        try:
+            yield first, _to_row(model, data), None
+        except ValidationError as e:
+            yield first, None, _validation_message(e)
+    if pending:
+        yield start, None, "unterminated quoted field"
+
+
+# ---------------- writing ----------------
+_DUP_KEY = re.compile(r"Duplicate entry '.*' for key '(?:\w+\.)?(\w+)'")
+
+
+def row_error(e: mysql.connector.Error) -> str:
+    m = _DUP_KEY.search(str(e))
+    if m:
+        return f"duplicate {m.group(1)}"
+    return getattr(e, "msg", None) or str(e)
+
+
+def _committed_fingerprints(rows: List[Row], errors: List[Optional[str]],
+                            index: Optional[FingerprintIndex]) -> List[str]:
+    if index is None or not index.enabled:
+        return []
+    col = COLUMNS.index("fingerprint")
+    return [row[col] for row, err in zip(rows, errors) if err is None and row[col]]
+
+
+def _put_voters(index: FingerprintIndex, found) -> None:
+    for user_id, fp, full_name, nic, email in found:
+        index.put(fp, Voter(int(user_id), full_name, nic, email))
+
+
+def write_batch_sync(conn, rows: List[Row], index: Optional[FingerprintIndex] = None) -> List[Optional[str]]:
+    """One transaction for the chunk; returns an error (or None) per row."""
+    cur = conn.cursor()
+    try:
+        errors: List[Optional[str]] = [None] * len(rows)
+        try:
+            cur.executemany(INSERT_SQL, rows)
+        except (mysql.connector.IntegrityError, mysql.connector.DataError):
+            conn.rollback()
+            # a failed single-row INSERT does not end the transaction
+            for i, row in enumerate(rows):
+                try:
+                    cur.execute(INSERT_SQL, row)
+                except (mysql.connector.IntegrityError, mysql.connector.DataError) as e:
+                    errors[i] = row_error(e)
+        conn.commit()
+        fps = _committed_fingerprints(rows, errors, index)
+        if fps:
+            cur.execute(INDEX_SQL.format(fps=", ".join(["%s"] * len(fps))), fps)
+            _put_voters(index, cur.fetchall())
+            conn.rollback()
+        return errors
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+async def write_batch_async(conn, rows: List[Row], index: Optional[FingerprintIndex] = None) -> List[Optional[str]]:
+    """write_batch_sync for dal connections (main.py)."""
+    cur = await conn.cursor()
+    try:
+        errors: List[Optional[str]] = [None] * len(rows)
+        try:
+            await cur.executemany(INSERT_SQL, rows)
+        except (mysql.connector.IntegrityError, mysql.connector.DataError):
+            await conn.rollback()
+            for i, row in enumerate(rows):
+                try:
+                    await cur.execute(INSERT_SQL, row)
+                except (mysql.connector.IntegrityError, mysql.connector.DataError) as e:
+                    errors[i] = row_error(e)
+        await conn.commit()
+        fps = _committed_fingerprints(rows, errors, index)
+        if fps:
+            await cur.execute(INDEX_SQL.format(fps=", ".join(["%s"] * len(fps))), fps)
+            _put_voters(index, await cur.fetchall())
+            await conn.rollback()
+        return errors
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await cur.close()
+
+
+# ---------------- jobs ----------------
+class ImportJob:
+    def __init__(self, job_id: str, fmt: str, batch_size: int):
+        self.id = job_id
+        self.format = fmt
+        self.batch_size = batch_size
+        self.status = "running"
+        self.rows = 0            # records seen
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.message: Optional[str] = None
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self.elapsed = 0.0
+
+    def error(self, line: int, msg: str):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": msg})
+
+    def snapshot(self, with_errors: bool = True) -> Dict[str, Any]:
+        elapsed = self.elapsed if self.status != "running" else time.monotonic() - self._t0
+        out = {
+            "job_id": self.id, "status": self.status, "format": self.format,
+            "rows": self.rows, "inserted": self.inserted, "failed": self.failed,
+            "batches": self.batches, "batch_size": self.batch_size,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "started_at": self.started_at, "message": self.message,
+        }
+        if with_errors:
+            out["errors"] = self.errors
+            out["errors_truncated"] = self.failed > len(self.errors)
+        return out
+
+
+class ImportRegistry:
+    def __init__(self, keep: int = 50):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+
+    def new(self, fmt: str, batch_size: int, job_id: Optional[str] = None) -> ImportJob:
+        job = ImportJob(job_id or uuid.uuid4().hex[:12], fmt, batch_size)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [j.snapshot(with_errors=False) for j in reversed(list(self._jobs.values()))]
+
+
+async def run(job: ImportJob, records: AsyncIterator, write_batch) -> ImportJob:
+    """Drive one import: records from iter_records(), write_batch(rows) -> per-row errors."""
+    batch: List[Row] = []
+    lines: List[int] = []
+
+    async def flush():
+        errors = await write_batch(batch)
+        job.batches += 1
+        for line, err in zip(lines, errors):
+            if err is None:
+                job.inserted += 1
+            else:
+                job.error(line, err)
+        batch.clear(); lines.clear()
+
+    try:
+        async for line, row, err in records:
+            if err is not None:
+                job.rows += 1
+                job.error(line, err)
+                continue
+            job.rows += 1
+            batch.append(row); lines.append(line)
+            if len(batch) >= job.batch_size:
+                await flush()
+        if batch:
+            await flush()
+        job.status = "done"
+    except Exception as e:
+        job.status = "failed"
+        job.message = str(e)
+    finally:
+        job.elapsed = time.monotonic() - job._t0
+    return job
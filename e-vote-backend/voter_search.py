@@ -0,0 +1,76 @@
+# voter_search.py
+# SQL builder for the admin voter listing (main.py and app_mpc.py).
+#
+# The old query was `full_name LIKE '%q%' OR nic LIKE ... ORDER BY id DESC
+# LIMIT n OFFSET m`: a full scan for every search, and deep pages read and
+# throw away `m` rows. Here:
+#   - pagination is keyset: pass the last id you got as after_id
+#     (WHERE id < after_id ORDER BY id DESC); OFFSET is still accepted
+#   - the search term picks an indexed path (sql/003_users_search_indexes.sql):
+#       contains "@"         email prefix
+#       full NIC (9 digits + V/X, or 12 digits)   nic exact
+#       digits / + / -       nic prefix UNION mobile prefix
+#       anything else        FULLTEXT on full_name (prefix index for short terms)
+#   - match="contains" keeps the old substring search across all four columns
+import re
+from typing import Any, List, Optional, Tuple
+
+NIC_RE = re.compile(r"^(\d{9}[VvXx]|\d{12})$")
+PHONE_RE = re.compile(r"^\+?[\d\s-]+$")
+FT_MIN_TOKEN = 3          # innodb_ft_min_token_size default
+FT_SPECIALS = re.compile(r'[+\-<>()~*"@]')
+
+
+def like_prefix(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_branches(q: str, match: str = "auto") -> List[Tuple[str, List[Any]]]:
+    """Return the WHERE conditions to OR together, each able to use one index."""
+    q = q.strip()
+    if match == "contains":
+        like = f"%{q}%"
+        return [("(full_name LIKE %s OR nic LIKE %s OR email LIKE %s OR mobile LIKE %s)", [like] * 4)]
+    if "@" in q:
+        return [("email LIKE %s", [like_prefix(q)])]
+    if NIC_RE.match(q):
+        return [("nic = %s", [q])]
+    if PHONE_RE.match(q):
+        digits = re.sub(r"[\s-]", "", q)
+        return [("nic LIKE %s", [like_prefix(digits)]), ("mobile LIKE %s", [like_prefix(digits)])]
+    words = [w for w in FT_SPECIALS.sub(" ", q).split() if w]
+    if words and all(len(w) >= FT_MIN_TOKEN for w in words):
+        return [("MATCH(full_name) AGAINST (%s IN BOOLEAN MODE)", [" ".join(f"+{w}*" for w in words)])]
+    return [("full_name LIKE %s", [like_prefix(q)])]
+
+
+def build_list_query(
+    columns: str,
+    q: Optional[str],
+    limit: int,
+    offset: int = 0,
+    after_id: Optional[int] = None,
+    match: str = "auto",
+) -> Tuple[str, List[Any]]:
+    """SELECT {columns} FROM users ... newest first, one page."""
+    branches = search_branches(q, match) if q and q.strip() else [("1=1", [])]
+    keyset = " AND id < %s" if after_id else ""
+    keyset_args = [after_id] if after_id else []
+
+    if len(branches) == 1:
+        cond, args = branches[0]
+        sql = f"SELECT {columns} FROM users WHERE {cond}{keyset} ORDER BY id DESC LIMIT %s OFFSET %s"
+        return sql, args + keyset_args + [limit, offset]
+
+    # one index per branch: each side is a short index range, merged by id
+    parts, args = [], []
+    for cond, cond_args in branches:
+        parts.append(f"(SELECT {columns} FROM users WHERE {cond}{keyset} ORDER BY id DESC LIMIT %s)")
+        args += cond_args + keyset_args + [limit + offset]
+    sql = f"SELECT * FROM ({' UNION '.join(parts)}) u ORDER BY id DESC LIMIT %s OFFSET %s"
+    return sql, args + [limit, offset]
+
+
+def next_cursor(ids: List[int], limit: int) -> Optional[int]:
+    """after_id for the next page, or None on the last page."""
+    return ids[-1] if len(ids) == limit and ids else None
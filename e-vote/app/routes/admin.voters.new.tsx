@@ -159,6 +159,15 @@ export default function NewVoter() {
     var timer = null;
     var startAt = 0;
     var session = 0;
+    // ?station=<desk id> pairs this page with one reader; long-poll returns on the scan
+    var station = new URLSearchParams(window.location.search).get("station") || "";
+    var WAIT_S = 5;
+    // seq of the last scan state seen (from the DELETE, then every GET): only newer scans return
+    var lastSeq = 0;
+
+    function scanUrl(qs) {
+      return endpoint + "?" + (station ? "station=" + encodeURIComponent(station) + "&" : "") + qs;
+    }
 
     function stop() {
       session++;
@@ -181,7 +190,7 @@ export default function NewVoter() {
       if (innerBar) innerBar.style.width = Math.min(100, Math.round((elapsed / TIMEOUT_MS) * 100)) + "%";
 
       try {
-        var res = await fetch(endpoint + "?t=" + Date.now(), { method: "GET", headers: { "Accept":"application/json" }, cache: "no-store" });
+        var res = await fetch(scanUrl("wait=" + WAIT_S + "&after=" + lastSeq + "&t=" + Date.now()), { method: "GET", headers: { "Accept":"application/json" }, cache: "no-store" });
         if (session !== mySession) return;
         if (!res.ok) {
           setStatus("Failed ❌");
@@ -190,6 +199,7 @@ export default function NewVoter() {
           return;
         }
         var j = await res.json();
+        if (j && typeof j.seq === "number") lastSeq = j.seq;
         if (j && j.fingerprint) {
           fpEl.value = String(j.fingerprint);
           setStatus("Captured ✅");
@@ -214,7 +224,12 @@ export default function NewVoter() {
 
       session++;
       var mySession = session;
-      try { await fetch(endpoint, { method:"DELETE", headers: { "Accept":"application/json" } }); } catch (_) {}
+      lastSeq = 0;
+      try {
+        var cleared = await fetch(scanUrl("t=" + Date.now()), { method: "DELETE", headers: { "Accept":"application/json" } });
+        var cj = await cleared.json();
+        if (cj && typeof cj.seq === "number") lastSeq = cj.seq;
+      } catch (_) {}
 
       fpEl.value = "";
       btn.dataset.mode = "scanning";
@@ -226,7 +241,14 @@ export default function NewVoter() {
       startAt = Date.now();
 
       await pollOnce(mySession);
-      timer = setInterval(function () { pollOnce(mySession); }, POLL_MS);
+      // each GET waits server-side; only throttle when it came back early without a scan
+      while (session === mySession) {
+        var t0 = Date.now();
+        await pollOnce(mySession);
+        if (session === mySession && Date.now() - t0 < POLL_MS) {
+          await new Promise(function (r) { setTimeout(r, POLL_MS); });
+        }
+      }
     });
   }
 })();
@@ -11,6 +11,8 @@ const BACKEND_BASE =
 const UPSTREAM = `${BACKEND_BASE}/api/fingerprint/scan`;
 
 // GET /api/fingerprint/scan -> forwards to FastAPI GET /api/fingerprint/scan
+// ?station=<desk id> picks the scan buffer; ?wait=N&after=<seq> long-polls until a newer scan
+// arrives, so callers can loop on this instead of polling every second.
 export async function loader({ request }: LoaderFunctionArgs) {
   const url = new URL(request.url);
   const qs = url.search ? `?${url.searchParams.toString()}` : "";
@@ -18,6 +20,8 @@ export async function loader({ request }: LoaderFunctionArgs) {
     method: "GET",
     headers: { Accept: "application/json" },
     cache: "no-store",
+    // a long-poll ends when the browser gives up on it
+    signal: request.signal,
   });
   const body = await r.text();
   return new Response(body, {
@@ -47,7 +51,9 @@ export async function action({ request }: ActionFunctionArgs) {
     init.body = await request.text();
   }
 
-  const r = await fetch(UPSTREAM, init);
+  const url = new URL(request.url);
+  const qs = url.search ? `?${url.searchParams.toString()}` : "";
+  const r = await fetch(`${UPSTREAM}${qs}`, init);
   const body = await r.text();
 
   return new Response(body, {
@@ -44,11 +44,13 @@ export async function action({ request, params }: ActionFunctionArgs) {
     return json({ ok: false, message: "Party and fingerprint are required" }, { status: 400 });
   }
 
+  // ?station=<desk id> of the page; the backend keeps per-station turnout series
+  const station = new URL(request.url).searchParams.get("station") || "";
   const BASE = process.env.BACKEND_BASE ?? "http://localhost:8000";
   const post = await fetch(`${BASE}/api/vote/cast_mpc`, {
     method: "POST",
     headers: { "Content-Type": "application/json", Accept: "application/json" },
-    body: JSON.stringify({ fingerprint, vote_id: Number(params.id), party_id }),
+    body: JSON.stringify({ fingerprint, vote_id: Number(params.id), party_id, ...(station ? { station } : {}) }),
   });
 
   if (!post.ok) {
@@ -56,7 +58,7 @@ export async function action({ request, params }: ActionFunctionArgs) {
     throw new Response(txt || "Failed to cast vote", { status: post.status });
   }
 
-  return redirect(`/vote/${params.id}?success=1`);
+  return redirect(`/vote/${params.id}?success=1${station ? `&station=${encodeURIComponent(station)}` : ""}`);
 }
 
 /* ---------- Page (client) ---------- */
@@ -117,6 +119,15 @@ export default function VotePublicPage() {
       var timer = null;
       var startAt = 0;
       var session = 0;
+      // ?station=<desk id> pairs this page with one reader; long-poll returns on the scan
+      var station = new URLSearchParams(window.location.search).get("station") || "";
+      var WAIT_S = 5;
+      // seq of the last scan state seen (from the DELETE, then every GET): only newer scans return
+      var lastSeq = 0;
+
+      function scanUrl(qs) {
+        return endpoint + "?" + (station ? "station=" + encodeURIComponent(station) + "&" : "") + qs;
+      }
 
       function stop() {
         session++;
@@ -140,7 +151,7 @@ export default function VotePublicPage() {
         innerBar.style.width = Math.min(100, Math.round((elapsed / TIMEOUT_MS) * 100)) + "%";
 
         try {
-          var res = await fetch(endpoint + "?t=" + Date.now(), {
+          var res = await fetch(scanUrl("wait=" + WAIT_S + "&after=" + lastSeq + "&t=" + Date.now()), {
             method: "GET",
             headers: { "Accept":"application/json" },
             cache: "no-store"
@@ -151,6 +162,7 @@ export default function VotePublicPage() {
             return;
           }
           var j = await res.json();
+          if (j && typeof j.seq === "number") lastSeq = j.seq;
           if (j && j.fingerprint) {
             fpEl.value = String(j.fingerprint);
             setStatus("Captured ✅");
@@ -175,7 +187,12 @@ export default function VotePublicPage() {
 
         session++;
         var mySession = session;
-        try { await fetch(endpoint, { method: "DELETE", headers: { "Accept":"application/json" } }); } catch(_){}
+        lastSeq = 0;
+        try {
+          var cleared = await fetch(scanUrl("t=" + Date.now()), { method: "DELETE", headers: { "Accept":"application/json" } });
+          var cj = await cleared.json();
+          if (cj && typeof cj.seq === "number") lastSeq = cj.seq;
+        } catch (_) {}
 
         fpEl.value = "";
         btn.dataset.mode = "scanning";
@@ -188,7 +205,14 @@ export default function VotePublicPage() {
         startAt = Date.now();
 
         await pollOnce(mySession);
-        timer = setInterval(function(){ pollOnce(mySession); }, POLL_MS);
+        // each GET waits server-side; only throttle when it came back early without a scan
+        while (session === mySession) {
+          var t0 = Date.now();
+          await pollOnce(mySession);
+          if (session === mySession && Date.now() - t0 < POLL_MS) {
+            await new Promise(function (r) { setTimeout(r, POLL_MS); });
+          }
+        }
       });
     }
   })();